@@ -4,10 +4,17 @@ Simple UI for making course reminder calls in multiple languages
 """
 
 import streamlit as st
-import time
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from vapi_caller import make_call_with_language, validate_phone_number
+from vapi_caller import (
+    make_call_with_language, validate_phone_number, VAPI_WEBHOOK_URL,
+    LANGUAGE_CONFIG, TERMINAL_STATUSES
+)
+from call_events import start_webhook_server, call_waiters
+from call_store import get_store, get_writer, export_if_stale, export_calls_to_excel
+from telemetry import METRICS_PORT, start_metrics_server
 
 # ==========================================
 # PAGE CONFIGURATION
@@ -18,34 +25,97 @@ st.set_page_config(
     layout="centered"
 )
 
+# Receive end-of-call reports instead of polling (once per process)
+if VAPI_WEBHOOK_URL:
+    start_webhook_server()
+
+# Expose pipeline metrics at /metrics for Prometheus (once per process)
+if METRICS_PORT:
+    start_metrics_server()
+
 # ==========================================
 # SIDEBAR - EXCEL DOWNLOAD
 # ==========================================
+EXCEL_FILE = "call_summaries.xlsx"
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_history_summary(store_version):
+    """
+    Row count, today's calls and spend for one version of the call store
+    """
+    return get_store().summary()
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_excel_download(store_version):
+    """
+    Excel export bytes and modification time for one version of the call store
+    Only called when the user asks for the file: the export covers the whole history
+    """
+    export_if_stale(EXCEL_FILE)
+    with open(EXCEL_FILE, "rb") as file:
+        return file.read(), datetime.fromtimestamp(os.path.getmtime(EXCEL_FILE))
+
+
 with st.sidebar:
     st.header("📊 Call Summaries")
     
-    # Check if Excel file exists
-    excel_file = "call_summaries.xlsx"
-    if os.path.exists(excel_file):
-        # Get file size and modification time
-        file_size = os.path.getsize(excel_file) / 1024  # KB
-        mod_time = datetime.fromtimestamp(os.path.getmtime(excel_file))
-        
-        st.success(f"✅ Excel file available")
-        st.caption(f"Size: {file_size:.1f} KB")
-        st.caption(f"Last updated: {mod_time.strftime('%Y-%m-%d %H:%M')}")
+    # Cached per store version (mtime + size) and shared by all sessions,
+    # so reruns never re-read the history unless a new call landed
+    store_version = get_store().signature()
+    history = load_history_summary(store_version)
+    
+    if history['total_calls']:
+        stat_col1, stat_col2 = st.columns(2)
+        with stat_col1:
+            st.metric("Total Calls", history['total_calls'])
+            st.metric("Today", history['today_calls'])
+        with stat_col2:
+            st.metric("Total Spend", f"₹{history['total_spend']}")
+            st.metric("Today's Spend", f"₹{history['today_spend']}")
         
-        # Download button
-        with open(excel_file, "rb") as file:
+        # Built on request only (reruns after every call must not rewrite the whole
+        # history); kept for this session until another call lands
+        if st.button("📦 Prepare Excel File", use_container_width=True):
+            st.session_state['excel_download'] = (store_version, *load_excel_download(store_version))
+        prepared = st.session_state.get('excel_download')
+        if prepared and prepared[0] == store_version:
+            _, excel_bytes, mod_time = prepared
+            st.caption(f"Size: {len(excel_bytes) / 1024:.1f} KB · updated {mod_time.strftime('%Y-%m-%d %H:%M')}")
             st.download_button(
                 label="📥 Download Excel File",
-                data=file,
+                data=excel_bytes,
                 file_name=f"call_summaries_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
         
-        st.info("💡 Excel contains all call summaries with transcripts")
+        st.info("💡 Excel contains all call summaries; full transcripts open from each call's report")
+        
+        # Filtered export streamed straight from the call history store
+        with st.expander("🔎 Filtered Export"):
+            export_language = st.selectbox("Language", ["All"] + list(LANGUAGE_CONFIG), key="export_language")
+            export_status = st.selectbox("Status", ["All"] + TERMINAL_STATUSES + ["timeout"], key="export_status")
+            export_dates = st.date_input("Date range", value=(), key="export_dates")
+            
+            if st.button("Prepare Export", use_container_width=True):
+                buffer = io.BytesIO()
+                row_count = export_calls_to_excel(
+                    buffer,
+                    language=None if export_language == "All" else export_language,
+                    status=None if export_status == "All" else export_status,
+                    start_date=export_dates[0] if len(export_dates) > 0 else None,
+                    end_date=export_dates[-1] if len(export_dates) > 0 else None
+                )
+                st.caption(f"{row_count} calls matched")
+                st.download_button(
+                    label="📥 Download Filtered Excel",
+                    data=buffer.getvalue(),
+                    file_name=f"call_summaries_filtered_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
     else:
         st.info("📝 No calls yet. Excel file will be created after first call.")
     
@@ -87,13 +157,39 @@ phone = st.text_input(
 # ==========================================
 st.caption("⚠️ Estimated cost: ₹9.13 per call | Duration: ~2 minutes")
 
+# ==========================================
+# BACKGROUND CALL EXECUTOR
+# ==========================================
+MAX_PARALLEL_CALLS = 10   # Calls one process runs at once (all sessions)
+PANEL_REFRESH_SECONDS = 2  # How often the in-flight panel refreshes
+MAX_FINISHED_CALLS = 20    # Finished calls kept on screen per session
+
+STAGE_LABELS = {
+    'queued': "⏳ Queued",
+    'dialing': "📲 Dialing",
+    'in-call': "📞 In call",
+    'saving': "💾 Saving results",
+}
+
+
+@st.cache_resource
+def get_call_executor():
+    """
+    Worker pool shared by every session for the lifetime of the process
+    """
+    return ThreadPoolExecutor(max_workers=MAX_PARALLEL_CALLS, thread_name_prefix="ui-call")
+
+
+if "calls" not in st.session_state:
+    st.session_state.calls = []
+
 # ==========================================
 # MAKE CALL BUTTON
 # ==========================================
 st.markdown("---")
 
 if st.button("📞 Make Call Now", type="primary", use_container_width=True):
-    
+
     # Validate phone number
     is_valid, error_message = validate_phone_number(phone)
     
@@ -101,122 +197,126 @@ if st.button("📞 Make Call Now", type="primary", use_container_width=True):
         st.error(f"❌ {error_message}")
     
     else:
-        # Show calling status
-        with st.spinner(f"📞 Calling {phone} in {language}..."):
-            try:
-                # Make the call
-                result = make_call_with_language(
-                    language=language,
-                    phone=phone
-                )
-                
-                # Simulate call processing
-                time.sleep(2)
-                
-            except Exception as e:
-                st.error(f"❌ Call failed: {str(e)}")
-                st.stop()
-        
-        # ==========================================
-        # DISPLAY CALL RESULTS
-        # ==========================================
-        
-        # Status with appropriate emoji
+        # Run the call in the background; the panel below tracks it
+        progress = {'stage': 'queued', 'call_id': None}
+        future = get_call_executor().submit(
+            make_call_with_language,
+            language=language,
+            phone=phone,
+            on_update=progress.update
+        )
+        st.session_state.calls.insert(0, {
+            'phone': phone,
+            'language': language,
+            'submitted_at': datetime.now(),
+            'progress': progress,
+            'future': future
+        })
+        st.toast(f"📞 Calling {phone} in {language}...")
+
+# ==========================================
+# DISPLAY CALL RESULTS
+# ==========================================
+@st.cache_data(max_entries=20, show_spinner=False)
+def load_transcript(call_id):
+    """
+    Full transcript of a finished call, decompressed from the call store on demand
+    """
+    get_writer().flush()  # The call's row may still be in the write-behind queue
+    return get_store().get_transcript(call_id)
+
+
+def render_call_result(result, phone, language):
+    """
+    Show the outcome of one finished call
+    """
+    key = result['call_id']
+    
+    # Status with appropriate emoji
+    if result['status'] in ['ended', 'completed']:
+        st.success("✅ Call Completed Successfully!")
+    elif result['status'] == 'busy':
+        st.warning("📵 Customer was busy")
+    elif result['status'] == 'no-answer':
+        st.warning("📞 No answer - Customer didn't pick up")
+    elif result['status'] == 'failed':
+        st.error("❌ Call failed")
+    else:
+        st.info(f"ℹ️ Call status: {result['status']}")
+    
+    # Metrics Row
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        # Status with proper emoji
+        status_display = result['status'].replace('-', ' ').title()
         if result['status'] in ['ended', 'completed']:
-            st.success("✅ Call Completed Successfully!")
-        elif result['status'] == 'busy':
-            st.warning("📵 Customer was busy")
-        elif result['status'] == 'no-answer':
-            st.warning("📞 No answer - Customer didn't pick up")
-        elif result['status'] == 'failed':
-            st.error("❌ Call failed")
+            status_emoji = "✅"
+        elif result['status'] in ['busy', 'no-answer']:
+            status_emoji = "⚠️"
         else:
-            st.info(f"ℹ️ Call status: {result['status']}")
-        
-        # Metrics Row
-        col1, col2, col3, col4 = st.columns(4)
+            status_emoji = "❌"
+        st.metric("Status", f"{status_emoji} {status_display}")
+    
+    with col2:
+        st.metric("Duration", result['duration'])
+    
+    with col3:
+        st.metric("Cost", f"₹{result['cost']}")
+    
+    with col4:
+        st.metric("Language", language.split(" ")[0])
+    
+    # ==========================================
+    # DETAILED CALL INFORMATION
+    # ==========================================
+    with st.expander("📊 Detailed Call Report"):
+        st.markdown("#### Call Information")
         
-        with col1:
-            # Status with proper emoji
-            status_display = result['status'].replace('-', ' ').title()
-            if result['status'] in ['ended', 'completed']:
-                status_emoji = "✅"
-            elif result['status'] in ['busy', 'no-answer']:
-                status_emoji = "⚠️"
-            else:
-                status_emoji = "❌"
-            st.metric("Status", f"{status_emoji} {status_display}")
+        info_col1, info_col2 = st.columns(2)
         
-        with col2:
-            st.metric("Duration", result['duration'])
+        with info_col1:
+            st.write(f"**Call ID:** `{result['call_id'][:20]}...`")
+            st.write(f"**Phone:** {phone}")
+            st.write(f"**Purpose:** Feedback Collection")
+            st.write(f"**End Reason:** {result.get('end_reason', 'N/A')}")
         
-        with col3:
-            st.metric("Cost", f"₹{result['cost']}")
+        with info_col2:
+            st.write(f"**Started:** {result['start_time']}")
+            st.write(f"**Ended:** {result['end_time']}")
+            st.write(f"**Voice:** {result['voice_name']}")
+            st.write(f"**Actual Cost:** ₹{result['cost']} (real duration)")
         
-        with col4:
-            st.metric("Language", language.split(" ")[0])
+        # Recording (if available)
+        if result.get('recording_url'):
+            st.markdown("#### 🎧 Call Recording")
+            st.audio(result['recording_url'])
         
-        # ==========================================
-        # DETAILED CALL INFORMATION
-        # ==========================================
-        st.markdown("---")
+        # Summary (if available)
+        if result.get('summary'):
+            st.markdown("#### 📝 Call Summary")
+            st.info(result['summary'])
         
-        with st.expander("📊 Detailed Call Report", expanded=True):
-            st.markdown("#### Call Information")
-            
-            info_col1, info_col2 = st.columns(2)
-            
-            with info_col1:
-                st.write(f"**Call ID:** `{result['call_id'][:20]}...`")
-                st.write(f"**Phone:** {phone}")
-                st.write(f"**Purpose:** Feedback Collection")
-                st.write(f"**End Reason:** {result.get('end_reason', 'N/A')}")
-            
-            with info_col2:
-                st.write(f"**Started:** {result['start_time']}")
-                st.write(f"**Ended:** {result['end_time']}")
-                st.write(f"**Voice:** {result['voice_name']}")
-                st.write(f"**Actual Cost:** ₹{result['cost']} (real duration)")
-            
-            # Recording (if available)
-            if result.get('recording_url'):
-                st.markdown("#### 🎧 Call Recording")
-                st.audio(result['recording_url'])
-            
-            # Summary (if available)
-            if result.get('summary'):
-                st.markdown("#### 📝 Call Summary")
-                st.info(result['summary'])
-            
-            # Transcript (if available)
-            if result.get('transcript'):
-                st.markdown("#### 💬 Full Transcript")
-                st.text_area(
-                    "Conversation",
-                    value=result['transcript'],
-                    height=200,
-                    label_visibility="collapsed"
-                )
-            
-            # Full JSON data
-            if st.checkbox("Show raw data"):
-                st.json(result)
-        
-        # ==========================================
-        # ACTION BUTTONS
-        # ==========================================
-        st.markdown("---")
-        
-        btn_col1, btn_col2 = st.columns(2)
-        
-        with btn_col1:
-            if st.button("📞 Make Another Call", use_container_width=True):
-                st.rerun()
+        # Transcript (if available) - only loaded once requested
+        if result.get('has_transcript') and st.checkbox("💬 Show full transcript", key=f"show_transcript_{key}"):
+            st.markdown("#### 💬 Full Transcript")
+            st.text_area(
+                "Conversation",
+                value=load_transcript(result['call_id']) or "Transcript not available",
+                height=200,
+                label_visibility="collapsed",
+                key=f"transcript_{key}"
+            )
         
-        with btn_col2:
-            if st.button("📥 Download Report", use_container_width=True):
-                # Create downloadable report
-                report = f"""
+        # Full JSON data
+        if st.checkbox("Show raw data", key=f"raw_{key}"):
+            st.json(result)
+    
+    # ==========================================
+    # ACTION BUTTONS
+    # ==========================================
+    # Create downloadable report
+    report = f"""
 SnapSkill Call Report
 ====================
 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -226,13 +326,97 @@ Status: {result['status']}
 Duration: {result['duration']}
 Cost: ₹{result['cost']}
 Call ID: {result['call_id']}
-                """
-                st.download_button(
-                    label="Download TXT Report",
-                    data=report,
-                    file_name=f"call_report_{result['call_id'][:8]}.txt",
-                    mime="text/plain"
-                )
+    """
+    st.download_button(
+        label="📥 Download Report",
+        data=report,
+        file_name=f"call_report_{result['call_id'][:8]}.txt",
+        mime="text/plain",
+        use_container_width=True,
+        key=f"report_{key}"
+    )
+
+
+def render_calls_panel():
+    """
+    In-flight calls with live status, then finished calls newest first
+    """
+    calls = st.session_state.calls
+    in_flight = [call for call in calls if not call['future'].done()]
+    finished = [call for call in calls if call['future'].done()][:MAX_FINISHED_CALLS]
+    st.session_state.calls = in_flight + finished
+    
+    if in_flight:
+        st.subheader(f"📡 Calls in Progress ({len(in_flight)})")
+        for call in in_flight:
+            progress = call['progress']
+            label = STAGE_LABELS.get(progress['stage'], progress['stage'])
+            live_status = call_waiters.last_status(progress['call_id']) if progress.get('call_id') else None
+            if live_status:
+                label = f"{label} · {live_status}"
+            elapsed = int((datetime.now() - call['submitted_at']).total_seconds())
+            st.write(f"**{call['phone']}** ({call['language'].split(' ')[0]}) — {label} — {elapsed // 60}m {elapsed % 60}s")
+    elif st.session_state.get("panel_refreshing"):
+        # Last call just finished: full rerun so the sidebar picks up the new history
+        st.session_state.panel_refreshing = False
+        st.rerun()
+    
+    for call in finished:
+        st.markdown("---")
+        st.markdown(f"### 📞 {call['phone']} · {call['submitted_at'].strftime('%H:%M:%S')}")
+        try:
+            result = call['future'].result()
+        except Exception as e:
+            st.error(f"❌ Call failed: {str(e)}")
+            continue
+        render_call_result(result, call['phone'], call['language'])
+
+
+# Refresh only this panel while calls are running; the rest of the page stays put
+has_in_flight = any(not call['future'].done() for call in st.session_state.calls)
+st.session_state.panel_refreshing = has_in_flight
+st.fragment(render_calls_panel, run_every=PANEL_REFRESH_SECONDS if has_in_flight else None)()
+
+# ==========================================
+# SEARCH CALL FEEDBACK
+# ==========================================
+SEARCH_RESULTS = 20  # Best matches shown per search
+
+st.markdown("---")
+st.subheader("🔍 Search Call Feedback")
+search_query = st.text_input(
+    "Search summaries and transcripts",
+    placeholder="e.g. instructor, బాగుంది, अच्छा",
+    key="search_query"
+)
+
+filter_col1, filter_col2, filter_col3 = st.columns(3)
+with filter_col1:
+    search_language = st.selectbox("Language", ["All"] + list(LANGUAGE_CONFIG), key="search_language")
+with filter_col2:
+    search_status = st.selectbox("Status", ["All"] + TERMINAL_STATUSES + ["timeout"], key="search_status")
+with filter_col3:
+    search_dates = st.date_input("Date range", value=(), key="search_dates")
+
+if search_query.strip():
+    matches = get_store().search(
+        search_query,
+        language=None if search_language == "All" else search_language,
+        status=None if search_status == "All" else search_status,
+        start_date=search_dates[0] if len(search_dates) > 0 else None,
+        end_date=search_dates[-1] if len(search_dates) > 0 else None,
+        limit=SEARCH_RESULTS
+    )
+    if not matches:
+        st.info("No calls matched your search")
+    else:
+        st.caption(f"Best {len(matches)} matching calls")
+    for match in matches:
+        st.markdown(
+            f"**{match['phone']}** · {(match['language'] or '').split(' ')[0]} · "
+            f"{match['status']} · {match['created_at']}"
+        )
+        st.caption(match['snippet'])
 
 # ==========================================
 # FOOTER
@@ -0,0 +1,383 @@
+"""
+SnapSkill AI Caller - Pipeline Benchmarks
+Drives make_call_with_language, save_call_to_excel and batch dispatch
+against the local Vapi stand-in (fake_vapi.py); no real calls are placed
+Also measures cold import time of the backend modules
+
+Usage:
+    python benchmark.py                      # all benchmarks, default sizes
+    python benchmark.py --only campaign --campaign 200 --concurrency 50
+    python benchmark.py --only campaign --concurrency 40 --numbers 4 --number-limit 10
+    python benchmark.py --history 0,10000,100000 --json bench.json
+    python benchmark.py --check-imports      # exit 1 if a heavy dependency is imported eagerly
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from collections import Counter
+
+from fake_vapi import start_fake_vapi
+
+# ==========================================
+# IMPORT-TIME CONFIGURATION
+# ==========================================
+IMPORT_TARGETS = ('vapi_caller', 'campaign', 'call_store')
+# Loaded only where they are used (persistence, analytics, export, one HTTP stack per client)
+LAZY_IMPORTS = ('pandas', 'numpy', 'openpyxl', 'httpx', 'requests')
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ==========================================
+# HELPERS
+# ==========================================
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a list of numbers (None if empty)
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_stats(values):
+    """
+    p50/p95/max in milliseconds
+    """
+    return {
+        'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 2) if values else None,
+        'max_ms': round(max(values) * 1000, 2) if values else None,
+    }
+
+
+def test_phone(index):
+    return f"+9198{index:08d}"
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """
+    Swallow the pipeline's per-call prints so the report stays readable
+    """
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def print_table(title, rows):
+    print(f"\n📊 {title}")
+    print("-" * 60)
+    for name, value in rows:
+        print(f"   {name:<28} {value}")
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+def bench_pipeline(vapi_caller, calls, language, verbose=False):
+    """
+    Sequential make_call_with_language calls with per-stage latency:
+    setup (assistant lookup), dial (POST /call/phone), in-call (until the
+    end is detected) and save (transcript + queueing the history row)
+    """
+    stages = {'setup': [], 'dial': [], 'in_call': [], 'save': [], 'total': []}
+    statuses = Counter()
+    
+    for index in range(calls):
+        marks = {'start': time.perf_counter()}
+        on_update = lambda update: marks.setdefault(update['stage'], time.perf_counter())
+        with quiet(not verbose):
+            result = vapi_caller.make_call_with_language(language, test_phone(index), on_update=on_update)
+        marks['done'] = time.perf_counter()
+        statuses[result['status']] += 1
+        
+        stages['setup'].append(marks['dialing'] - marks['start'])
+        stages['dial'].append(marks['in-call'] - marks['dialing'])
+        stages['in_call'].append(marks['saving'] - marks['in-call'])
+        stages['save'].append(marks['done'] - marks['saving'])
+        stages['total'].append(marks['done'] - marks['start'])
+    
+    report = {stage: latency_stats(values) for stage, values in stages.items()}
+    report['statuses'] = dict(statuses)
+    print_table(f"Single-call pipeline ({calls} calls)", [
+        (stage, f"p50 {stats['p50_ms']} ms · p95 {stats['p95_ms']} ms · max {stats['max_ms']} ms")
+        for stage, stats in report.items() if stage != 'statuses'
+    ] + [("outcomes", dict(statuses))])
+    return report
+
+
+def bench_saves(vapi_caller, call_store, history_sizes, saves, language):
+    """
+    save_call_to_excel cost as the history grows: enqueue latency seen by the
+    caller, and rows/second the background writer sustains into the store
+    """
+    store = call_store.get_store()
+    writer = call_store.get_writer()
+    transcript = "\n".join(f"AI: question {i}\nStudent: answer {i} about the course" for i in range(20))
+    report = []
+    
+    for size in sorted(history_sizes):
+        # Grow the history to `size` rows with bulk inserts (not timed)
+        existing = store.count()
+        for start in range(existing, size, 5000):
+            store.save_calls([{
+                'call_id': f"history_{i}", 'phone': test_phone(i), 'language': language,
+                'status': 'ended', 'duration': "1m 30s", 'cost': 8.0,
+                'summary': "Student liked the course", 'transcript': transcript
+            } for i in range(start, min(start + 5000, size))])
+        
+        enqueue = []
+        started = time.perf_counter()
+        with quiet():
+            for i in range(saves):
+                t0 = time.perf_counter()
+                vapi_caller.save_call_to_excel(
+                    phone=test_phone(i), language=language, summary="Student liked the course",
+                    transcript=transcript, duration="1m 30s", cost=8.0, status='ended',
+                    call_id=f"bench_{size}_{i}"
+                )
+                enqueue.append(time.perf_counter() - t0)
+        writer.flush()
+        elapsed = time.perf_counter() - started
+        
+        report.append({
+            'history_rows': size,
+            'enqueue': latency_stats(enqueue),
+            'rows_per_second': round(saves / elapsed, 1),
+        })
+    
+    print_table(f"save_call_to_excel vs history size ({saves} saves each)", [
+        (f"{row['history_rows']:,} rows",
+         f"enqueue p50 {row['enqueue']['p50_ms']} ms · p95 {row['enqueue']['p95_ms']} ms · "
+         f"{row['rows_per_second']} rows/s stored")
+        for row in report
+    ])
+    return report
+
+
+def bench_campaign(campaign, fake, contacts, concurrency, language, use_async=False, verbose=False,
+                   retry_policy=None):
+    """
+    Batch dispatch through run_campaign (threads) or run_campaign_async
+    """
+    phones = [test_phone(100000 + i) for i in range(contacts)]
+    before = Counter(fake.requests)
+    known_calls = set(fake.calls)
+    
+    started = time.perf_counter()
+    with quiet(not verbose):
+        if use_async:
+            results = asyncio.run(campaign.run_campaign_async(phones, language, max_concurrency=concurrency,
+                                                              retry_policy=retry_policy))
+        else:
+            results = campaign.run_campaign(phones, language, max_concurrency=concurrency,
+                                            retry_policy=retry_policy)
+    elapsed = time.perf_counter() - started
+    
+    requests_made = Counter(fake.requests)
+    requests_made.subtract(before)
+    report = {
+        'mode': "async" if use_async else "threads",
+        'contacts': contacts,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        'calls_per_second': round(contacts / elapsed, 2),
+        'statuses': dict(Counter(result['status'] for result in results)),
+        'requests': {f"{method} {route}": count for (method, route), count in requests_made.items() if count},
+    }
+    report['requests_per_call'] = round(sum(requests_made.values()) / max(contacts, 1), 2)
+    report['calls_per_number'] = dict(Counter(
+        call['phoneNumberId'] for call_id, call in list(fake.calls.items()) if call_id not in known_calls
+    ))
+    
+    print_table(f"Campaign ({report['mode']}, {contacts} contacts, {concurrency} at once)", [
+        ("wall time", f"{report['seconds']} s"),
+        ("throughput", f"{report['calls_per_second']} calls/s"),
+        ("outcomes", report['statuses']),
+        ("API requests", report['requests']),
+        ("requests per call", report['requests_per_call']),
+        ("calls per number", report['calls_per_number']),
+    ])
+    return report
+
+
+def measure_import(module, repeat=5):
+    """
+    Import module in fresh interpreters; best wall time and which LAZY_IMPORTS it pulled in
+    """
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - started)\n"
+        f"print(','.join(name for name in {LAZY_IMPORTS!r} if name in sys.modules))\n"
+    )
+    # Bytecode is cached as in a normal install; the first run writes it and is not timed
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+    timings = []
+    loaded = ""
+    for attempt in range(repeat + 1):
+        output = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, env=env, capture_output=True,
+                                text=True, check=True).stdout.split("\n")
+        if attempt:
+            timings.append(float(output[0]))
+        loaded = output[1]
+    return {
+        'module': module,
+        'best_ms': round(min(timings) * 1000, 1),
+        'median_ms': round(percentile(timings, 50) * 1000, 1),
+        'eager_heavy_imports': [name for name in loaded.split(',') if name],
+    }
+
+
+def bench_imports(modules=IMPORT_TARGETS, repeat=5):
+    """
+    Cold-start import cost of the backend modules (what app.py and batch workers pay up front)
+    """
+    report = [measure_import(module, repeat) for module in modules]
+    print_table(f"Cold import time (best of {repeat} fresh interpreters)", [
+        (f"import {row['module']}",
+         f"best {row['best_ms']} ms · median {row['median_ms']} ms"
+         + (f" · loads {', '.join(row['eager_heavy_imports'])}" if row['eager_heavy_imports'] else ""))
+        for row in report
+    ])
+    return report
+
+
+def import_regressions(report, budget_ms=None):
+    """
+    Problems found by the import guard: heavy dependencies loaded at import time,
+    or (with budget_ms) imports slower than the budget
+    """
+    problems = []
+    for row in report:
+        if row['eager_heavy_imports']:
+            problems.append(f"import {row['module']} loads {', '.join(row['eager_heavy_imports'])} up front")
+        if budget_ms is not None and row['best_ms'] > budget_ms:
+            problems.append(f"import {row['module']} took {row['best_ms']} ms (budget {budget_ms} ms)")
+    return problems
+
+# ==========================================
+# MAIN
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the call pipeline against a local Vapi stand-in")
+    parser.add_argument('--only', choices=['imports', 'pipeline', 'saves', 'campaign'], action='append',
+                        help="Run only these benchmarks (repeatable)")
+    parser.add_argument('--language', default="English")
+    parser.add_argument('--calls', type=int, default=5, help="Sequential calls for the pipeline benchmark")
+    parser.add_argument('--history', default="0,10000,50000", help="Comma-separated history sizes for the save benchmark")
+    parser.add_argument('--saves', type=int, default=500, help="Saves timed at each history size")
+    parser.add_argument('--campaign', type=int, default=50, help="Contacts per campaign run")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--numbers', type=int, default=1, help="Outbound phone numbers in the pool")
+    parser.add_argument('--number-limit', type=int, default=None,
+                        help="Concurrent calls per phone number (enforced by the fake API and the pool)")
+    parser.add_argument('--retry-attempts', type=int, default=1,
+                        help="Dials per busy/unanswered contact in the campaign benchmark")
+    parser.add_argument('--retry-delay', type=float, default=2, help="Seconds before the first campaign retry")
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake API latency per request (s)")
+    parser.add_argument('--call-seconds', default="1,3", help="min,max wall-clock length of an answered call")
+    parser.add_argument('--server-rate-limit', type=float, default=None,
+                        help="Fake API answers 429 above this many requests/s")
+    parser.add_argument('--import-repeat', type=int, default=5, help="Fresh interpreters per import timing")
+    parser.add_argument('--import-budget', type=float, default=None,
+                        help="With --check-imports, also fail if an import takes longer (ms)")
+    parser.add_argument('--check-imports', action='store_true',
+                        help="Only run the import guard; exit 1 on a regression")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="Keep the pipeline's own output")
+    args = parser.parse_args(argv)
+    
+    selected = {'imports'} if args.check_imports else set(args.only or ['imports', 'pipeline', 'saves', 'campaign'])
+    results = {}
+    
+    if 'imports' in selected:
+        results['imports'] = bench_imports(repeat=args.import_repeat)
+        problems = import_regressions(results['imports'], args.import_budget)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if args.check_imports and problems:
+            return None
+    
+    if selected & {'pipeline', 'saves', 'campaign'}:
+        results.update(run_pipeline_benchmarks(args, selected))
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+    return results
+
+
+def run_pipeline_benchmarks(args, selected):
+    """
+    Start the Vapi stand-in, point the backend at it and run the selected benchmarks
+    """
+    call_seconds = tuple(float(value) for value in args.call_seconds.split(','))
+    
+    server = start_fake_vapi(latency=args.latency, call_seconds=call_seconds,
+                             rate_limit=args.server_rate_limit, number_limit=args.number_limit, seed=42)
+    
+    # Everything the pipeline writes goes to a scratch directory
+    workdir = tempfile.mkdtemp(prefix="snapskill_bench_")
+    os.chdir(workdir)
+    os.environ.update({
+        'VAPI_BASE_URL': server.url,
+        'VAPI_API_KEY': "bench-key",
+        'VAPI_PHONE_NUMBER_ID': "bench-phone-number",
+        'VAPI_PHONE_NUMBER_IDS': ",".join(f"bench-phone-number-{i + 1}" for i in range(args.numbers)),
+        'CALL_STORE_PATH': os.path.join(workdir, "call_history.db"),
+        'CAMPAIGN_QUEUE_PATH': os.path.join(workdir, "campaign_jobs.db"),
+        'VAPI_NUMBER_POOL_PATH': os.path.join(workdir, "number_slots.db"),
+    })
+    # Client-side limits stay out of the way unless the fake API enforces one
+    if args.number_limit:
+        os.environ['VAPI_NUMBER_MAX_CONCURRENCY'] = str(args.number_limit)
+    os.environ.setdefault('VAPI_NUMBER_MAX_CONCURRENCY', "1000")
+    for name in ('VAPI_CALL_RATE', 'VAPI_READ_RATE', 'VAPI_WRITE_RATE'):
+        os.environ.setdefault(name, "1000")
+    for name in ('VAPI_CALL_BURST', 'VAPI_READ_BURST', 'VAPI_WRITE_BURST'):
+        os.environ.setdefault(name, "1000")
+    
+    import vapi_caller
+    import call_store
+    import campaign
+    import telemetry
+    from scheduler import RetryPolicy
+    
+    print(f"🧪 Fake Vapi at {server.url} · latency {args.latency * 1000:.0f} ms · "
+          f"calls last {call_seconds[0]:g}-{call_seconds[-1]:g} s · scratch dir {workdir}")
+    
+    results = {}
+    if 'pipeline' in selected:
+        results['pipeline'] = bench_pipeline(vapi_caller, args.calls, args.language, args.verbose)
+    if 'saves' in selected:
+        sizes = [int(size) for size in args.history.split(',') if size.strip()]
+        results['saves'] = bench_saves(vapi_caller, call_store, sizes, args.saves, args.language)
+    if 'campaign' in selected:
+        results['campaign'] = [
+            bench_campaign(campaign, server.fake, args.campaign, args.concurrency, args.language,
+                           use_async=use_async, verbose=args.verbose,
+                           retry_policy=RetryPolicy(args.retry_attempts, base_delay=args.retry_delay))
+            for use_async in (False, True)
+        ]
+    
+    call_store.get_writer().flush()
+    server.stop()
+    results['metrics'] = telemetry.registry.snapshot()
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() is not None else 1)
@@ -0,0 +1,501 @@
+"""
+SnapSkill AI Caller - Call Events
+Webhook receiver for Vapi server-URL events (status-update, end-of-call-report)
+and a multiplexed status poller used when webhooks are unavailable
+Waiting callers get their final call payload as soon as either source reports it
+"""
+
+import os
+import json
+import hmac
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telemetry import STATUS_POLLS, get_logger
+
+log = get_logger("call_events")
+
+# ==========================================
+# WEBHOOK CONFIGURATION
+# ==========================================
+VAPI_WEBHOOK_URL = os.getenv('VAPI_WEBHOOK_URL')        # Public URL Vapi posts events to
+VAPI_WEBHOOK_SECRET = os.getenv('VAPI_WEBHOOK_SECRET')  # Sent by Vapi as X-Vapi-Secret
+VAPI_WEBHOOK_HOST = os.getenv('VAPI_WEBHOOK_HOST', '127.0.0.1')  # Put a tunnel or proxy in front to expose it
+VAPI_WEBHOOK_PORT = int(os.getenv('VAPI_WEBHOOK_PORT', 8765))
+VAPI_WEBHOOK_MAX_BODY = int(os.getenv('VAPI_WEBHOOK_MAX_BODY', 5 * 1024 * 1024))  # Bytes per event
+
+TERMINAL_STATUSES = ['ended', 'completed', 'failed', 'busy', 'no-answer']
+# Vapi ends every call with status 'ended'; these endedReason fragments narrow it down
+ENDED_REASON_STATUSES = [
+    (('customer-busy',), 'busy'),
+    (('customer-did-not-answer', 'voicemail'), 'no-answer'),
+    (('failed-to-connect', 'pipeline-error', 'assistant-error',
+      'call.start.error', 'call.in-progress.error'), 'failed'),
+]
+CLOCK_SKEW_SECONDS = 300  # Margin on the createdAtGe filter of the list request
+
+# ==========================================
+# CALL WAITERS
+# ==========================================
+class CallWaiters:
+    """
+    Thread-safe map of call_id -> Future completed with the final call payload
+    Events that arrive before anyone waits on the call are kept (bounded)
+    so a webhook racing the POST /call/phone response is not lost
+    """
+    
+    def __init__(self, max_early_events=1000):
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._statuses = {}
+        self._early = OrderedDict()
+        self._max_early_events = max_early_events
+    
+    def watch(self, call_id):
+        """
+        Return the Future for call_id, creating it if needed
+        """
+        with self._lock:
+            future = self._futures.get(call_id)
+            if future is None:
+                future = Future()
+                self._futures[call_id] = future
+                if call_id in self._early:
+                    future.set_result(self._early.pop(call_id))
+            return future
+    
+    def resolve(self, call_id, call_data):
+        """
+        Complete the waiter for call_id with its final payload
+        Returns True if someone was waiting on the call
+        """
+        with self._lock:
+            future = self._futures.get(call_id)
+            if future is None:
+                self._early[call_id] = call_data
+                while len(self._early) > self._max_early_events:
+                    self._early.popitem(last=False)
+                return False
+            self._statuses[call_id] = call_data.get('status', 'ended')
+        if not future.done():
+            future.set_result(call_data)
+        return True
+    
+    def update_status(self, call_id, status):
+        """
+        Remember the latest status of a watched call (events for other calls are ignored,
+        so the map only ever holds calls someone is waiting on until they are discarded)
+        """
+        with self._lock:
+            if call_id in self._futures:
+                self._statuses[call_id] = status
+    
+    def last_status(self, call_id):
+        with self._lock:
+            return self._statuses.get(call_id)
+    
+    def discard(self, call_id):
+        """
+        Stop tracking call_id once its caller has the result
+        """
+        with self._lock:
+            self._futures.pop(call_id, None)
+            self._statuses.pop(call_id, None)
+            self._early.pop(call_id, None)
+    
+    def watching(self):
+        with self._lock:
+            return [call_id for call_id, future in self._futures.items() if not future.done()]
+
+
+call_waiters = CallWaiters()
+
+# ==========================================
+# EVENT PARSING
+# ==========================================
+def outcome_status(status, ended_reason=None):
+    """
+    Final status to record for a call: 'ended' becomes busy / no-answer / failed
+    when its endedReason says so, any other status is kept as is
+    """
+    if status != 'ended' or not ended_reason:
+        return status
+    for fragments, outcome in ENDED_REASON_STATUSES:
+        if any(fragment in ended_reason for fragment in fragments):
+            return outcome
+    return status
+
+
+def classify_call(call_data):
+    """
+    Record a finished call's status from its endedReason, so a call reads the same
+    whether the webhook or a poll reported it
+    """
+    call_data['status'] = outcome_status(call_data.get('status', 'ended'), call_data.get('endedReason'))
+    return call_data
+
+
+def call_data_from_report(message):
+    """
+    Convert an end-of-call-report message into the shape GET /call/{id} returns
+    so the rest of the pipeline can treat both sources the same way
+    """
+    call = dict(message.get('call') or {})
+    artifact = message.get('artifact') or {}
+    analysis = message.get('analysis') or call.get('analysis') or {}
+    
+    call['endedReason'] = message.get('endedReason', call.get('endedReason'))
+    call['status'] = 'ended'
+    for key in ['startedAt', 'endedAt', 'cost']:
+        if message.get(key) is not None:
+            call[key] = message[key]
+    if message.get('durationSeconds') is not None:
+        call['duration'] = int(message['durationSeconds'])
+    
+    transcript = artifact.get('transcript') or message.get('transcript')
+    if transcript:
+        call['transcript'] = transcript
+    messages = artifact.get('messages') or message.get('messages')
+    if messages:
+        call['messages'] = messages
+    recording_url = artifact.get('recordingUrl') or message.get('recordingUrl')
+    if recording_url:
+        call['recordingUrl'] = recording_url
+    if analysis:
+        call['analysis'] = analysis
+        if analysis.get('summary'):
+            call['summary'] = analysis['summary']
+    
+    return classify_call(call)
+
+
+def handle_event(event, waiters=call_waiters):
+    """
+    Apply one Vapi server-URL event to the waiters
+    Returns the event type that was handled
+    """
+    message = event.get('message', event)
+    event_type = message.get('type')
+    call_id = (message.get('call') or {}).get('id')
+    
+    if not call_id:
+        return event_type
+    
+    if event_type == 'status-update':
+        # Terminal status-updates arrive before the report, which carries
+        # the duration and transcript, so only the report completes a waiter
+        waiters.update_status(call_id, message.get('status', 'unknown'))
+    elif event_type == 'end-of-call-report':
+        waiters.resolve(call_id, call_data_from_report(message))
+    
+    return event_type
+
+# ==========================================
+# MULTIPLEXED STATUS POLLER
+# ==========================================
+class StatusPoller:
+    """
+    One background thread that refreshes every watched call with a single
+    GET /call?createdAtGe=... request per tick (fallback when webhooks are off)
+    The tick adapts: fast right after a call is placed or changes status (short calls
+    end within seconds), backing off while it rings or talks, fast again near its expected end
+    """
+    
+    def __init__(self, client_factory, waiters=call_waiters,
+                 min_interval=1, initial_interval=3, max_interval=10,
+                 expected_duration=120, ring_timeout=30, page_limit=1000):
+        self._client_factory = client_factory
+        self._waiters = waiters
+        self.min_interval = min_interval
+        self.initial_interval = initial_interval    # Same as the old fixed 3s polling loop
+        self.max_interval = max_interval
+        self.expected_duration = expected_duration  # Typical answered call (seconds)
+        self.ring_timeout = ring_timeout            # When an unanswered call gives up
+        self.page_limit = page_limit
+        self.requests_made = 0
+        
+        self._cond = threading.Condition()
+        self._watched = {}  # call_id -> {'since': ..., 'status': ..., 'watched_at': ...}
+        self._thread = None
+    
+    def watch(self, call_id):
+        """
+        Track call_id until it reaches a terminal status
+        Returns the Future completed with the final call payload
+        """
+        future = self._waiters.watch(call_id)
+        now = time.time()
+        with self._cond:
+            self._watched.setdefault(call_id, {'status': 'queued', 'since': now, 'watched_at': now, 'polls': 0})
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vapi-status-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+    
+    def unwatch(self, call_id):
+        with self._cond:
+            state = self._watched.pop(call_id, None)
+        if state is not None:
+            STATUS_POLLS.observe(state['polls'], mode='multiplexed')
+    
+    def watching(self):
+        with self._cond:
+            return list(self._watched)
+    
+    def next_interval(self, now=None):
+        """
+        Seconds until the next tick, based on the call closest to its expected end
+        """
+        now = now or time.time()
+        with self._cond:
+            states = list(self._watched.values())
+        if not states:
+            return self.max_interval
+        
+        intervals = []
+        for state in states:
+            if state['status'] == 'in-progress':
+                expected_end = state['since'] + self.expected_duration
+            else:
+                expected_end = state['since'] + self.ring_timeout
+            # Back off from initial_interval as the status ages, and poll a few
+            # times over whatever is left of the expected window
+            backoff = max(self.initial_interval, (now - state['since']) / 2)
+            intervals.append(min(backoff, (expected_end - now) / 3))
+        
+        return max(self.min_interval, min(self.max_interval, min(intervals)))
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._watched:
+                    self._thread = None
+                    return
+            try:
+                self.tick()
+            except Exception as e:
+                log.warning("⚠️ Status poller tick failed: %s", e)
+            interval = self.next_interval()
+            with self._cond:
+                self._cond.wait(timeout=interval)
+    
+    def tick(self):
+        """
+        Refresh every watched call; returns the ids that reached a terminal status
+        """
+        with self._cond:
+            watched = dict(self._watched)
+        if not watched:
+            return []
+        
+        # Clock skew margin so calls created just before we started watching are included
+        created_after = datetime.fromtimestamp(
+            min(state['watched_at'] for state in watched.values()) - CLOCK_SKEW_SECONDS,
+            tz=timezone.utc
+        )
+        client = self._client_factory()
+        response = client.get("/call", params={
+            'createdAtGe': created_after.isoformat().replace('+00:00', 'Z'),
+            'limit': self.page_limit
+        })
+        self.requests_made += 1
+        
+        calls = {}
+        if response.status_code == 200:
+            calls = {call.get('id'): call for call in response.json()}
+        
+        # Anything the list did not return (page limit, API hiccup) is fetched directly
+        for call_id in watched:
+            if call_id not in calls:
+                single = client.get(f"/call/{call_id}")
+                self.requests_made += 1
+                if single.status_code == 200:
+                    calls[call_id] = single.json()
+        
+        finished = []
+        now = time.time()
+        for call_id, state in watched.items():
+            state['polls'] += 1
+            call_data = calls.get(call_id)
+            if not call_data:
+                continue
+            status = call_data.get('status', 'unknown')
+            if status in TERMINAL_STATUSES:
+                finished.append(call_id)
+                self._waiters.resolve(call_id, classify_call(call_data))
+                continue
+            self._waiters.update_status(call_id, status)
+            if status != state['status']:
+                with self._cond:
+                    if call_id in self._watched:
+                        self._watched[call_id].update(status=status, since=now)
+        
+        with self._cond:
+            for call_id in finished:
+                state = self._watched.pop(call_id, None)
+                if state is not None:
+                    STATUS_POLLS.observe(state['polls'], mode='multiplexed')
+        return finished
+
+# ==========================================
+# WEBHOOK SERVER
+# ==========================================
+class _WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass  # Keep stdout for call progress
+    
+    def _reply(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _refuse(self, code, error):
+        # The body is left unread, so the connection cannot be reused
+        self.close_connection = True
+        self._reply(code, {"error": error})
+    
+    def do_POST(self):
+        secret = self.server.secret
+        if secret and not hmac.compare_digest(self.headers.get('X-Vapi-Secret', ''), secret):
+            return self._refuse(401, "invalid secret")
+        
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            return self._refuse(400, "missing or invalid Content-Length")
+        if length < 0:
+            return self._refuse(400, "missing or invalid Content-Length")
+        if length > self.server.max_body:
+            return self._refuse(413, "event too large")
+        body = self.rfile.read(length)
+        
+        try:
+            event = json.loads(body or b'{}')
+        except ValueError:
+            return self._reply(400, {"error": "invalid JSON"})
+        
+        event_type = handle_event(event, self.server.waiters)
+        self._reply(200, {"received": event_type})
+    
+    def do_GET(self):
+        # Health check for load balancers / tunnels
+        self._reply(200, {"ok": True, "watching": len(self.server.waiters.watching())})
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, host, port, waiters=call_waiters, secret=VAPI_WEBHOOK_SECRET,
+                 max_body=VAPI_WEBHOOK_MAX_BODY):
+        super().__init__((host, port), _WebhookHandler)
+        self.waiters = waiters
+        self.secret = secret
+        self.max_body = max_body
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+_webhook_server = None
+_webhook_lock = threading.Lock()
+
+
+def start_webhook_server(host=VAPI_WEBHOOK_HOST, port=VAPI_WEBHOOK_PORT,
+                         public_url=VAPI_WEBHOOK_URL, secret=VAPI_WEBHOOK_SECRET):
+    """
+    Start the webhook receiver in a background thread (once per process)
+    Point the Vapi server URL (VAPI_WEBHOOK_URL) at this endpoint
+    A receiver reachable from outside must check VAPI_WEBHOOK_SECRET, or anyone
+    could post a fake end-of-call report
+    """
+    if public_url and not secret:
+        raise RuntimeError("VAPI_WEBHOOK_SECRET is required when VAPI_WEBHOOK_URL is set")
+    
+    global _webhook_server
+    with _webhook_lock:
+        if _webhook_server is None:
+            server = WebhookServer(host, port, secret=secret)
+            threading.Thread(target=server.serve_forever, name="vapi-webhook", daemon=True).start()
+            _webhook_server = server
+            log.info("🔔 Webhook receiver listening on %s", server.url)
+    return _webhook_server
+
+
+def stop_webhook_server():
+    global _webhook_server
+    with _webhook_lock:
+        if _webhook_server is not None:
+            _webhook_server.shutdown()
+            _webhook_server.server_close()
+            _webhook_server = None
+
+
+def webhooks_enabled():
+    return _webhook_server is not None
+
+# ==========================================
+# LOCAL STAND-IN (TEST)
+# ==========================================
+SAMPLE_STATUS_UPDATE = {
+    "message": {
+        "type": "status-update",
+        "status": "in-progress",
+        "call": {"id": "call_sample_001"}
+    }
+}
+
+SAMPLE_END_OF_CALL_REPORT = {
+    "message": {
+        "type": "end-of-call-report",
+        "endedReason": "customer-ended-call",
+        "call": {"id": "call_sample_001"},
+        "startedAt": "2025-01-01T10:00:00.000Z",
+        "endedAt": "2025-01-01T10:01:45.000Z",
+        "durationSeconds": 105,
+        "artifact": {
+            "transcript": "AI: Hello! I'm calling from SnapSkill.\nStudent: The course was great.",
+            "recordingUrl": "https://example.com/recording.wav"
+        },
+        "analysis": {"summary": "Student liked the course."}
+    }
+}
+
+
+def post_sample_events(url, events=(SAMPLE_STATUS_UPDATE, SAMPLE_END_OF_CALL_REPORT), secret=VAPI_WEBHOOK_SECRET):
+    """
+    Stand-in for Vapi: POST sample server-URL events to a webhook receiver
+    """
+    import requests
+    
+    headers = {"X-Vapi-Secret": secret} if secret else {}
+    for event in events:
+        response = requests.post(url, json=event, headers=headers, timeout=5)
+        print(f"   POST {event['message']['type']} → {response.status_code}")
+
+
+if __name__ == "__main__":
+    server = start_webhook_server(host="127.0.0.1", port=0, public_url=None)
+    future = call_waiters.watch("call_sample_001")
+    
+    started = time.perf_counter()
+    post_sample_events(server.url)
+    call_data = future.result(timeout=5)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    print(f"\n✅ Waiter completed in {elapsed_ms:.1f} ms")
+    print(f"   Status: {call_data['status']} ({call_data['endedReason']})")
+    print(f"   Duration: {call_data['duration']}s")
+    print(f"   Summary: {call_data['summary']}")
+    stop_webhook_server()
@@ -0,0 +1,952 @@
+"""
+SnapSkill AI Caller - Call Store
+Append-only SQLite history of every call, written behind the call path
+by a background writer thread
+call_summaries.xlsx is exported from this store on demand
+Transcripts and raw call JSON are kept compressed, out of line from the call rows
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import queue
+import atexit
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+
+from telemetry import STORE_ROWS, STORE_WRITE_SECONDS, get_logger
+
+log = get_logger("call_store")
+
+# ==========================================
+# STORE CONFIGURATION
+# ==========================================
+CALL_STORE_PATH = os.getenv('CALL_STORE_PATH', 'call_history.db')
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # DELETE when the databases live on a network share
+EXCEL_EXPORT_FILE = "call_summaries.xlsx"
+
+# (store column, Excel header, Excel column width) in the original workbook layout
+EXCEL_COLUMNS = [
+    ('created_at', 'Date & Time', 20),
+    ('phone', 'Phone Number', 15),
+    ('language', 'Language', 12),
+    ('status', 'Status', 12),
+    ('duration', 'Duration', 12),
+    ('cost', 'Cost (₹)', 12),
+    ('summary', 'Summary', 50),
+    ('call_id', 'Call ID', 30),
+]
+LEGACY_EXCEL_HEADERS = {'Full Transcript': 'transcript'}  # Workbooks written before transcripts moved out
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id          TEXT PRIMARY KEY,
+    created_at       TEXT NOT NULL,
+    phone            TEXT,
+    language         TEXT,
+    status           TEXT,
+    duration         TEXT,
+    duration_seconds INTEGER,
+    cost             REAL,
+    summary          TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_created_at ON calls (created_at);
+CREATE INDEX IF NOT EXISTS idx_calls_language ON calls (language, created_at);
+CREATE INDEX IF NOT EXISTS idx_calls_status ON calls (status, created_at);
+"""
+
+STORE_COLUMNS = ['call_id', 'created_at', 'phone', 'language', 'status', 'duration',
+                 'duration_seconds', 'cost', 'summary']
+
+UPSERT_SQL = """
+INSERT INTO calls (call_id, created_at, phone, language, status, duration,
+                   duration_seconds, cost, summary)
+VALUES (:call_id, :created_at, :phone, :language, :status, :duration,
+        :duration_seconds, :cost, :summary)
+ON CONFLICT (call_id) DO UPDATE SET
+    phone = excluded.phone,
+    language = excluded.language,
+    status = excluded.status,
+    duration = excluded.duration,
+    duration_seconds = excluded.duration_seconds,
+    cost = excluded.cost,
+    summary = excluded.summary
+"""
+
+
+def parse_duration(duration):
+    """
+    Convert the "1m 45s" display format back to seconds
+    """
+    match = re.match(r'^\s*(\d+)m\s+(\d+)s\s*$', str(duration or ''))
+    if not match:
+        return None
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def filter_clauses(start_date=None, end_date=None, language=None, status=None):
+    """
+    SQL conditions and parameters for the indexed date/language/status filters
+    Dates are inclusive 'YYYY-MM-DD' strings
+    """
+    clauses = []
+    params = []
+    if start_date:
+        clauses.append("created_at >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("created_at < date(?, '+1 day')")
+        params.append(str(end_date))
+    if language:
+        clauses.append("language = ?")
+        params.append(language)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    return clauses, params
+
+
+def build_filters(start_date=None, end_date=None, language=None, status=None):
+    """
+    WHERE clause and parameters for the indexed date/language/status filters
+    """
+    clauses, params = filter_clauses(start_date, end_date, language, status)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+# ==========================================
+# TRANSCRIPT BLOBS
+# ==========================================
+# Transcripts and raw call JSON are most of the bytes of a call, so they are
+# stored zlib-compressed in their own table keyed by call_id and only read
+# when someone actually opens a transcript
+BLOB_COMPRESSION_LEVEL = 6
+
+TRANSCRIPT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS call_transcripts (
+    call_id    TEXT PRIMARY KEY,
+    transcript BLOB,
+    raw_data   BLOB
+);
+"""
+
+TRANSCRIPT_UPSERT_SQL = """
+INSERT INTO call_transcripts (call_id, transcript, raw_data)
+VALUES (?, ?, ?)
+ON CONFLICT (call_id) DO UPDATE SET
+    transcript = COALESCE(excluded.transcript, transcript),
+    raw_data = COALESCE(excluded.raw_data, raw_data)
+"""
+
+
+def compress_blob(value):
+    """
+    zlib-compress a string (or JSON-serialisable object); empty values give None
+    """
+    if not value:
+        return None
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return zlib.compress(value.encode('utf-8'), BLOB_COMPRESSION_LEVEL)
+
+
+def decompress_blob(blob):
+    """
+    Inverse of compress_blob for strings
+    """
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+# ==========================================
+# SEARCH INDEX
+# ==========================================
+# Contentless FTS5 index over summary + transcript, maintained in the same
+# transaction as each save, so the text itself is only stored compressed.
+# Telugu and Devanagari vowel signs and viramas count as token characters;
+# otherwise unicode61 would split words at every matra
+INDIC_SCRIPT_RANGES = [(0x0900, 0x0980), (0x0C00, 0x0C80)]  # Devanagari, Telugu
+SEARCH_TOKEN_CHARS = ''.join(
+    chr(code) for start, end in INDIC_SCRIPT_RANGES for code in range(start, end)
+    if unicodedata.category(chr(code)).startswith('M')
+)
+SNIPPET_CHARS = 120
+
+# call_search gives each call a stable integer rowid for the index (VACUUM may renumber calls)
+SEARCH_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS call_search (
+    doc_id  INTEGER PRIMARY KEY,
+    call_id TEXT NOT NULL UNIQUE
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5(
+    summary, transcript, content='',
+    tokenize="unicode61 remove_diacritics 2 tokenchars '{SEARCH_TOKEN_CHARS}'"
+);
+"""
+
+SEARCH_DOCUMENTS_SQL = """
+SELECT call_search.doc_id, calls.summary, call_transcripts.transcript
+FROM calls
+JOIN call_search USING (call_id)
+LEFT JOIN call_transcripts USING (call_id)
+"""
+
+
+def search_documents(conn, call_ids=None):
+    """
+    (doc_id, summary, transcript) rows exactly as they are indexed
+    """
+    sql, params = SEARCH_DOCUMENTS_SQL, []
+    if call_ids is not None:
+        sql += f"WHERE calls.call_id IN ({', '.join('?' for _ in call_ids)})"
+        params = list(call_ids)
+    return [(doc_id, summary or '', decompress_blob(transcript) or '')
+            for doc_id, summary, transcript in conn.execute(sql, params)]
+
+
+def reindex_calls(conn, call_ids, previous):
+    """
+    Replace the index entries of call_ids; previous is search_documents()
+    for them taken before the save (contentless deletes need the old text)
+    """
+    conn.executemany(
+        "INSERT INTO calls_fts (calls_fts, rowid, summary, transcript) VALUES ('delete', ?, ?, ?)", previous
+    )
+    conn.executemany("INSERT OR IGNORE INTO call_search (call_id) VALUES (?)", [(c,) for c in call_ids])
+    conn.executemany(
+        "INSERT INTO calls_fts (rowid, summary, transcript) VALUES (?, ?, ?)", search_documents(conn, call_ids)
+    )
+
+
+def build_match(query):
+    """
+    FTS5 MATCH expression: every word must appear, as a word or word prefix
+    """
+    terms = [term.replace('"', '') for term in str(query or '').split()]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+def make_snippet(text, query, width=SNIPPET_CHARS):
+    """
+    Window of text around the first search hit, hits in **bold**
+    """
+    if not text:
+        return ""
+    terms = [term.replace('"', '') for term in str(query or '').split() if term.replace('"', '')]
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    match = pattern.search(text) if pattern else None
+    start = max(0, match.start() - width // 3) if match else 0
+    snippet = text[start:start + width].replace("\n", " ")
+    if pattern:
+        snippet = pattern.sub(lambda hit: f"**{hit.group(0)}**", snippet)
+    return ("…" if start else "") + snippet + ("…" if start + width < len(text) else "")
+
+# ==========================================
+# ANALYTICS ROLLUP
+# ==========================================
+# Per day + language aggregates maintained in the same transaction as each
+# save, so the analytics page never scans the calls table
+SUCCESS_STATUSES = ['ended', 'completed']
+UNANSWERED_STATUSES = ['busy', 'no-answer', 'failed', 'timeout']
+DURATION_BUCKET_SECONDS = 5
+DURATION_BUCKETS = 121  # 0-600s in 5s buckets, last bucket holds longer calls
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    day            TEXT NOT NULL,
+    language       TEXT NOT NULL,
+    calls          INTEGER NOT NULL DEFAULT 0,
+    answered       INTEGER NOT NULL DEFAULT 0,
+    succeeded      INTEGER NOT NULL DEFAULT 0,
+    total_duration INTEGER NOT NULL DEFAULT 0,
+    total_cost     REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, language)
+);
+CREATE TABLE IF NOT EXISTS duration_histogram (
+    day      TEXT NOT NULL,
+    language TEXT NOT NULL,
+    bucket   INTEGER NOT NULL,
+    calls    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, language, bucket)
+);
+"""
+
+ROLLUP_UPSERT_SQL = """
+INSERT INTO daily_rollup (day, language, calls, answered, succeeded, total_duration, total_cost)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, language) DO UPDATE SET
+    calls = calls + excluded.calls,
+    answered = answered + excluded.answered,
+    succeeded = succeeded + excluded.succeeded,
+    total_duration = total_duration + excluded.total_duration,
+    total_cost = total_cost + excluded.total_cost
+"""
+
+HISTOGRAM_UPSERT_SQL = """
+INSERT INTO duration_histogram (day, language, bucket, calls)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (day, language, bucket) DO UPDATE SET calls = calls + excluded.calls
+"""
+
+
+ROLLUP_COLUMNS = "created_at, language, status, duration_seconds, cost"
+
+
+def _as_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _as_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if number == number else 0.0  # NaN counts as 0
+
+
+def rollup_deltas(rows, sign):
+    """
+    Per (day, language) contributions of calls given as ROLLUP_COLUMNS tuples
+    sign is +1 for rows being added and -1 for rows being replaced
+    Returns (rollup rows, histogram rows) ready for executemany
+    Plain Python so that saving a call never has to load pandas
+    """
+    rollup = {}
+    histogram = {}
+    for created_at, language, status, duration_seconds, cost in rows:
+        day = str(created_at)[:10]
+        language = 'Unknown' if language is None else language
+        duration = _as_int(duration_seconds)
+        
+        totals = rollup.setdefault((day, language), [0, 0, 0, 0, 0.0])
+        totals[0] += sign
+        totals[1] += sign * (duration > 0 and status not in UNANSWERED_STATUSES)
+        totals[2] += sign * (status in SUCCESS_STATUSES)
+        totals[3] += sign * duration
+        totals[4] += sign * _as_float(cost)
+        
+        key = (day, language, min(duration // DURATION_BUCKET_SECONDS, DURATION_BUCKETS - 1))
+        histogram[key] = histogram.get(key, 0) + sign
+    
+    return (
+        [key + tuple(totals) for key, totals in rollup.items()],
+        [key + (calls,) for key, calls in histogram.items()]
+    )
+
+
+def apply_rollup(conn, old_rows, new_rows):
+    """
+    Move the aggregates from old_rows (calls being overwritten) to new_rows
+    """
+    for rows, sign in ((old_rows, -1), (new_rows, 1)):
+        rollup_rows, histogram_rows = rollup_deltas(rows, sign)
+        conn.executemany(ROLLUP_UPSERT_SQL, rollup_rows)
+        conn.executemany(HISTOGRAM_UPSERT_SQL, histogram_rows)
+
+
+def duration_percentiles(histogram, percentiles=(50, 90, 99)):
+    """
+    Duration percentiles (seconds, bucket upper edge) per group of a histogram frame
+    histogram has columns [group..., bucket, calls]; returns one row per group
+    """
+    import numpy as np
+    import pandas as pd
+    
+    group_columns = [c for c in histogram.columns if c not in ('bucket', 'calls')]
+    if histogram.empty:
+        return pd.DataFrame(columns=group_columns + [f"p{p}" for p in percentiles])
+    
+    matrix = histogram.pivot_table(index=group_columns, columns='bucket', values='calls',
+                                   aggfunc='sum', fill_value=0)
+    matrix = matrix.reindex(columns=range(DURATION_BUCKETS), fill_value=0)
+    counts = matrix.to_numpy()
+    cumulative = counts.cumsum(axis=1)
+    totals = cumulative[:, -1:]
+    
+    result = pd.DataFrame(index=matrix.index)
+    for p in percentiles:
+        reached = cumulative >= np.maximum(totals * p / 100, 1)
+        bucket = reached.argmax(axis=1)
+        result[f"p{p}"] = np.where(totals[:, 0] > 0, (bucket + 1) * DURATION_BUCKET_SECONDS, np.nan)
+    return result.reset_index()
+
+# ==========================================
+# CALL STORE
+# ==========================================
+class CallStore:
+    """
+    SQLite call history keyed by call_id
+    Each save is an O(1) indexed upsert regardless of history size
+    """
+    
+    def __init__(self, path=CALL_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            conn.executescript(ROLLUP_SCHEMA)
+            conn.executescript(TRANSCRIPT_SCHEMA)
+            conn.executescript(SEARCH_SCHEMA)
+    
+    def connection(self):
+        """
+        Per-thread connection (sqlite3 connections must not be shared across threads)
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def save_call(self, call_id, phone, language, status, duration, cost, summary, transcript,
+                  created_at=None, duration_seconds=None):
+        """
+        Insert a call, or update it if call_id is already stored
+        """
+        self.save_calls([{
+            'call_id': call_id,
+            'created_at': created_at,
+            'phone': phone,
+            'language': language,
+            'status': status,
+            'duration': duration,
+            'duration_seconds': duration_seconds,
+            'cost': cost,
+            'summary': summary,
+            'transcript': transcript
+        }])
+    
+    def save_calls(self, rows):
+        """
+        Upsert many calls in one transaction
+        A row's 'transcript' and 'raw_data' (call JSON) go to the compressed blob table
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        records = []
+        blobs = []
+        for row in rows:
+            record = {column: row.get(column) for column in STORE_COLUMNS}
+            record['created_at'] = record.get('created_at') or now
+            if record.get('duration_seconds') is None:
+                record['duration_seconds'] = parse_duration(record.get('duration'))
+            records.append(record)
+            
+            transcript = compress_blob(row.get('transcript'))
+            raw_data = compress_blob(row.get('raw_data'))
+            if transcript or raw_data:
+                blobs.append((record['call_id'], transcript, raw_data))
+        
+        conn = self.connection()
+        with conn:
+            # Rows being overwritten keep their created_at and leave the rollup first
+            call_ids = [record['call_id'] for record in records]
+            placeholders = ", ".join("?" for _ in call_ids)
+            old_rows = conn.execute(
+                f"SELECT call_id, {ROLLUP_COLUMNS} FROM calls WHERE call_id IN ({placeholders})", call_ids
+            ).fetchall()
+            previous_documents = search_documents(conn, call_ids) if old_rows else []
+            created = {row['call_id']: row['created_at'] for row in old_rows}
+            new_rows = [
+                (created.get(record['call_id']) or record['created_at'], record['language'],
+                 record['status'], record['duration_seconds'], record['cost'])
+                for record in records
+            ]
+            
+            conn.executemany(UPSERT_SQL, records)
+            conn.executemany(TRANSCRIPT_UPSERT_SQL, blobs)
+            reindex_calls(conn, call_ids, previous_documents)
+            apply_rollup(conn, [tuple(row)[1:] for row in old_rows], new_rows)
+    
+    def get_transcript(self, call_id):
+        """
+        Full transcript text of a call, or None if none was stored
+        """
+        row = self.connection().execute(
+            "SELECT transcript FROM call_transcripts WHERE call_id = ?", (call_id,)
+        ).fetchone()
+        return decompress_blob(row[0]) if row else None
+    
+    def get_raw_data(self, call_id):
+        """
+        Stored Vapi call payload of a call, or None if none was stored
+        """
+        row = self.connection().execute(
+            "SELECT raw_data FROM call_transcripts WHERE call_id = ?", (call_id,)
+        ).fetchone()
+        raw_data = decompress_blob(row[0]) if row else None
+        return json.loads(raw_data) if raw_data else None
+    
+    def search(self, query, start_date=None, end_date=None, language=None, status=None, limit=20):
+        """
+        Calls whose summary or transcript contain every word of query (prefix match,
+        any script), best match first, with a 'snippet' around the first hit
+        The date/language/status filters run inside the same index query
+        """
+        match = build_match(query)
+        if not match:
+            return []
+        
+        clauses, params = filter_clauses(start_date, end_date, language, status)
+        conditions = "".join(f" AND {clause}" for clause in clauses)
+        rows = self.connection().execute(f"""
+            SELECT calls.*, call_transcripts.transcript AS transcript_blob
+            FROM calls_fts
+            JOIN call_search ON call_search.doc_id = calls_fts.rowid
+            JOIN calls ON calls.call_id = call_search.call_id
+            LEFT JOIN call_transcripts ON call_transcripts.call_id = calls.call_id
+            WHERE calls_fts MATCH ?{conditions}
+            ORDER BY bm25(calls_fts)
+            LIMIT ?
+        """, [match, *params, int(limit)]).fetchall()
+        
+        results = []
+        for row in rows:
+            call = dict(row)
+            transcript = decompress_blob(call.pop('transcript_blob'))
+            summary_snippet = make_snippet(call.get('summary'), query)
+            call['snippet'] = summary_snippet if '**' in summary_snippet else make_snippet(transcript, query)
+            results.append(call)
+        return results
+    
+    def daily_rollup(self, start_date=None, end_date=None):
+        """
+        Materialised per day + language aggregates and duration histogram
+        Returns (rollup DataFrame, histogram DataFrame)
+        """
+        import pandas as pd
+        
+        clauses, params = [], []
+        if start_date:
+            clauses.append("day >= ?")
+            params.append(str(start_date))
+        if end_date:
+            clauses.append("day <= ?")
+            params.append(str(end_date))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        conn = self.connection()
+        rollup = pd.read_sql_query(f"SELECT * FROM daily_rollup {where} ORDER BY day", conn, params=params)
+        histogram = pd.read_sql_query(
+            f"SELECT * FROM duration_histogram {where} AND calls > 0" if where
+            else "SELECT * FROM duration_histogram WHERE calls > 0",
+            conn, params=params
+        )
+        return rollup, histogram
+    
+    def get_call(self, call_id):
+        row = self.connection().execute(
+            "SELECT * FROM calls WHERE call_id = ?", (call_id,)
+        ).fetchone()
+        return dict(row) if row else None
+    
+    def count(self, **filters):
+        where, params = build_filters(**filters)
+        return self.connection().execute(f"SELECT COUNT(*) FROM calls {where}", params).fetchone()[0]
+    
+    def query(self, start_date=None, end_date=None, language=None, status=None, limit=None):
+        """
+        Calls matching the filters, newest first
+        """
+        where, params = build_filters(start_date, end_date, language, status)
+        sql = f"SELECT * FROM calls {where} ORDER BY created_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(row) for row in self.connection().execute(sql, params)]
+    
+    def iter_calls(self, start_date=None, end_date=None, language=None, status=None,
+                   chunk_size=1000):
+        """
+        Yield calls oldest first as tuples in EXCEL_COLUMNS order,
+        fetching chunk_size rows at a time so memory stays flat
+        """
+        where, params = build_filters(start_date, end_date, language, status)
+        columns = ", ".join(column for column, _, _ in EXCEL_COLUMNS)
+        # Dedicated connection: the export may run while this thread also writes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute(f"SELECT {columns} FROM calls {where} ORDER BY created_at", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def summary(self):
+        """
+        Totals shown in the app sidebar: all calls, today's calls and spend
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        row = self.connection().execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(cost), 0),
+                   COALESCE(SUM(CASE WHEN created_at >= ? THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN created_at >= ? THEN cost ELSE 0 END), 0)
+            FROM calls
+        """, (today, today)).fetchone()
+        return {
+            'total_calls': row[0],
+            'total_spend': round(row[1], 2),
+            'today_calls': row[2],
+            'today_spend': round(row[3], 2)
+        }
+    
+    def signature(self):
+        """
+        (mtime_ns, size) of the database and its WAL; changes whenever a write lands
+        Used as a cache key by the app
+        """
+        signature = []
+        for path in (self.path, f"{self.path}-wal"):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            else:
+                signature.append(None)
+        return tuple(signature)
+    
+    def last_modified(self):
+        """
+        Latest mtime of the database files (WAL included), 0 if the store is empty on disk
+        """
+        mtimes = [os.path.getmtime(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p)]
+        return max(mtimes) if mtimes else 0
+    
+    def import_excel(self, filename):
+        """
+        One-time migration of an existing call_summaries.xlsx into the store
+        """
+        import pandas as pd
+        
+        df = pd.read_excel(filename, dtype={'Phone Number': str, 'Call ID': str})
+        header_to_column = {header: column for column, header, _ in EXCEL_COLUMNS}
+        header_to_column.update(LEGACY_EXCEL_HEADERS)
+        df = df.rename(columns=header_to_column)
+        df = df[[column for column in list(header_to_column.values()) if column in df.columns]]
+        df = df.astype(object).where(df.notna(), None)
+        if 'created_at' in df.columns:
+            df['created_at'] = df['created_at'].map(lambda value: str(value)[:19] if value else None)
+        
+        rows = df.to_dict('records')
+        self.save_calls(rows)
+        return len(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=CALL_STORE_PATH, legacy_excel=EXCEL_EXPORT_FILE):
+    """
+    Shared CallStore; imports the legacy Excel history the first time the store is created
+    """
+    global _store
+    if _store is None or _store.path != path:
+        with _store_lock:
+            if _store is None or _store.path != path:
+                is_new = not os.path.exists(path)
+                store = CallStore(path)
+                if is_new and legacy_excel and os.path.exists(legacy_excel):
+                    imported = store.import_excel(legacy_excel)
+                    log.info("📦 Imported %d calls from %s into %s", imported, legacy_excel, path)
+                _store = store
+    return _store
+
+# ==========================================
+# CROSS-PROCESS FILE LOCK
+# ==========================================
+class FileLock:
+    """
+    Exclusive lock on a sidecar .lock file, shared by every process on the host
+    (or on a shared volume that supports advisory locks)
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def __enter__(self):
+        self._file = open(self.path, 'a+')
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+    
+    def __exit__(self, *exc_info):
+        if os.name == 'nt':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+# ==========================================
+# WRITE-BEHIND QUEUE
+# ==========================================
+class CallWriter:
+    """
+    Dedicated writer thread fed by a bounded queue
+    Rows that arrive within batch_window seconds of each other are written
+    in one transaction, under a cross-process lock on the store
+    Rows the store still refuses after max_attempts are appended to fallback_path
+    (JSON lines) and saved by the next writer to start, or after the next good write
+    """
+    
+    def __init__(self, store, max_queue=10000, batch_window=0.05, max_batch=500, max_attempts=3,
+                 fallback_path=None):
+        self.store = store
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.fallback_path = fallback_path or f"{store.path}.failed.jsonl"
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock_path = f"{store.path}.lock"
+        self._thread = threading.Thread(target=self._run, name="call-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, row):
+        """
+        Enqueue one call row; blocks only if the queue is full
+        """
+        self._queue.put(row)
+    
+    def flush(self):
+        """
+        Block until every queued row has been written
+        """
+        self._queue.join()
+    
+    def close(self):
+        """
+        Flush pending rows and stop the writer thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+    
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _write(self, rows):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with STORE_WRITE_SECONDS.time(), FileLock(self._lock_path):
+                    self.store.save_calls(rows)
+                STORE_ROWS.inc(len(rows), result='saved')
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self._set_aside(rows, e)
+                    return
+                time.sleep(0.5 * attempt)
+        
+        if os.path.exists(self.fallback_path):
+            self._replay_quietly()
+    
+    def _set_aside(self, rows, error):
+        """
+        Keep rows the store would not take in the fallback file instead of dropping them
+        """
+        call_ids = [row.get('call_id') for row in rows]
+        try:
+            with FileLock(f"{self.fallback_path}.lock"), open(self.fallback_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            STORE_ROWS.inc(len(rows), result='failed')
+            log.error("❌ Error saving call data for %s: %s (fallback file: %s)", call_ids, error, e,
+                      call_ids=call_ids)
+            return
+        STORE_ROWS.inc(len(rows), result='set_aside')
+        log.error("❌ Error saving call data for %s: %s; kept in %s for a later retry",
+                  call_ids, error, self.fallback_path, call_ids=call_ids)
+    
+    def replay_failed(self):
+        """
+        Save the rows earlier failed writes (of any process) left in the fallback file
+        Returns the number of rows saved; raises if the store still refuses them
+        """
+        with FileLock(f"{self.fallback_path}.lock"):
+            if not os.path.exists(self.fallback_path):
+                return 0
+            rows = []
+            with open(self.fallback_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        log.warning("⚠️ Skipping unreadable line in %s", self.fallback_path)
+            if rows:
+                with STORE_WRITE_SECONDS.time(), FileLock(self._lock_path):
+                    self.store.save_calls(rows)
+            os.remove(self.fallback_path)
+        
+        STORE_ROWS.inc(len(rows), result='replayed')
+        log.info("📥 Saved %d calls kept aside by earlier failed writes", len(rows))
+        return len(rows)
+    
+    def _replay_quietly(self):
+        try:
+            self.replay_failed()
+        except Exception as e:
+            log.warning("⚠️ Calls in %s not saved yet: %s", self.fallback_path, e)
+    
+    def _run(self):
+        if os.path.exists(self.fallback_path):
+            self._replay_quietly()
+        while True:
+            batch = self._next_batch()
+            rows = [row for row in batch if row is not _STOP]
+            try:
+                if rows:
+                    self._write(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(rows) < len(batch):
+                return
+
+
+_STOP = object()
+_writer = None
+
+
+def get_writer(store=None):
+    """
+    Shared CallWriter for the store; flushed automatically at interpreter exit
+    """
+    global _writer
+    store = store or get_store()
+    if _writer is None or _writer.store is not store:
+        with _store_lock:
+            if _writer is None or _writer.store is not store:
+                if _writer is not None:
+                    _writer.close()
+                _writer = CallWriter(store)
+                atexit.register(_writer.close)
+    return _writer
+
+# ==========================================
+# EXCEL EXPORT
+# ==========================================
+EXPORT_CHUNK_SIZE = 5000  # Rows fetched from SQLite per batch while exporting
+WRAPPED_COLUMNS = {'summary'}
+
+
+def _export_styles():
+    """
+    Named styles matching the original workbook formatting
+    """
+    from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
+    
+    header = NamedStyle(name="call_header")
+    header.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header.font = Font(bold=True, color="FFFFFF")
+    header.alignment = Alignment(horizontal='center', vertical='center')
+    
+    wrapped = NamedStyle(name="call_wrapped")
+    wrapped.alignment = Alignment(wrap_text=True, vertical='top')
+    
+    return header, wrapped
+
+
+def export_calls_to_excel(filename=EXCEL_EXPORT_FILE, store=None, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """
+    Stream the call history (optionally filtered by start_date, end_date,
+    language, status) into a formatted Excel file, oldest call first
+    Uses a write-only workbook so memory stays flat regardless of row count
+    filename may also be a binary file object (e.g. io.BytesIO)
+    Returns the number of rows written
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    
+    store = store or get_store()
+    
+    wb = Workbook(write_only=True)
+    header_style, wrapped_style = _export_styles()
+    wb.add_named_style(header_style)
+    wb.add_named_style(wrapped_style)
+    ws = wb.create_sheet("Sheet1")
+    
+    # Set column widths (must happen before the first row is written)
+    for index, (_, _, width) in enumerate(EXCEL_COLUMNS, start=1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+    
+    # Style header row
+    header_row = []
+    for _, header, _ in EXCEL_COLUMNS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.style = header_style.name
+        header_row.append(cell)
+    ws.append(header_row)
+    
+    # Wrap text for the summary column
+    wrapped_positions = [i for i, (column, _, _) in enumerate(EXCEL_COLUMNS) if column in WRAPPED_COLUMNS]
+    
+    rows_written = 0
+    for row in store.iter_calls(chunk_size=chunk_size, **filters):
+        values = list(row)
+        for position in wrapped_positions:
+            cell = WriteOnlyCell(ws, value=values[position])
+            cell.style = wrapped_style.name
+            values[position] = cell
+        ws.append(values)
+        rows_written += 1
+    
+    if isinstance(filename, (str, os.PathLike)):
+        # Write to a temp file and swap it in, one exporting process at a time
+        with FileLock(f"{filename}.lock"):
+            tmp_filename = f"{filename}.tmp"
+            wb.save(tmp_filename)
+            os.replace(tmp_filename, filename)
+    else:
+        wb.save(filename)
+    return rows_written
+
+
+def export_if_stale(filename=EXCEL_EXPORT_FILE, store=None):
+    """
+    Regenerate the Excel export only if the store changed since it was written
+    Returns True if the export file exists afterwards
+    """
+    store = store or get_store()
+    if store.count() == 0:
+        return False
+    if not os.path.exists(filename) or os.path.getmtime(filename) < store.last_modified():
+        export_calls_to_excel(filename, store)
+    return True
@@ -0,0 +1,504 @@
+"""
+SnapSkill AI Caller - Batch Campaigns
+Dispatches many calls concurrently on top of make_call_with_language
+Progress is kept in the campaign job queue, so a stopped campaign can be resumed
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from vapi_caller import (
+    LANGUAGE_CONFIG,
+    find_placed_call,
+    find_placed_call_async,
+    get_or_create_assistant,
+    get_or_create_assistant_async,
+    make_call_with_language,
+    make_call_with_language_async,
+    validate_phone_numbers,
+)
+from call_store import get_store
+from campaign_queue import (
+    CAMPAIGN_LEASE_SECONDS,
+    DIALING,
+    DONE,
+    FAILED,
+    IN_CALL,
+    PENDING,
+    LeaseLost,
+    get_campaign_queue,
+    new_runner_id,
+)
+from resilience import transient_errors
+from scheduler import default_retry_policy
+from telemetry import get_logger
+
+log = get_logger("campaign")
+
+# ==========================================
+# CAMPAIGN CONFIGURATION
+# ==========================================
+DEFAULT_MAX_CONCURRENCY = 5                                                # Keep at or below the concurrent call limit of the Vapi plan
+CAMPAIGN_CLAIM_INTERVAL = float(os.getenv('CAMPAIGN_CLAIM_INTERVAL', 5))    # Seconds between looks for contacts to claim while idle
+LEASE_RENEW_INTERVAL = CAMPAIGN_LEASE_SECONDS / 3                          # Renew well before a lease can run out
+
+# What became of one dial worker's contact
+FINISHED = 'finished'          # Final result recorded
+RETRYING = 'retrying'          # Back in the queue for a later attempt
+HANDED_BACK = 'handed-back'    # Transient error; left for a later run or another runner
+LEASE_LOST = 'lease-lost'      # Another runner took the contact over before it was dialled
+
+# ==========================================
+# ERROR RESULT
+# ==========================================
+def _error_result(language, phone, status, error):
+    """
+    Build a result in the same shape make_call_with_language returns
+    for contacts that could not be dialled
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'status': status,
+        'duration': "0m 0s",
+        'duration_seconds': 0,
+        'cost': 0,
+        'language': language,
+        'call_id': '',
+        'assistant_id': '',
+        'recording_url': '',
+        'voice_name': LANGUAGE_CONFIG.get(language, {}).get('voice_name', ''),
+        'start_time': now,
+        'end_time': now,
+        'phone': phone,
+        'purpose': 'Data Science Feedback Collection',
+        'end_reason': error,
+        'summary': error,
+        'has_transcript': False,
+        'error': error
+    }
+
+# ==========================================
+# JOB QUEUE HELPERS
+# ==========================================
+def _check_campaign_args(language, max_concurrency):
+    if language not in LANGUAGE_CONFIG:
+        raise ValueError(f"Unsupported language: {language}")
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+
+def _plan_jobs(queue, campaign_id, language, owner):
+    """
+    Prepare a campaign's jobs before this runner starts claiming them
+    Returns (jobs, finished, phones): finished maps position -> result of jobs that need
+    no dialling, phones maps position -> normalised phone of every other job
+    Done jobs whose row never reached the call history are reopened under owner's lease to be
+    re-attached and saved, unless the runner that finished them may still be writing the row
+    """
+    jobs = queue.jobs(campaign_id)
+    valid, reasons = validate_phone_numbers([job['phone'] for job in jobs])
+    store = get_store()
+    finished = {}
+    phones = {}
+    
+    for index, job in enumerate(jobs):
+        position = job['position']
+        if job['state'] == DONE and job['call_id'] and store.get_call(job['call_id']) is None \
+                and queue.reopen(campaign_id, position, owner):
+            phones[position] = valid[index]
+        elif job['state'] == DONE:
+            finished[position] = job['result']
+        elif job['state'] == FAILED:
+            finished[position] = job['result'] or _error_result(language, job['phone'], 'error', job['error'])
+        elif reasons.iat[index]:
+            result = _error_result(language, job['phone'], 'invalid', reasons.iat[index])
+            queue.mark_failed(campaign_id, position, reasons.iat[index], result)
+            finished[position] = result
+        else:
+            phones[position] = valid[index]
+    
+    resumed = sum(1 for job in jobs if job['position'] in phones and job['state'] != PENDING)
+    if finished or resumed:
+        log.info("♻️ Resuming campaign %s: %d finished, %d to re-attach or check, %d to dial",
+                 campaign_id, len(finished), resumed, len(phones) - resumed, campaign_id=campaign_id)
+    return jobs, finished, phones
+
+
+def _known_call_id(job):
+    """
+    Call id of a job that was already placed, or None if it still has to be dialled or looked up
+    """
+    return job['call_id'] if job['state'] in (IN_CALL, DONE) else None
+
+
+def _tracker(queue, campaign_id, position, owner):
+    """
+    on_update callback that records each stage of the call in the queue
+    The dial only goes ahead while owner still holds the job's lease
+    """
+    def track(update):
+        if update['stage'] == 'dialing':
+            queue.mark_dialing(campaign_id, position, owner)
+        elif update['stage'] == 'in-call':
+            queue.mark_in_call(campaign_id, position, update['call_id'], owner)
+    return track
+
+
+def _tracker_async(queue, campaign_id, position, owner):
+    """
+    Coroutine variant of _tracker for make_call_with_language_async
+    """
+    track = _tracker(queue, campaign_id, position, owner)
+    return lambda update: asyncio.to_thread(track, update)
+
+
+def _record_failure(queue, campaign_id, job, language, phone, error, owner):
+    """
+    Returns (outcome, error result) for a call that raised
+    Transient errors leave the job dialing/in-call and hand it back for later: whether
+    the call was placed is unknown, so whoever picks it up looks it up instead of dialling again
+    The same goes for a busy queue database (the call may be live but unrecorded)
+    """
+    log.error("❌ Call to %s failed: %s", phone, error, phone=phone)
+    result = _error_result(language, phone, 'error', str(error))
+    try:
+        if isinstance(error, transient_errors() + (sqlite3.OperationalError,)):
+            queue.defer(campaign_id, job['position'], time.time() + CAMPAIGN_LEASE_SECONDS, owner)
+            return HANDED_BACK, result
+        queue.mark_failed(campaign_id, job['position'], str(error), result, owner)
+    except LeaseLost:
+        return LEASE_LOST, None
+    return FINISHED, result
+
+
+def _settle(queue, campaign_id, job, result, retry_policy, owner):
+    """
+    Record a finished attempt; returns (outcome, result)
+    Raises LeaseLost if another runner took the job over meanwhile
+    """
+    attempts = queue.get_job(campaign_id, job['position'])['attempts']
+    retry_at = retry_policy.retry_at(result['status'], attempts, ended_reason=result.get('end_reason'))
+    if retry_at is None:
+        queue.mark_done(campaign_id, job['position'], result, owner)
+        return FINISHED, result
+    queue.mark_retry(campaign_id, job['position'], retry_at, result, owner)
+    log.info("🔁 %s was %s, dialling again at %s (attempt %d of %d)",
+             job['phone'], result['status'], datetime.fromtimestamp(retry_at).strftime('%H:%M:%S'),
+             attempts + 1, retry_policy.max_attempts, phone=job['phone'], status=result['status'])
+    return RETRYING, result
+
+
+def _collect(outcome, result, job, finish, handed_back):
+    """
+    Apply the outcome of one dial worker to this runner's results
+    """
+    if outcome == LEASE_LOST:
+        log.warning("⚠️ Lost the lease on %s, leaving it to the runner that took it over", job['phone'],
+                    phone=job['phone'])
+        return
+    if outcome == HANDED_BACK:
+        handed_back.add(job['position'])
+    if outcome != RETRYING:
+        finish(job['position'], result)
+
+
+def _finish_others(finished_jobs, language, results, finish):
+    """
+    Report contacts that other runners of the campaign finished (finished_jobs: its done / failed jobs)
+    """
+    for job in finished_jobs:
+        if results[job['position']] is None:
+            finish(job['position'], job['result'] or _error_result(language, job['phone'], 'error', job['error']))
+
+# ==========================================
+# LEASES
+# ==========================================
+def _claim(queue, campaign_id, owner, free, retry_policy, skip):
+    """
+    Lease up to free contacts that may be dialled now (none while the calling window is closed)
+    """
+    window = retry_policy.window
+    if free < 1 or (window and not window.is_open(time.time())):
+        return []
+    return queue.claim(campaign_id, owner, free, skip=skip)
+
+
+def _renew(queue, campaign_id, owner, running):
+    positions = [job['position'] for job in running]
+    held = queue.renew(campaign_id, owner, positions)
+    if held < len(positions):
+        log.warning("⚠️ Runner %s lost %d of its %d leases in campaign %s", owner, len(positions) - held,
+                    len(positions), campaign_id, campaign_id=campaign_id)
+
+
+def _idle_timeout(queue, campaign_id, retry_policy, skip):
+    """
+    Seconds to wait with a free slot before looking for contacts to claim again
+    """
+    now = time.time()
+    due = queue.next_claimable_at(campaign_id, skip)
+    if due is None:
+        return CAMPAIGN_CLAIM_INTERVAL
+    if retry_policy.window:
+        due = retry_policy.window.next_open(max(due, now))
+    return min(max(due - now, 0.1), CAMPAIGN_CLAIM_INTERVAL)
+
+
+def _log_wait(queue, campaign_id, skip):
+    waiting = queue.unfinished(campaign_id, skip)
+    log.info("⏰ %d contacts waiting for a retry, the calling window or another runner", waiting,
+             campaign_id=campaign_id, waiting=waiting)
+
+
+def _log_progress(queue, campaign_id, total, in_flight):
+    counts = queue.counts(campaign_id)
+    done = counts[DONE] + counts[FAILED]
+    log.info("📊 Campaign progress: %d/%d done, %d in flight here, %d waiting",
+             done, total, in_flight, counts[PENDING],
+             done=done, in_flight=in_flight, waiting=counts[PENDING])
+
+# ==========================================
+# RUN CAMPAIGN
+# ==========================================
+def run_campaign(contacts, language, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None,
+                 campaign_id=None, retry_policy=None):
+    """
+    Call every phone number in contacts with a bounded worker pool
+    Returns one result per contact (same order), shaped like make_call_with_language
+    Invalid and repeated numbers are rejected up front without dialling
+    on_result(index, result) is invoked as each contact's final call finishes
+    Busy and unanswered contacts are dialled again per retry_policy (default from the
+    CAMPAIGN_* settings), sharing the max_concurrency slots with fresh contacts
+    Each contact's progress is recorded under campaign_id (generated if not given);
+    running an existing campaign_id again resumes it, see resume_campaign
+    Several runners (processes or hosts sharing the queue database) can run the same
+    campaign at once: contacts are leased one runner at a time and each returns every result
+    """
+    _check_campaign_args(language, max_concurrency)
+    retry_policy = retry_policy or default_retry_policy()
+    
+    queue = get_campaign_queue()
+    campaign_id = queue.create_campaign(list(contacts), language, campaign_id)
+    owner = new_runner_id()
+    jobs, finished, phones = _plan_jobs(queue, campaign_id, language, owner)
+    results = [None] * len(jobs)
+    handed_back = set()  # Positions given back after transient errors; reported as errors by this run
+    
+    log.info("\n%s\n📢 CAMPAIGN %s: %d contacts in %s (max %d at once, runner %s)\n%s",
+             '=' * 60, campaign_id, len(jobs), language, max_concurrency, owner, '=' * 60,
+             campaign_id=campaign_id, contacts=len(jobs), language=language, runner=owner)
+    
+    # Register the assistant once up front so workers only read the registry
+    assistant = get_or_create_assistant(language)
+    
+    def dial(job):
+        """
+        Returns (outcome, result)
+        """
+        position = job['position']
+        phone = phones[position]
+        try:
+            call_id = _known_call_id(job)
+            if job['state'] == DIALING:
+                # A runner stopped between sending the dial and recording its call id
+                placed = find_placed_call(assistant['id'], phone, job['dialed_at'])
+                call_id = placed.get('id') if placed else None
+                if call_id:
+                    queue.mark_in_call(campaign_id, position, call_id, owner)
+            result = make_call_with_language(language, phone, on_update=_tracker(queue, campaign_id, position, owner),
+                                             call_id=call_id)
+            return _settle(queue, campaign_id, job, result, retry_policy, owner)
+        except LeaseLost:
+            return LEASE_LOST, None
+        except Exception as e:
+            return _record_failure(queue, campaign_id, job, language, phone, e, owner)
+    
+    def finish(index, result):
+        results[index] = result
+        if on_result:
+            on_result(index, result)
+    
+    for index, result in finished.items():
+        finish(index, result)
+    
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="campaign") as executor:
+        running = {}
+        renewed_at = time.time()
+        idle = False
+        while True:
+            busy = handed_back | {job['position'] for job in running.values()}
+            for job in _claim(queue, campaign_id, owner, max_concurrency - len(running), retry_policy, busy):
+                running[executor.submit(dial, job)] = job
+            if time.time() - renewed_at >= LEASE_RENEW_INTERVAL:
+                _renew(queue, campaign_id, owner, running.values())
+                renewed_at = time.time()
+            
+            if not running:
+                if not queue.unfinished(campaign_id, handed_back):
+                    break
+                if not idle:
+                    _log_wait(queue, campaign_id, handed_back)
+                    idle = True
+                time.sleep(_idle_timeout(queue, campaign_id, retry_policy, handed_back))
+                continue
+            idle = False
+            
+            # Wake up to renew leases, and with a free slot to claim contacts that became due
+            timeout = renewed_at + LEASE_RENEW_INTERVAL - time.time()
+            if len(running) < max_concurrency:
+                timeout = min(timeout, _idle_timeout(queue, campaign_id, retry_policy, handed_back))
+            completed, _ = wait(running, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in completed:
+                job = running.pop(future)
+                _collect(*future.result(), job=job, finish=finish, handed_back=handed_back)
+            
+            if completed:
+                _log_progress(queue, campaign_id, len(jobs), len(running))
+    
+    _finish_others(queue.jobs(campaign_id, (DONE, FAILED)), language, results, finish)
+    log.info("\n✅ Campaign %s finished: %d contacts processed", campaign_id, len(jobs),
+             campaign_id=campaign_id, states=queue.counts(campaign_id))
+    return results
+
+
+async def run_campaign_async(contacts, language, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None,
+                             campaign_id=None, retry_policy=None):
+    """
+    asyncio variant of run_campaign
+    All calls share one event loop; max_concurrency bounds calls in flight, not threads
+    Queue reads and writes run in worker threads: a claim can wait up to the SQLite busy
+    timeout for another runner, which must not stall every call on the loop
+    """
+    _check_campaign_args(language, max_concurrency)
+    retry_policy = retry_policy or default_retry_policy()
+    
+    queue = get_campaign_queue()
+    campaign_id = await asyncio.to_thread(queue.create_campaign, list(contacts), language, campaign_id)
+    owner = new_runner_id()
+    jobs, finished, phones = await asyncio.to_thread(_plan_jobs, queue, campaign_id, language, owner)
+    results = [None] * len(jobs)
+    handed_back = set()
+    
+    log.info("\n📢 ASYNC CAMPAIGN %s: %d contacts in %s (max %d at once, runner %s)",
+             campaign_id, len(jobs), language, max_concurrency, owner,
+             campaign_id=campaign_id, contacts=len(jobs), language=language, runner=owner)
+    
+    assistant = await get_or_create_assistant_async(language)
+    
+    def finish(index, result):
+        results[index] = result
+        if on_result:
+            on_result(index, result)
+    
+    async def dial(job):
+        position = job['position']
+        phone = phones[position]
+        try:
+            call_id = _known_call_id(job)
+            if job['state'] == DIALING:
+                placed = await find_placed_call_async(assistant['id'], phone, job['dialed_at'])
+                call_id = placed.get('id') if placed else None
+                if call_id:
+                    await asyncio.to_thread(queue.mark_in_call, campaign_id, position, call_id, owner)
+            result = await make_call_with_language_async(
+                language, phone, on_update=_tracker_async(queue, campaign_id, position, owner), call_id=call_id
+            )
+            return await asyncio.to_thread(_settle, queue, campaign_id, job, result, retry_policy, owner)
+        except LeaseLost:
+            return LEASE_LOST, None
+        except Exception as e:
+            return await asyncio.to_thread(_record_failure, queue, campaign_id, job, language, phone, e, owner)
+    
+    for index, result in finished.items():
+        finish(index, result)
+    
+    running = {}
+    renewed_at = time.time()
+    idle = False
+    while True:
+        busy = handed_back | {job['position'] for job in running.values()}
+        claimed = await asyncio.to_thread(_claim, queue, campaign_id, owner, max_concurrency - len(running),
+                                          retry_policy, busy)
+        for job in claimed:
+            running[asyncio.ensure_future(dial(job))] = job
+        if time.time() - renewed_at >= LEASE_RENEW_INTERVAL:
+            await asyncio.to_thread(_renew, queue, campaign_id, owner, list(running.values()))
+            renewed_at = time.time()
+        
+        if not running:
+            if not await asyncio.to_thread(queue.unfinished, campaign_id, handed_back):
+                break
+            if not idle:
+                await asyncio.to_thread(_log_wait, queue, campaign_id, handed_back)
+                idle = True
+            await asyncio.sleep(await asyncio.to_thread(_idle_timeout, queue, campaign_id, retry_policy, handed_back))
+            continue
+        idle = False
+        
+        timeout = renewed_at + LEASE_RENEW_INTERVAL - time.time()
+        if len(running) < max_concurrency:
+            timeout = min(timeout, await asyncio.to_thread(_idle_timeout, queue, campaign_id, retry_policy,
+                                                           handed_back))
+        completed, _ = await asyncio.wait(running, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+        for task in completed:
+            job = running.pop(task)
+            _collect(*task.result(), job=job, finish=finish, handed_back=handed_back)
+        
+        if completed:
+            await asyncio.to_thread(_log_progress, queue, campaign_id, len(jobs), len(running))
+    
+    _finish_others(await asyncio.to_thread(queue.jobs, campaign_id, (DONE, FAILED)), language, results, finish)
+    states = await asyncio.to_thread(queue.counts, campaign_id)
+    log.info("\n✅ Campaign %s finished: %d contacts processed", campaign_id, len(jobs),
+             campaign_id=campaign_id, states=states)
+    return results
+
+# ==========================================
+# RESUME CAMPAIGN
+# ==========================================
+def _stored_campaign(campaign_id):
+    campaign = get_campaign_queue().get_campaign(campaign_id)
+    if campaign is None:
+        raise ValueError(f"Unknown campaign: {campaign_id}")
+    return campaign
+
+
+def resume_campaign(campaign_id, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None, retry_policy=None):
+    """
+    Continue a campaign after its runner stopped, or join the runners working on it
+    Finished contacts are not dialled again, calls that were in progress are
+    re-attached to, and only contacts never dialled are called
+    """
+    campaign = _stored_campaign(campaign_id)
+    return run_campaign(campaign['contacts'], campaign['language'], max_concurrency, on_result,
+                        campaign_id=campaign_id, retry_policy=retry_policy)
+
+
+async def resume_campaign_async(campaign_id, max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None,
+                                retry_policy=None):
+    """
+    asyncio variant of resume_campaign
+    """
+    campaign = _stored_campaign(campaign_id)
+    return await run_campaign_async(campaign['contacts'], campaign['language'], max_concurrency, on_result,
+                                    campaign_id=campaign_id, retry_policy=retry_policy)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Resume campaigns whose runner stopped, or join their runners")
+    parser.add_argument('campaign_ids', nargs='*', help="Campaigns to run (default: every unfinished one)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument('--reclaim', action='store_true',
+                        help="Take over contacts leased by other runners right away (only if they are known to be gone)")
+    args = parser.parse_args()
+    
+    for campaign_id in args.campaign_ids or get_campaign_queue().unfinished_campaigns():
+        if args.reclaim:
+            get_campaign_queue().release_leases(campaign_id)
+        resume_campaign(campaign_id, max_concurrency=args.concurrency)
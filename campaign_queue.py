@@ -0,0 +1,401 @@
+"""
+SnapSkill AI Caller - Campaign Job Queue
+Durable per-contact state of every batch campaign in SQLite, so a runner
+that dies mid-campaign can resume where it stopped without calling anyone twice
+Runners (processes, possibly on several hosts sharing the database) take
+contacts through time-limited leases, so each contact has one owner at a time
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from datetime import datetime
+
+from call_store import SQLITE_JOURNAL_MODE
+from telemetry import CAMPAIGN_LEASES_RECLAIMED, get_logger
+
+log = get_logger("campaign_queue")
+
+# ==========================================
+# QUEUE CONFIGURATION
+# ==========================================
+CAMPAIGN_QUEUE_PATH = os.getenv('CAMPAIGN_QUEUE_PATH', 'campaign_jobs.db')
+CAMPAIGN_LEASE_SECONDS = float(os.getenv('CAMPAIGN_LEASE_SECONDS', 60))  # A runner that stops renewing loses its jobs after this
+
+# Job states, in the order a contact moves through them
+PENDING = 'pending'    # Not dialled yet, or waiting for a retry at next_attempt_at
+DIALING = 'dialing'    # Dial sent; the call id may not be known yet
+IN_CALL = 'in-call'    # Call placed, waiting for it to end
+DONE = 'done'          # Call finished and queued for the history store
+FAILED = 'failed'      # Invalid number, or the dial raised
+JOB_STATES = [PENDING, DIALING, IN_CALL, DONE, FAILED]
+UNFINISHED_STATES = [PENDING, DIALING, IN_CALL]
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    campaign_id TEXT PRIMARY KEY,
+    language TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    campaign_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    phone TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    call_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    dialed_at REAL,
+    next_attempt_at REAL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    updated_at REAL,
+    error TEXT,
+    result TEXT,
+    PRIMARY KEY (campaign_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(campaign_id, state);
+"""
+
+# Unfinished jobs nobody else holds a live lease on; pending ones only once their retry is due
+CLAIMABLE_WHERE = f"""
+    campaign_id = ? AND state IN ({','.join(repr(state) for state in UNFINISHED_STATES)})
+    AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires <= ?)
+    AND (next_attempt_at IS NULL OR next_attempt_at <= ?)
+"""
+
+
+def new_campaign_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def new_runner_id():
+    """
+    Lease owner name of this process: host, pid and a random suffix
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseLost(Exception):
+    """
+    This runner's lease on a job expired and another runner may have taken it over
+    """
+
+
+def _skip_clause(skip):
+    """
+    SQL condition and parameters leaving out the job positions in skip
+    """
+    skip = list(skip)
+    if not skip:
+        return "", []
+    return f" AND position NOT IN ({','.join('?' * len(skip))})", skip
+
+
+def _job(row):
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+# ==========================================
+# CAMPAIGN QUEUE
+# ==========================================
+class CampaignQueue:
+    """
+    SQLite table of campaign jobs keyed by (campaign_id, position)
+    Every state change is one UPDATE in its own transaction, so the queue
+    always reflects the last step a call reached, even across crashes
+    """
+    
+    def __init__(self, path=CAMPAIGN_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(QUEUE_SCHEMA)
+            # Queues created before retries were scheduled
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'next_attempt_at' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN next_attempt_at REAL")
+            # ...and before runners took leases
+            if 'lease_owner' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires REAL")
+    
+    def connection(self):
+        """
+        Per-thread connection (sqlite3 connections must not be shared across threads)
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def create_campaign(self, contacts, language, campaign_id=None):
+        """
+        Record a campaign and one pending job per contact; returns the campaign id
+        Re-creating an existing campaign keeps the state of the jobs it already has
+        """
+        campaign_id = campaign_id or new_campaign_id()
+        with self.connection() as conn:
+            # Several runners may start the same campaign at once: first insert wins
+            conn.execute(
+                "INSERT OR IGNORE INTO campaigns (campaign_id, language, created_at) VALUES (?, ?, ?)",
+                (campaign_id, language, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            existing = conn.execute(
+                "SELECT language FROM campaigns WHERE campaign_id = ?", (campaign_id,)
+            ).fetchone()
+            if existing['language'] != language:
+                raise ValueError(f"Campaign {campaign_id} was started in {existing['language']}, not {language}")
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (campaign_id, position, phone, updated_at) VALUES (?, ?, ?, ?)",
+                [(campaign_id, position, str(phone), time.time()) for position, phone in enumerate(contacts)]
+            )
+        return campaign_id
+    
+    def get_campaign(self, campaign_id):
+        """
+        {'campaign_id', 'language', 'created_at', 'contacts'} or None if unknown
+        """
+        conn = self.connection()
+        row = conn.execute("SELECT * FROM campaigns WHERE campaign_id = ?", (campaign_id,)).fetchone()
+        if row is None:
+            return None
+        campaign = dict(row)
+        campaign['contacts'] = [phone for (phone,) in conn.execute(
+            "SELECT phone FROM jobs WHERE campaign_id = ? ORDER BY position", (campaign_id,)
+        )]
+        return campaign
+    
+    def unfinished_campaigns(self):
+        """
+        Ids of campaigns that still have pending, dialing or in-call jobs, oldest first
+        """
+        rows = self.connection().execute(f"""
+            SELECT DISTINCT c.campaign_id, c.created_at FROM campaigns c
+            JOIN jobs j ON j.campaign_id = c.campaign_id
+            WHERE j.state IN ({','.join('?' * len(UNFINISHED_STATES))})
+            ORDER BY c.created_at
+        """, UNFINISHED_STATES).fetchall()
+        return [row['campaign_id'] for row in rows]
+    
+    def jobs(self, campaign_id, states=None):
+        """
+        Jobs of a campaign in contact order, optionally only those in states
+        """
+        sql = "SELECT * FROM jobs WHERE campaign_id = ?"
+        params = [campaign_id]
+        if states:
+            sql += f" AND state IN ({','.join('?' * len(states))})"
+            params += list(states)
+        rows = self.connection().execute(sql + " ORDER BY position", params).fetchall()
+        return [_job(row) for row in rows]
+    
+    def get_job(self, campaign_id, position):
+        row = self.connection().execute(
+            "SELECT * FROM jobs WHERE campaign_id = ? AND position = ?", (campaign_id, position)
+        ).fetchone()
+        return _job(row) if row else None
+    
+    def counts(self, campaign_id):
+        """
+        Number of jobs in each state
+        """
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for row in self.connection().execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE campaign_id = ? GROUP BY state", (campaign_id,)):
+            counts[row[0]] = row[1]
+        return counts
+    
+    def unfinished(self, campaign_id, skip=()):
+        """
+        Number of jobs still pending, dialing or in a call, leaving out positions in skip
+        """
+        skip_sql, skip_params = _skip_clause(skip)
+        return self.connection().execute(
+            f"SELECT COUNT(*) FROM jobs WHERE campaign_id = ? "
+            f"AND state IN ({','.join('?' * len(UNFINISHED_STATES))}){skip_sql}",
+            [campaign_id, *UNFINISHED_STATES, *skip_params]
+        ).fetchone()[0]
+    
+    # ==========================================
+    # LEASES
+    # ==========================================
+    def claim(self, campaign_id, owner, limit, lease_seconds=CAMPAIGN_LEASE_SECONDS, skip=()):
+        """
+        Lease up to limit jobs that are ready to run to owner, earliest due first
+        Jobs whose owner stopped renewing (crashed runner) are taken over; jobs owner
+        already holds count as ready too, so pass the ones it is running in skip
+        Selection and lease happen in one write transaction, so two runners never get the same job
+        """
+        if limit < 1:
+            return []
+        now = time.time()
+        skip_sql, skip_params = _skip_clause(skip)
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM jobs WHERE {CLAIMABLE_WHERE}{skip_sql} "
+                f"ORDER BY COALESCE(next_attempt_at, 0), position LIMIT ?",
+                [campaign_id, owner, now, now, *skip_params, limit]
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET lease_owner = ?, lease_expires = ? WHERE campaign_id = ? AND position = ?",
+                [(owner, now + lease_seconds, campaign_id, row['position']) for row in rows]
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        reclaimed = [row for row in rows if row['lease_owner'] and row['lease_owner'] != owner]
+        if reclaimed:
+            CAMPAIGN_LEASES_RECLAIMED.inc(len(reclaimed))
+            log.warning("♻️ Took over %d jobs of campaign %s from stopped runners %s", len(reclaimed), campaign_id,
+                        sorted({row['lease_owner'] for row in reclaimed}), campaign_id=campaign_id)
+        return [dict(_job(row), lease_owner=owner, lease_expires=now + lease_seconds) for row in rows]
+    
+    def renew(self, campaign_id, owner, positions, lease_seconds=CAMPAIGN_LEASE_SECONDS):
+        """
+        Extend owner's leases on positions; returns how many are still held
+        """
+        if not positions:
+            return 0
+        positions = list(positions)
+        with self.connection() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET lease_expires = ? WHERE campaign_id = ? AND lease_owner = ? "
+                f"AND position IN ({','.join('?' * len(positions))})",
+                [time.time() + lease_seconds, campaign_id, owner, *positions]
+            ).rowcount
+    
+    def release_leases(self, campaign_id, owner=None):
+        """
+        Drop the leases of owner (every runner if None), e.g. after its host is known to be gone
+        """
+        sql = "UPDATE jobs SET lease_owner = NULL, lease_expires = NULL WHERE campaign_id = ?"
+        params = [campaign_id]
+        if owner:
+            sql += " AND lease_owner = ?"
+            params.append(owner)
+        with self.connection() as conn:
+            return conn.execute(sql, params).rowcount
+    
+    def next_claimable_at(self, campaign_id, skip=()):
+        """
+        Earliest time an unfinished job may become claimable (retry due or lease running out)
+        None when nothing is left to wait for
+        """
+        skip_sql, skip_params = _skip_clause(skip)
+        row = self.connection().execute(f"""
+            SELECT MIN(MAX(COALESCE(next_attempt_at, 0), COALESCE(lease_expires, 0))) FROM jobs
+            WHERE campaign_id = ? AND state IN ({','.join('?' * len(UNFINISHED_STATES))}){skip_sql}
+        """, [campaign_id, *UNFINISHED_STATES, *skip_params]).fetchone()
+        return row[0]
+    
+    # ==========================================
+    # STATE CHANGES
+    # ==========================================
+    def _update(self, campaign_id, position, owner=None, **values):
+        """
+        Set values on a job; with owner, only while owner still holds its lease (else LeaseLost),
+        so a runner whose lease ran out cannot overwrite the runner that took the job over
+        """
+        values['updated_at'] = time.time()
+        assignments = ', '.join(f"{column} = ?" for column in values)
+        sql = f"UPDATE jobs SET {assignments} WHERE campaign_id = ? AND position = ?"
+        params = [*values.values(), campaign_id, position]
+        if owner:
+            sql += " AND lease_owner = ?"
+            params.append(owner)
+        with self.connection() as conn:
+            if conn.execute(sql, params).rowcount == 0 and owner:
+                raise LeaseLost(f"Job {position} of campaign {campaign_id} was taken over by another runner")
+    
+    def mark_dialing(self, campaign_id, position, owner=None):
+        """
+        Called right before the dial is sent: counts the attempt and forgets any earlier call id
+        With owner, raises LeaseLost instead if owner no longer holds a live lease on the job
+        """
+        now = time.time()
+        sql = """
+            UPDATE jobs SET state = ?, attempts = attempts + 1, call_id = NULL,
+                            dialed_at = ?, next_attempt_at = NULL, updated_at = ?, error = NULL
+            WHERE campaign_id = ? AND position = ?
+        """
+        params = [DIALING, now, now, campaign_id, position]
+        if owner:
+            sql += " AND lease_owner = ? AND lease_expires > ?"
+            params += [owner, now]
+        with self.connection() as conn:
+            if conn.execute(sql, params).rowcount == 0:
+                raise LeaseLost(f"Lease on job {position} of campaign {campaign_id} was lost before dialling")
+    
+    def mark_in_call(self, campaign_id, position, call_id, owner=None):
+        self._update(campaign_id, position, owner, state=IN_CALL, call_id=call_id)
+    
+    def mark_done(self, campaign_id, position, result, owner=None):
+        """
+        Record the final result; the lease is left to run out, so until then no other
+        runner reopens the job while its history row may still wait in owner's writer
+        """
+        self._update(campaign_id, position, owner, state=DONE, call_id=result.get('call_id') or None,
+                     result=json.dumps(result, default=str))
+    
+    def mark_retry(self, campaign_id, position, next_attempt_at, result, owner=None):
+        """
+        Put a finished attempt back in the queue to be dialled again at next_attempt_at
+        The lease is dropped, so whichever runner is free then takes it
+        """
+        self._update(campaign_id, position, owner, state=PENDING, call_id=None, next_attempt_at=next_attempt_at,
+                     result=json.dumps(result, default=str), lease_owner=None, lease_expires=None)
+    
+    def mark_failed(self, campaign_id, position, error, result=None, owner=None):
+        self._update(campaign_id, position, owner, state=FAILED, error=error,
+                     result=json.dumps(result, default=str) if result is not None else None,
+                     lease_owner=None, lease_expires=None)
+    
+    def defer(self, campaign_id, position, until, owner=None):
+        """
+        Leave a job in its state but let nobody pick it up again before until
+        (e.g. the dial outcome could not be checked because the API is down)
+        """
+        self._update(campaign_id, position, owner, next_attempt_at=until, lease_owner=None, lease_expires=None)
+    
+    def reopen(self, campaign_id, position, owner, lease_seconds=CAMPAIGN_LEASE_SECONDS):
+        """
+        Put a done job back in-call under owner's lease, e.g. when its call never reached
+        the call history; only once the lease of the runner that finished it has run out
+        Returns False if the job is not done or that lease is still live
+        """
+        now = time.time()
+        with self.connection() as conn:
+            return conn.execute("""
+                UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, updated_at = ?
+                WHERE campaign_id = ? AND position = ? AND state = ?
+                AND (lease_owner IS NULL OR lease_expires <= ?)
+            """, (IN_CALL, owner, now + lease_seconds, now, campaign_id, position, DONE, now)).rowcount == 1
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_campaign_queue(path=CAMPAIGN_QUEUE_PATH):
+    """
+    Shared CampaignQueue
+    """
+    global _queue
+    if _queue is None or _queue.path != path:
+        with _queue_lock:
+            if _queue is None or _queue.path != path:
+                _queue = CampaignQueue(path)
+    return _queue
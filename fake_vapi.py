@@ -0,0 +1,310 @@
+"""
+SnapSkill AI Caller - Local Vapi Stand-in
+Fake of the Vapi endpoints this app uses, so the call pipeline can be
+exercised and benchmarked without placing real (paid) phone calls
+"""
+
+import json
+import time
+import random
+import threading
+import itertools
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# ==========================================
+# STAND-IN DEFAULTS
+# ==========================================
+DEFAULT_OUTCOMES = {'ended': 0.7, 'busy': 0.1, 'no-answer': 0.15, 'failed': 0.05}
+ENDED_REASONS = {
+    'ended': 'customer-ended-call',
+    'busy': 'customer-busy',
+    'no-answer': 'customer-did-not-answer',
+    'failed': 'twilio-failed-to-connect-call',
+}
+SAMPLE_TRANSCRIPT = [
+    "AI: Hello! I'm calling from SnapSkill about your Data Science course.",
+    "Student: Hi, yes. The course was really good.",
+    "AI: What did you like the most?",
+    "Student: The Python projects. Instructor teaching బాగుంది, कोर्स अच्छा था.",
+    "AI: Thank you so much for your valuable feedback!",
+]
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _parse_iso(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+# ==========================================
+# FAKE VAPI STATE
+# ==========================================
+class FakeVapi:
+    """
+    In-memory assistants and calls with Vapi-shaped payloads
+    Calls move queued -> ringing -> in-progress -> terminal on the wall clock:
+    call_seconds=(min, max) is how long a call really takes here, and
+    duration_scale multiplies it into the duration Vapi would report
+    """
+    
+    def __init__(self, latency=0.0, call_seconds=(1.0, 3.0), ring_seconds=0.3,
+                 duration_scale=60, outcomes=None, rate_limit=None, retry_after=1,
+                 error_rate=0.0, number_limit=None, seed=None):
+        self.latency = latency            # Seconds added to every response
+        self.call_seconds = call_seconds
+        self.ring_seconds = ring_seconds
+        self.duration_scale = duration_scale
+        self.outcomes = outcomes or DEFAULT_OUTCOMES
+        self.rate_limit = rate_limit      # Requests/second before answering 429, None = unlimited
+        self.retry_after = retry_after
+        self.error_rate = error_rate      # Fraction of requests answered with 503
+        self.number_limit = number_limit  # Live calls per phoneNumberId before dials are refused, None = unlimited
+        self.random = random.Random(seed)
+        self.requests = Counter()         # (method, route) -> count
+        self.assistants = {}
+        self.calls = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dial_lock = threading.Lock()
+        self._tokens = rate_limit or 0
+        self._refilled = time.monotonic()
+    
+    def _rate_limited(self):
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+    
+    def _new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_{next(self._ids):06d}"
+    
+    def create_assistant(self, payload):
+        assistant = dict(payload, id=self._new_id("asst"), createdAt=_iso(time.time()))
+        self.assistants[assistant['id']] = assistant
+        return assistant
+    
+    def update_assistant(self, assistant_id, payload):
+        if assistant_id not in self.assistants:
+            return None
+        self.assistants[assistant_id].update(payload)
+        return self.assistants[assistant_id]
+    
+    def live_calls(self, phone_number_id, now=None):
+        now = now or time.time()
+        return sum(1 for call in list(self.calls.values())
+                   if call['phoneNumberId'] == phone_number_id and call['_ends'] > now)
+    
+    def create_call(self, payload):
+        """
+        New call, or None if its phone number is already at number_limit live calls
+        """
+        with self._dial_lock:
+            if self.number_limit and self.live_calls(payload.get('phoneNumberId')) >= self.number_limit:
+                return None
+            return self._create_call(payload)
+    
+    def _create_call(self, payload):
+        outcome = self.random.choices(list(self.outcomes), weights=list(self.outcomes.values()))[0]
+        created = time.time()
+        if outcome == 'ended':
+            ends = created + self.ring_seconds + self.random.uniform(*self.call_seconds)
+        else:
+            ends = created + self.ring_seconds
+        call = {
+            'id': self._new_id("call"),
+            'assistantId': payload.get('assistantId'),
+            'phoneNumberId': payload.get('phoneNumberId'),
+            'customer': payload.get('customer', {}),
+            'type': 'outboundPhoneCall',
+            'createdAt': _iso(created),
+            '_created': created,
+            '_ends': ends,
+            '_outcome': outcome,
+        }
+        self.calls[call['id']] = call
+        return self.call_payload(call)
+    
+    def call_payload(self, call, now=None):
+        """
+        Public view of a call at time now
+        """
+        now = now or time.time()
+        payload = {k: v for k, v in call.items() if not k.startswith('_')}
+        answered_at = call['_created'] + self.ring_seconds
+        
+        if now < call['_created'] + 0.1:
+            payload['status'] = 'queued'
+        elif now < answered_at:
+            payload['status'] = 'ringing'
+        elif now < call['_ends']:
+            payload['status'] = 'in-progress' if call['_outcome'] == 'ended' else 'ringing'
+        else:
+            outcome = call['_outcome']
+            talk_seconds = max(call['_ends'] - answered_at, 0) if outcome == 'ended' else 0
+            # Like Vapi, every finished call is 'ended'; the outcome is only in endedReason
+            payload.update({
+                'status': 'ended',
+                'endedReason': ENDED_REASONS[outcome],
+                'startedAt': _iso(answered_at),
+                'endedAt': _iso(call['_ends']),
+                'duration': int(talk_seconds * self.duration_scale),
+            })
+            if outcome == 'ended':
+                transcript = "\n".join(SAMPLE_TRANSCRIPT)
+                payload.update({
+                    'transcript': transcript,
+                    'summary': "Student liked the course, especially the Python projects.",
+                    'recordingUrl': f"https://example.com/recordings/{call['id']}.wav",
+                    'messages': [
+                        {'role': 'assistant' if line.startswith('AI') else 'user', 'content': line.split(': ', 1)[1]}
+                        for line in SAMPLE_TRANSCRIPT
+                    ],
+                    'analysis': {'summary': "Student liked the course."},
+                })
+        return payload
+    
+    def list_calls(self, created_after=None, limit=100, created_before=None):
+        now = time.time()
+        calls = [call for call in list(self.calls.values())
+                 if (created_after is None or call['_created'] >= created_after)
+                 and (created_before is None or call['_created'] <= created_before)]
+        calls.sort(key=lambda call: call['_created'], reverse=True)
+        return [self.call_payload(call, now) for call in calls[:limit]]
+    
+    def list_assistants(self, created_after=None, limit=100):
+        assistants = [a for a in list(self.assistants.values())
+                      if created_after is None or (_parse_iso(a['createdAt']) or 0) >= created_after]
+        return assistants[:limit]
+
+# ==========================================
+# HTTP SERVER
+# ==========================================
+class _FakeVapiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+    
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else {}
+    
+    def _handle(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        payload = self._read_json() if method in ("POST", "PATCH") else None
+        
+        route = "/" + "/".join(":id" if i == 1 and part != "phone" else part for i, part in enumerate(parts))
+        fake.requests[(method, route)] += 1
+        
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake._rate_limited():
+            return self._send(429, {"message": "Too Many Requests"}, {"Retry-After": str(fake.retry_after)})
+        if fake.error_rate and fake.random.random() < fake.error_rate:
+            return self._send(503, {"message": "Service Unavailable"})
+        
+        created_after = _parse_iso(query.get('createdAtGe', '')) if 'createdAtGe' in query else None
+        created_before = _parse_iso(query.get('createdAtLe', '')) if 'createdAtLe' in query else None
+        limit = int(query.get('limit', 100))
+        
+        if parts == ["assistant"] and method == "POST":
+            return self._send(201, fake.create_assistant(payload))
+        if parts == ["assistant"] and method == "GET":
+            return self._send(200, fake.list_assistants(created_after, limit))
+        if len(parts) == 2 and parts[0] == "assistant" and method == "PATCH":
+            assistant = fake.update_assistant(parts[1], payload)
+            return self._send(200, assistant) if assistant else self._send(404, {"message": "Not Found"})
+        if parts == ["call", "phone"] and method == "POST":
+            call = fake.create_call(payload)
+            if call is None:
+                return self._send(400, {"message": "Phone number is at its concurrent call limit"})
+            return self._send(201, call)
+        if parts == ["call"] and method == "GET":
+            return self._send(200, fake.list_calls(created_after, limit, created_before))
+        if len(parts) == 2 and parts[0] == "call" and method == "GET":
+            call = fake.calls.get(parts[1])
+            return self._send(200, fake.call_payload(call)) if call else self._send(404, {"message": "Not Found"})
+        return self._send(404, {"message": "Not Found"})
+    
+    def do_GET(self):
+        self._handle("GET")
+    
+    def do_POST(self):
+        self._handle("POST")
+    
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class FakeVapiServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server serving a FakeVapi; point VAPI_BASE_URL at .url
+    """
+    daemon_threads = True
+    
+    def __init__(self, fake=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _FakeVapiHandler)
+        self.fake = fake or FakeVapi()
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-vapi", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_fake_vapi(**options):
+    """
+    Start a FakeVapiServer on a free local port; options go to FakeVapi
+    """
+    return FakeVapiServer(FakeVapi(**options)).start()
+
+
+if __name__ == "__main__":
+    import os
+    
+    # Run the app against it with VAPI_BASE_URL=http://127.0.0.1:8900
+    server = FakeVapiServer(FakeVapi(latency=0.01), port=int(os.getenv('FAKE_VAPI_PORT', 8900))).start()
+    print(f"🧪 Fake Vapi listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
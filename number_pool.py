@@ -0,0 +1,250 @@
+"""
+SnapSkill AI Caller - Outbound Number Pool
+Spreads dials across every Vapi phone number we own, within each number's
+concurrent call limit, and rests numbers whose calls keep failing
+Calls in flight are counted in a SQLite file, so every process (and host,
+on a shared volume) dialling from the same numbers respects the same limit
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import threading
+
+from call_store import SQLITE_JOURNAL_MODE
+from telemetry import NUMBER_CALLS_IN_FLIGHT, NUMBER_DISABLED, get_logger
+
+log = get_logger("number_pool")
+
+# ==========================================
+# POOL CONFIGURATION
+# ==========================================
+NUMBER_MAX_CONCURRENCY = int(os.getenv('VAPI_NUMBER_MAX_CONCURRENCY', 10))         # Calls at once per phone number
+NUMBER_FAILURE_THRESHOLD = int(os.getenv('VAPI_NUMBER_FAILURE_THRESHOLD', 3))      # Failed calls in a row that disable a number
+NUMBER_COOLDOWN = float(os.getenv('VAPI_NUMBER_COOLDOWN', 300))                    # Seconds a disabled number is left out
+POOL_WAIT_INTERVAL = 0.2                                                           # Seconds between checks while every number is busy
+NUMBER_FAILURE_REASONS = ('failed-to-connect', 'phone-number', 'sip-telephony')    # endedReason fragments blamed on the number
+NUMBER_POOL_PATH = os.getenv('VAPI_NUMBER_POOL_PATH', 'number_slots.db')          # Call slots shared by every runner
+NUMBER_SLOT_TTL = float(os.getenv('VAPI_NUMBER_SLOT_TTL', 900))                    # Slots of a runner that died free up after this
+
+SLOTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS number_slots (
+    slot_id TEXT PRIMARY KEY,
+    number_id TEXT NOT NULL,
+    holder TEXT,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_number_slots_number ON number_slots(number_id);
+"""
+
+
+def parse_number_ids(value):
+    """
+    Phone number IDs from a comma-separated setting, without blanks or repeats
+    """
+    return list(dict.fromkeys(part.strip() for part in (value or '').split(',') if part.strip()))
+
+
+def is_number_failure(call_data):
+    """
+    True if a finished call failed in a way that points at the outbound number or
+    its carrier (rather than the student, or an assistant / pipeline error)
+    """
+    if not call_data:
+        return False
+    reason = call_data.get('endedReason') or ''
+    return any(part in reason for part in NUMBER_FAILURE_REASONS)
+
+# ==========================================
+# PHONE NUMBER POOL
+# ==========================================
+class PhoneNumberPool:
+    """
+    Outbound phone number IDs with a concurrent call cap each
+    Every dial takes the enabled number with the fewest calls in flight;
+    after failure_threshold failures in a row a number is left out for cooldown
+    seconds (unless it is the last one enabled), then gets one call to prove
+    itself before it is trusted again
+    With path, calls in flight are counted across every process using that file
+    (failure tracking stays per process); without it, in this process only
+    """
+    
+    def __init__(self, number_ids, max_concurrency=NUMBER_MAX_CONCURRENCY,
+                 failure_threshold=NUMBER_FAILURE_THRESHOLD, cooldown=NUMBER_COOLDOWN,
+                 path=None, slot_ttl=NUMBER_SLOT_TTL):
+        number_ids = [number_id for number_id in number_ids if number_id]
+        if not number_ids:
+            raise ValueError("At least one phone number ID is required")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._numbers = {
+            number_id: {'in_flight': 0, 'failures': 0, 'disabled_until': 0.0, 'probation': False, 'slots': []}
+            for number_id in dict.fromkeys(number_ids)
+        }
+        self._lock = threading.Lock()
+        self.path = path
+        self.slot_ttl = slot_ttl
+        self._holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = None
+        if path:
+            # Only used under self._lock; autocommit, transactions are opened explicitly
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            self._conn.executescript(SLOTS_SCHEMA)
+    
+    @property
+    def number_ids(self):
+        return list(self._numbers)
+    
+    @property
+    def capacity(self):
+        """
+        Calls the pool can carry at once while every number is enabled
+        """
+        return len(self._numbers) * self.max_concurrency
+    
+    def _limit(self, state):
+        # A number back from a cooldown carries one call until that call succeeds
+        return 1 if state['probation'] else self.max_concurrency
+    
+    def _reserve_shared(self, candidates):
+        """
+        Take a slot in the shared table on the candidate with the fewest calls in flight
+        across all processes; returns (number_id, slot_id) or None if all are full
+        """
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM number_slots WHERE expires <= ?", (now,))
+            counts = dict(conn.execute(
+                f"SELECT number_id, COUNT(*) FROM number_slots "
+                f"WHERE number_id IN ({','.join('?' * len(candidates))}) GROUP BY number_id",
+                candidates
+            ).fetchall())
+            free = [(counts.get(number_id, 0), number_id) for number_id in candidates
+                    if counts.get(number_id, 0) < self.max_concurrency]
+            if not free:
+                conn.execute("COMMIT")
+                return None
+            number_id = min(free, key=lambda item: item[0])[1]
+            slot_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO number_slots (slot_id, number_id, holder, expires) VALUES (?, ?, ?, ?)",
+                (slot_id, number_id, self._holder, now + self.slot_ttl)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return number_id, slot_id
+    
+    def try_acquire(self):
+        """
+        Reserve a call slot on the least busy enabled number; None if none is free
+        """
+        with self._lock:
+            now = time.monotonic()
+            free = [
+                (state['in_flight'], number_id) for number_id, state in self._numbers.items()
+                if state['disabled_until'] <= now and state['in_flight'] < self._limit(state)
+            ]
+            if not free:
+                return None
+            if self._conn is None:
+                number_id = min(free, key=lambda item: item[0])[1]  # Ties go to the first configured number
+            else:
+                reserved = self._reserve_shared([number_id for _, number_id in free])
+                if reserved is None:
+                    return None
+                number_id, slot_id = reserved
+                self._numbers[number_id]['slots'].append(slot_id)
+            self._numbers[number_id]['in_flight'] += 1
+        NUMBER_CALLS_IN_FLIGHT.inc(number=str(number_id))
+        return number_id
+    
+    def acquire(self):
+        """
+        Block the calling thread until a number has a free slot
+        """
+        announced = False
+        while True:
+            number_id = self.try_acquire()
+            if number_id is not None:
+                return number_id
+            if not announced:
+                log.info("⏳ Every phone number is at its call limit, waiting for a free line")
+                announced = True
+            time.sleep(POOL_WAIT_INTERVAL)
+    
+    async def acquire_async(self):
+        """
+        Wait on the event loop until a number has a free slot
+        The shared slot table is locked with BEGIN IMMEDIATE, so it is reserved in a worker thread
+        """
+        announced = False
+        while True:
+            number_id = await asyncio.to_thread(self.try_acquire) if self.path else self.try_acquire()
+            if number_id is not None:
+                return number_id
+            if not announced:
+                log.info("⏳ Every phone number is at its call limit, waiting for a free line")
+                announced = True
+            await asyncio.sleep(POOL_WAIT_INTERVAL)
+    
+    def release(self, number_id, failed=False):
+        """
+        Give back the slot once the call is over (or the dial failed)
+        failed=True counts towards taking the number out of rotation
+        """
+        disabled = False
+        with self._lock:
+            state = self._numbers[number_id]
+            state['in_flight'] -= 1
+            if state['slots']:
+                slot_id = state['slots'].pop()
+                try:
+                    self._conn.execute("DELETE FROM number_slots WHERE slot_id = ?", (slot_id,))
+                except sqlite3.Error as e:
+                    log.warning("⚠️ Could not free call slot on %s (%s); it expires in %.0fs",
+                                number_id, e, self.slot_ttl, phone_number_id=number_id)
+            if not failed:
+                state['failures'] = 0
+                state['probation'] = False
+            else:
+                state['failures'] += 1
+                now = time.monotonic()
+                others_enabled = any(other['disabled_until'] <= now for other_id, other in self._numbers.items()
+                                     if other_id != number_id)
+                # The last enabled number stays in rotation: leaving it out would stop every dial
+                if state['failures'] >= self.failure_threshold and state['disabled_until'] <= now and others_enabled:
+                    state['disabled_until'] = now + self.cooldown
+                    state['probation'] = True
+                    state['failures'] = self.failure_threshold - 1  # A failed probe disables it again
+                    disabled = True
+        NUMBER_CALLS_IN_FLIGHT.dec(number=str(number_id))
+        if disabled:
+            log.error("📵 Phone number %s keeps failing, left out for %.0fs", number_id, self.cooldown,
+                      phone_number_id=number_id)
+            NUMBER_DISABLED.inc(number=str(number_id))
+    
+    def stats(self):
+        """
+        {number_id: {'in_flight', 'failures', 'enabled'}} for dashboards and logs
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                number_id: {
+                    'in_flight': state['in_flight'],
+                    'failures': state['failures'],
+                    'enabled': state['disabled_until'] <= now
+                }
+                for number_id, state in self._numbers.items()
+            }
@@ -0,0 +1,120 @@
+"""
+SnapSkill AI Caller - Analytics Page
+Success rate, answer rate, duration percentiles and spend per language per day
+Reads the materialised rollup in call_store, never the full call history
+"""
+
+import streamlit as st
+from datetime import date, timedelta
+from call_store import get_store, duration_percentiles
+
+# ==========================================
+# PAGE CONFIGURATION
+# ==========================================
+st.set_page_config(
+    page_title="SnapSkill Analytics",
+    page_icon="📈",
+    layout="wide"
+)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_rollup(store_version, start_date, end_date):
+    """
+    Rollup + duration histogram for a date range, per store version
+    """
+    return get_store().daily_rollup(start_date, end_date)
+
+
+def add_rates(df):
+    """
+    Vectorised rate and average columns on a rollup frame
+    """
+    df = df.copy()
+    df['success_rate'] = (df['succeeded'] / df['calls']).round(3)
+    df['answer_rate'] = (df['answered'] / df['calls']).round(3)
+    df['avg_duration'] = (df['total_duration'] / df['answered'].where(df['answered'] > 0)).round(1)
+    df['total_cost'] = df['total_cost'].round(2)
+    return df
+
+# ==========================================
+# FILTERS
+# ==========================================
+st.title("📈 Call Analytics")
+st.markdown("---")
+
+filter_col1, filter_col2 = st.columns(2)
+with filter_col1:
+    date_range = st.date_input(
+        "Date range",
+        value=(date.today() - timedelta(days=30), date.today())
+    )
+start_date = date_range[0] if len(date_range) > 0 else None
+end_date = date_range[-1] if len(date_range) > 0 else None
+
+rollup, histogram = load_rollup(get_store().signature(), start_date, end_date)
+
+with filter_col2:
+    languages = sorted(rollup['language'].unique()) if not rollup.empty else []
+    selected_languages = st.multiselect("Languages", languages, default=languages)
+
+rollup = rollup[rollup['language'].isin(selected_languages)]
+histogram = histogram[histogram['language'].isin(selected_languages)]
+
+if rollup.empty:
+    st.info("📝 No calls in this range yet.")
+    st.stop()
+
+# ==========================================
+# OVERVIEW
+# ==========================================
+totals = rollup[['calls', 'answered', 'succeeded', 'total_cost']].sum()
+overall_percentiles = duration_percentiles(histogram.drop(columns=['day', 'language']).assign(all='all'))
+
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("Calls", f"{int(totals['calls']):,}")
+col2.metric("Success Rate", f"{totals['succeeded'] / totals['calls']:.1%}")
+col3.metric("Answer Rate", f"{totals['answered'] / totals['calls']:.1%}")
+col4.metric("Median Duration", f"{overall_percentiles['p50'].iloc[0]:.0f}s" if not overall_percentiles.empty else "N/A")
+col5.metric("Total Spend", f"₹{totals['total_cost']:,.2f}")
+
+# ==========================================
+# PER LANGUAGE
+# ==========================================
+st.subheader("🌍 By Language")
+by_language = add_rates(
+    rollup.groupby('language')[['calls', 'answered', 'succeeded', 'total_duration', 'total_cost']].sum().reset_index()
+)
+by_language = by_language.merge(
+    duration_percentiles(histogram.drop(columns=['day'])), on='language', how='left'
+)
+st.dataframe(
+    by_language[['language', 'calls', 'success_rate', 'answer_rate', 'avg_duration', 'p50', 'p90', 'p99', 'total_cost']],
+    hide_index=True,
+    use_container_width=True
+)
+
+# ==========================================
+# PER DAY
+# ==========================================
+st.subheader("📅 By Day")
+by_day = add_rates(rollup).merge(duration_percentiles(histogram), on=['day', 'language'], how='left')
+
+chart_col1, chart_col2 = st.columns(2)
+with chart_col1:
+    st.markdown("**Success rate**")
+    st.line_chart(by_day.pivot(index='day', columns='language', values='success_rate'))
+    st.markdown("**Median duration (s)**")
+    st.line_chart(by_day.pivot(index='day', columns='language', values='p50'))
+with chart_col2:
+    st.markdown("**Answer rate**")
+    st.line_chart(by_day.pivot(index='day', columns='language', values='answer_rate'))
+    st.markdown("**Spend (₹)**")
+    st.bar_chart(by_day.pivot(index='day', columns='language', values='total_cost'))
+
+with st.expander("📋 Daily breakdown"):
+    st.dataframe(
+        by_day[['day', 'language', 'calls', 'success_rate', 'answer_rate', 'p50', 'p90', 'p99', 'total_cost']],
+        hide_index=True,
+        use_container_width=True
+    )
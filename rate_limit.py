@@ -0,0 +1,208 @@
+"""
+SnapSkill AI Caller - Vapi Rate Limiting
+Token buckets shared by every Vapi request (threads, and optionally processes)
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# ==========================================
+# RATE LIMIT CONFIGURATION
+# ==========================================
+# (requests per second, burst size) for each budget
+DEFAULT_BUDGETS = {
+    "calls": (float(os.getenv('VAPI_CALL_RATE', 2)), int(os.getenv('VAPI_CALL_BURST', 5))),        # POST /call
+    "reads": (float(os.getenv('VAPI_READ_RATE', 10)), int(os.getenv('VAPI_READ_BURST', 20))),      # GET requests
+    "default": (float(os.getenv('VAPI_WRITE_RATE', 5)), int(os.getenv('VAPI_WRITE_BURST', 10))),  # Assistant writes etc.
+}
+RATE_LIMIT_DB = os.getenv('VAPI_RATE_LIMIT_DB')  # Share budgets across processes through this SQLite file
+DEFAULT_RATE_LIMIT_RETRIES = 5  # Times a 429 response is retried before it is returned to the caller
+MAX_RETRY_AFTER = 60            # Cap on how long a single Retry-After may pause a budget
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+# ==========================================
+# HELPERS
+# ==========================================
+def bucket_for(method, path):
+    """
+    Budget a Vapi request draws from
+    """
+    if method.upper() == "POST" and path.startswith("/call"):
+        return "calls"
+    if method.upper() == "GET":
+        return "reads"
+    return "default"
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP date)
+    Returns None if the header is missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def _take(state, rate, capacity, now):
+    """
+    Refill a (tokens, updated, blocked_until) bucket and try to take one token
+    Returns (new_state, seconds_to_wait); seconds_to_wait is 0 when a token was taken
+    """
+    tokens, updated, blocked_until = state
+    if now < blocked_until:
+        return state, blocked_until - now
+    
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now, blocked_until), 0.0
+    return (tokens, now, blocked_until), (1 - tokens) / rate
+
+# ==========================================
+# RATE LIMITER
+# ==========================================
+class RateLimiter:
+    """
+    Named token buckets, e.g. separate budgets for call creation and status reads
+    State lives in memory (shared by threads) or, with path, in a SQLite file
+    shared by every process on the host
+    """
+    
+    def __init__(self, budgets=None, path=None):
+        self.budgets = dict(budgets or DEFAULT_BUDGETS)
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        self._local = threading.local()
+        if path:
+            self.connection().execute(SCHEMA)
+    
+    def connection(self):
+        """
+        Per-thread autocommit connection; transactions are opened explicitly
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def _update(self, name, change):
+        """
+        Apply change(state, now) -> (state, result) to one bucket atomically
+        """
+        rate, capacity = self.budgets.get(name, self.budgets["default"])
+        now = time.time()
+        
+        if not self.path:
+            with self._lock:
+                state = self._state.get(name, (capacity, now, 0.0))
+                self._state[name], result = change(state, now)
+            return result
+        
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, blocked_until FROM rate_limit_buckets WHERE name = ?", (name,)
+            ).fetchone()
+            state, result = change(row or (capacity, now, 0.0), now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (name, tokens, updated, blocked_until) "
+                "VALUES (?, ?, ?, ?)", (name, *state)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+    
+    def try_acquire(self, name):
+        """
+        Take one token from the bucket if available
+        Returns 0 on success, otherwise the seconds until a token should be free
+        """
+        rate, capacity = self.budgets.get(name, self.budgets["default"])
+        return self._update(name, lambda state, now: _take(state, rate, capacity, now))
+    
+    def acquire(self, name):
+        """
+        Block the calling thread until a token is taken
+        """
+        while True:
+            wait = self.try_acquire(name)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+    
+    async def _off_loop(self, func, *args):
+        # The SQLite bucket can wait up to its busy timeout on other processes: keep that
+        # off the event loop; the in-memory bucket is only a lock away
+        if self.path:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+    
+    async def acquire_async(self, name):
+        """
+        Wait on the event loop until a token is taken
+        """
+        while True:
+            wait = await self._off_loop(self.try_acquire, name)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    
+    def block(self, name, seconds):
+        """
+        Pause a bucket for everyone (e.g. after a 429 with Retry-After)
+        Only one token is available when the pause ends so the retries are not a burst
+        """
+        def pause(state, now):
+            blocked_until = max(state[2], now + seconds)
+            return (1.0, blocked_until, blocked_until), None
+        self._update(name, pause)
+    
+    async def block_async(self, name, seconds):
+        """
+        Async variant of block
+        """
+        await self._off_loop(self.block, name, seconds)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Shared RateLimiter configured from the environment
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(path=RATE_LIMIT_DB)
+    return _limiter
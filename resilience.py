@@ -0,0 +1,233 @@
+"""
+SnapSkill AI Caller - Retries and Circuit Breaker
+Keeps dispatch stable through transient Vapi API failures
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+
+from telemetry import API_RETRIES, CIRCUIT_OPENS, get_logger
+
+log = get_logger("resilience")
+
+# ==========================================
+# RETRY CONFIGURATION
+# ==========================================
+VAPI_MAX_ATTEMPTS = int(os.getenv('VAPI_MAX_ATTEMPTS', 4))                # Tries per request, including the first
+RETRY_BASE_DELAY = 0.5                                                    # Seconds; doubles every attempt
+RETRY_MAX_DELAY = 20                                                      # Upper bound of a single backoff
+BREAKER_THRESHOLD = int(os.getenv('VAPI_BREAKER_THRESHOLD', 5))           # Consecutive failures that open the circuit
+BREAKER_RESET_TIMEOUT = float(os.getenv('VAPI_BREAKER_RESET_TIMEOUT', 30))  # Seconds before a probe request is let through
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+
+
+class TransientError(Exception):
+    """
+    A Vapi request failed in a way that is worth retrying
+    """
+
+
+def transient_errors():
+    """
+    Exception types worth retrying
+    Transport errors are only looked up for HTTP libraries a client has already imported,
+    so importing this module does not load requests or httpx
+    """
+    errors = [TransientError]
+    requests = sys.modules.get('requests')
+    if requests is not None:
+        errors += [requests.ConnectionError, requests.Timeout]
+    httpx = sys.modules.get('httpx')
+    if httpx is not None:
+        errors.append(httpx.TransportError)
+    return tuple(errors)
+
+# ==========================================
+# HELPERS
+# ==========================================
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff so concurrent workers do not retry in lockstep
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def check_transient(response):
+    """
+    Raise TransientError for 5xx responses, otherwise return the response unchanged
+    """
+    if response.status_code in TRANSIENT_STATUSES:
+        raise TransientError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+# ==========================================
+# CIRCUIT BREAKER
+# ==========================================
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and holds every request
+    for reset_timeout seconds; then one probe request decides whether it closes again
+    """
+    
+    def __init__(self, failure_threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+    
+    def wait_time(self):
+        """
+        Seconds the caller must wait before sending; 0 means go ahead
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            now = time.monotonic()
+            remaining = self.opened_at + self.reset_timeout - now
+            if remaining > 0:
+                return remaining
+            # Half-open: let a single probe through (again if the last one never reported back)
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return min(1.0, self.reset_timeout)
+            self._probe_started = now
+            return 0
+    
+    def wait(self):
+        """
+        Block until the circuit lets a request through
+        """
+        announced = False
+        while True:
+            delay = self.wait_time()
+            if delay <= 0:
+                return
+            if not announced:
+                log.warning("⏸️ Vapi API circuit open, pausing dispatch for %.0fs", delay)
+                announced = True
+            time.sleep(delay)
+    
+    async def wait_async(self):
+        """
+        Wait on the event loop until the circuit lets a request through
+        """
+        announced = False
+        while True:
+            delay = self.wait_time()
+            if delay <= 0:
+                return
+            if not announced:
+                log.warning("⏸️ Vapi API circuit open, pausing dispatch for %.0fs", delay)
+                announced = True
+            await asyncio.sleep(delay)
+    
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                log.info("✅ Vapi API recovered, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._probe_started = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            probe_failed = self._probe_started is not None
+            if probe_failed or (self.opened_at is None and self.failures >= self.failure_threshold):
+                log.error("🔌 Vapi API failing (%d in a row), circuit open for %.0fs",
+                          self.failures, self.reset_timeout, failures=self.failures)
+                CIRCUIT_OPENS.inc()
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    """
+    Shared CircuitBreaker for the Vapi API
+    """
+    global _breaker
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
+
+# ==========================================
+# RETRY
+# ==========================================
+def retry_request(send, recover=None, label="Vapi request", max_attempts=VAPI_MAX_ATTEMPTS, breaker=None):
+    """
+    Call send() until it returns a response that is not a transient failure
+    recover() runs before each retry of a non-idempotent request: a non-None result
+    means an earlier attempt did go through, and it is returned instead of sending again
+    Raises the last transient error once max_attempts are used up
+    """
+    breaker = breaker or get_breaker()
+    
+    for attempt in range(1, max_attempts + 1):
+        breaker.wait()
+        try:
+            if attempt > 1 and recover:
+                recovered = recover()
+                if recovered is not None:
+                    breaker.record_success()
+                    return recovered
+            response = check_transient(send())
+        except transient_errors() as e:
+            breaker.record_failure()
+            if attempt == max_attempts:
+                raise
+            delay = backoff_delay(attempt)
+            API_RETRIES.inc()
+            log.warning("🔁 %s failed (%s), retry %d/%d in %.1fs", label, e, attempt, max_attempts - 1, delay,
+                        attempt=attempt)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return response
+
+
+async def retry_request_async(send, recover=None, label="Vapi request", max_attempts=VAPI_MAX_ATTEMPTS, breaker=None):
+    """
+    asyncio variant of retry_request; send and recover are coroutine functions
+    """
+    breaker = breaker or get_breaker()
+    
+    for attempt in range(1, max_attempts + 1):
+        await breaker.wait_async()
+        try:
+            if attempt > 1 and recover:
+                recovered = await recover()
+                if recovered is not None:
+                    breaker.record_success()
+                    return recovered
+            response = check_transient(await send())
+        except transient_errors() as e:
+            breaker.record_failure()
+            if attempt == max_attempts:
+                raise
+            delay = backoff_delay(attempt)
+            API_RETRIES.inc()
+            log.warning("🔁 %s failed (%s), retry %d/%d in %.1fs", label, e, attempt, max_attempts - 1, delay,
+                        attempt=attempt)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return response
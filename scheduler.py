@@ -0,0 +1,106 @@
+"""
+SnapSkill AI Caller - Dial Scheduling
+Calling windows and retry backoff for busy / unanswered calls
+(the campaign queue hands out due contacts earliest first)
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+from call_events import outcome_status
+
+# ==========================================
+# SCHEDULER CONFIGURATION
+# ==========================================
+RETRY_OUTCOMES = ('busy', 'no-answer')                                     # Call statuses worth dialling again
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv('CAMPAIGN_MAX_ATTEMPTS', 3))          # Dials per contact, including the first
+CAMPAIGN_RETRY_DELAY = float(os.getenv('CAMPAIGN_RETRY_DELAY', 900))        # Seconds before the first retry; doubles each time
+CAMPAIGN_RETRY_MAX_DELAY = float(os.getenv('CAMPAIGN_RETRY_MAX_DELAY', 4 * 3600))
+CAMPAIGN_CALL_WINDOW = os.getenv('CAMPAIGN_CALL_WINDOW', '')                # e.g. 09:00-21:00 (local time); empty = any time
+
+# ==========================================
+# CALLING WINDOW
+# ==========================================
+class CallWindow:
+    """
+    Daily local-time window in which contacts may be called
+    A window that ends before it starts (22:00-06:00) runs past midnight
+    """
+    
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+    
+    @classmethod
+    def parse(cls, spec):
+        """
+        CallWindow from "HH:MM-HH:MM", or None for an empty spec (no restriction)
+        """
+        if not spec or not spec.strip():
+            return None
+        try:
+            start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in spec.split('-'))
+        except ValueError:
+            raise ValueError(f"Calling window must look like 09:00-21:00, got {spec!r}")
+        if start == end:
+            raise ValueError(f"Calling window {spec!r} is empty")
+        return cls(start, end)
+    
+    def __repr__(self):
+        return f"CallWindow({self.start:%H:%M}-{self.end:%H:%M})"
+    
+    def is_open(self, timestamp):
+        now = datetime.fromtimestamp(timestamp).time()
+        if self.start < self.end:
+            return self.start <= now < self.end
+        return now >= self.start or now < self.end
+    
+    def next_open(self, timestamp):
+        """
+        timestamp itself if the window is open then, else when it next opens
+        """
+        if self.is_open(timestamp):
+            return timestamp
+        moment = datetime.fromtimestamp(timestamp)
+        opens = datetime.combine(moment.date(), self.start)
+        if opens <= moment:
+            opens += timedelta(days=1)
+        return opens.timestamp()
+
+# ==========================================
+# RETRY POLICY
+# ==========================================
+class RetryPolicy:
+    """
+    When to dial a contact again after a busy / unanswered call
+    Backoff doubles per attempt up to max_delay and retries only land inside the window
+    """
+    
+    def __init__(self, max_attempts=CAMPAIGN_MAX_ATTEMPTS, base_delay=CAMPAIGN_RETRY_DELAY,
+                 max_delay=CAMPAIGN_RETRY_MAX_DELAY, outcomes=RETRY_OUTCOMES, window=None):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.outcomes = set(outcomes)
+        self.window = window
+    
+    def retry_at(self, status, attempts, now=None, ended_reason=None):
+        """
+        Epoch time of the next dial after `attempts` dials ended in status, or None to stop
+        A plain 'ended' status is classified by its ended_reason (customer-busy, ...)
+        """
+        if outcome_status(status, ended_reason) not in self.outcomes or attempts >= self.max_attempts:
+            return None
+        delay = min(self.base_delay * 2 ** max(attempts - 1, 0), self.max_delay)
+        at = (now or time.time()) + delay
+        return self.window.next_open(at) if self.window else at
+
+
+def default_retry_policy():
+    """
+    RetryPolicy from the CAMPAIGN_* environment settings
+    """
+    return RetryPolicy(window=CallWindow.parse(CAMPAIGN_CALL_WINDOW))
@@ -0,0 +1,477 @@
+"""
+SnapSkill AI Caller - Telemetry
+Low-overhead counters, gauges and histograms for the call pipeline
+(Prometheus text or JSON), and leveled structured logging
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# TELEMETRY CONFIGURATION
+# ==========================================
+METRICS_ENABLED = os.getenv('VAPI_METRICS', '1') != '0'       # 0 turns every metric update into a no-op
+METRICS_HOST = os.getenv('VAPI_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('VAPI_METRICS_PORT')                 # Serve /metrics and /metrics.json when set
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')                     # DEBUG, INFO, WARNING, ERROR or OFF
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')                   # 'json' for one JSON object per line
+LOGGER_NAMESPACE = "snapskill"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)       # Seconds, API requests
+STAGE_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180, 300)     # Seconds, pipeline stages
+POLL_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 40, 60)                                    # Status requests per call
+
+# ==========================================
+# METRICS
+# ==========================================
+_enabled = METRICS_ENABLED
+
+
+def set_metrics_enabled(enabled):
+    """
+    Turn metric collection on or off at runtime (values collected so far are kept)
+    """
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def metrics_enabled():
+    return _enabled
+
+
+class _Metric:
+    kind = "untyped"
+    
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+    
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """
+    Monotonic count, e.g. requests or finished calls
+    """
+    kind = "counter"
+    
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down, e.g. calls in flight
+    """
+    kind = "gauge"
+    
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+    
+    def set(self, value, **labels):
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """
+    Bucketed distribution of observations (latencies, poll counts)
+    Stored per label set as [bucket counts..., +Inf count, sum]
+    """
+    kind = "histogram"
+    
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+    
+    def time(self, **labels):
+        """
+        Context manager that observes the seconds spent inside it
+        """
+        if not _enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+    
+    def quantile(self, q, **labels):
+        """
+        Estimate a quantile by interpolating inside the bucket that holds it
+        """
+        series = self._values.get(self._key(labels))
+        return _bucket_quantile(self.buckets, series, q) if series else None
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+    
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _bucket_quantile(buckets, series, q):
+    counts = series[:-1]
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = buckets[index - 1] if index > 0 else 0
+            upper = buckets[index] if index < len(buckets) else buckets[-1]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered together for /metrics
+    """
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+    
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+    
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+    
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+    
+    def reset(self):
+        for metric in self.metrics():
+            metric.clear()
+    
+    def render_prometheus(self):
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(metric.samples()):
+                labels = dict(zip(metric.labelnames, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    bucket_labels = dict(labels, le="+Inf" if bound == float('inf') else _format_value(bound))
+                    lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+    
+    def snapshot(self):
+        """
+        JSON-friendly view; histograms include count, sum and estimated p50/p95/p99
+        """
+        result = {}
+        for metric in self.metrics():
+            samples = []
+            for key, value in sorted(metric.samples()):
+                sample = {'labels': dict(zip(metric.labelnames, key))}
+                if metric.kind == "histogram":
+                    sample.update({
+                        'count': sum(value[:-1]),
+                        'sum': round(value[-1], 6),
+                        'p50': _bucket_quantile(metric.buckets, value, 0.5),
+                        'p95': _bucket_quantile(metric.buckets, value, 0.95),
+                        'p99': _bucket_quantile(metric.buckets, value, 0.99),
+                    })
+                else:
+                    sample['value'] = value
+                samples.append(sample)
+            result[metric.name] = {'type': metric.kind, 'help': metric.help, 'samples': samples}
+        return result
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+# ==========================================
+# PIPELINE METRICS
+# ==========================================
+API_REQUEST_SECONDS = registry.histogram(
+    "snapskill_vapi_request_seconds", "Vapi API request latency by endpoint and status code",
+    ("method", "endpoint", "status"))
+API_RATE_LIMITED = registry.counter(
+    "snapskill_vapi_rate_limited_total", "429 responses from the Vapi API", ("method", "endpoint"))
+API_RETRIES = registry.counter(
+    "snapskill_vapi_retries_total", "Retries after transient Vapi failures")
+CIRCUIT_OPENS = registry.counter(
+    "snapskill_vapi_circuit_opens_total", "Times the Vapi circuit breaker opened")
+STAGE_SECONDS = registry.histogram(
+    "snapskill_call_stage_seconds", "Time spent in each call pipeline stage", ("stage",), STAGE_BUCKETS)
+STATUS_POLLS = registry.histogram(
+    "snapskill_call_status_polls", "Status requests made while waiting for one call", ("mode",), POLL_BUCKETS)
+CALLS_IN_FLIGHT = registry.gauge(
+    "snapskill_calls_in_flight", "Calls dialled and not yet finished")
+NUMBER_CALLS_IN_FLIGHT = registry.gauge(
+    "snapskill_phone_number_calls_in_flight", "Calls in flight on each outbound phone number", ("number",))
+NUMBER_DISABLED = registry.counter(
+    "snapskill_phone_number_disabled_total", "Times a failing phone number was taken out of rotation", ("number",))
+CAMPAIGN_LEASES_RECLAIMED = registry.counter(
+    "snapskill_campaign_leases_reclaimed_total", "Campaign jobs taken over from runners that stopped renewing their lease")
+CALLS_TOTAL = registry.counter(
+    "snapskill_calls_total", "Finished calls by language and final status", ("language", "status"))
+STORE_WRITE_SECONDS = registry.histogram(
+    "snapskill_call_store_write_seconds", "Time to write one batch of calls to the history store",
+    buckets=STAGE_BUCKETS)
+STORE_ROWS = registry.counter(
+    "snapskill_call_store_rows_total", "Call rows written to the history store", ("result",))
+
+
+def endpoint_label(path):
+    """
+    Low-cardinality endpoint name: /call/abc123 -> /call/:id
+    """
+    parts = [part for part in path.split('?', 1)[0].split('/') if part]
+    return "/" + "/".join(":id" if i == 1 and part != "phone" else part for i, part in enumerate(parts))
+
+# ==========================================
+# METRICS ENDPOINT
+# ==========================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the call log
+    
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == "/metrics":
+            body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(registry.snapshot()), "application/json"
+        else:
+            body, content_type = json.dumps({"error": "not found"}), "application/json"
+        data = body.encode('utf-8')
+        self.send_response(200 if path in ("/metrics", "/metrics.json") else 404)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(host=METRICS_HOST, port=None):
+    """
+    Serve /metrics (Prometheus) and /metrics.json in a background thread (once per process)
+    """
+    global _metrics_server
+    port = int(port if port is not None else METRICS_PORT or 9108)
+    with _metrics_lock:
+        if _metrics_server is None:
+            server = MetricsServer((host, port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+            _metrics_server = server
+            get_logger("telemetry").info("📈 Metrics available at %s/metrics", server.url)
+    return _metrics_server
+
+
+def stop_metrics_server():
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is not None:
+            _metrics_server.shutdown()
+            _metrics_server.server_close()
+            _metrics_server = None
+
+# ==========================================
+# STRUCTURED LOGGING
+# ==========================================
+class StructuredLogger:
+    """
+    Logger whose calls take %-style args (formatted only if the level is enabled)
+    plus keyword fields, e.g. log.info("📞 Calling %s", phone, call_id=call_id)
+    Text output shows the message as before; JSON output adds the fields
+    """
+    
+    def __init__(self, logger):
+        self.logger = logger
+    
+    def _log(self, level, msg, args, fields, exc_info=None):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, msg, *args, exc_info=exc_info, extra={'fields': fields})
+    
+    def debug(self, msg, *args, **fields):
+        self._log(logging.DEBUG, msg, args, fields)
+    
+    def info(self, msg, *args, **fields):
+        self._log(logging.INFO, msg, args, fields)
+    
+    def warning(self, msg, *args, **fields):
+        self._log(logging.WARNING, msg, args, fields)
+    
+    def error(self, msg, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields)
+    
+    def exception(self, msg, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields, exc_info=True)
+    
+    def enabled_for(self, level):
+        return self.logger.isEnabledFor(level)
+
+
+def get_logger(name):
+    """
+    StructuredLogger under the snapskill namespace
+    """
+    return StructuredLogger(logging.getLogger(f"{LOGGER_NAMESPACE}.{name}"))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage().strip(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Writes to whatever sys.stdout is at emit time, like print did
+    """
+    
+    def __init__(self):
+        super().__init__(sys.stdout)
+    
+    @property
+    def stream(self):
+        return sys.stdout
+    
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    (Re)configure the snapskill loggers; level 'OFF' silences them
+    """
+    level = (level or LOG_LEVEL).upper()
+    fmt = (fmt or LOG_FORMAT).lower()
+    
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    for handler in list(logger.handlers):
+        if isinstance(handler, _StdoutHandler):
+            logger.removeHandler(handler)
+    
+    handler = _StdoutHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.CRITICAL + 1 if level == 'OFF' else getattr(logging, level, logging.INFO))
+    return logger
+
+
+configure_logging()
@@ -0,0 +1,54 @@
+"""
+Assistant registry writes from sync and async callers at once
+"""
+
+import asyncio
+import threading
+
+import vapi_caller
+from vapi_caller import _load_registry, _registry_store, _synced_assistant
+
+
+def test_concurrent_stores_keep_every_entry(tmp_path):
+    filename = str(tmp_path / "assistant_registry.json")
+    languages = [f"language-{index}" for index in range(20)]
+    
+    async def store_async(language):
+        await asyncio.to_thread(_synced_assistant, language, {'id': f"async-{language}"}, True, "hash", filename)
+    
+    async def run_async():
+        await asyncio.gather(*(store_async(language) for language in languages[::2]))
+    
+    threads = [threading.Thread(target=_registry_store, args=(language, f"sync-{language}", "hash", filename))
+               for language in languages[1::2]]
+    for thread in threads:
+        thread.start()
+    asyncio.run(run_async())
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(_load_registry(filename)) == sorted(languages)
+
+
+def test_async_store_waits_for_a_sync_caller(tmp_path):
+    filename = str(tmp_path / "assistant_registry.json")
+    
+    async def store_while_locked():
+        # The sync caller holds the lock across its create/PATCH; the loop keeps running meanwhile
+        store = asyncio.ensure_future(
+            asyncio.to_thread(_synced_assistant, 'English', {'id': 'async-id'}, True, "hash", filename)
+        )
+        ticks = 0
+        while not store.done() and ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not store.done()
+        return store
+    
+    async def run():
+        with vapi_caller._registry_lock:
+            store = await store_while_locked()
+        await store
+    
+    asyncio.run(run())
+    assert _load_registry(filename)['English']['assistant_id'] == 'async-id'
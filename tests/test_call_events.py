@@ -0,0 +1,173 @@
+"""
+Webhook report parsing, waiters and the status poller schedule
+"""
+
+import json
+import socket
+import threading
+
+import pytest
+
+from call_events import (
+    CallWaiters, StatusPoller, WebhookServer, call_data_from_report, handle_event, outcome_status,
+    start_webhook_server
+)
+from number_pool import is_number_failure
+
+
+def report(ended_reason, **extra):
+    return {'type': 'end-of-call-report', 'call': {'id': 'call-1'}, 'endedReason': ended_reason, **extra}
+
+
+@pytest.mark.parametrize("ended_reason, status", [
+    ('customer-busy', 'busy'),
+    ('customer-did-not-answer', 'no-answer'),
+    ('voicemail', 'no-answer'),
+    ('twilio-failed-to-connect-call', 'failed'),
+    ('pipeline-error-openai-llm-failed', 'failed'),
+    ('call.in-progress.error-vapifault-transport-never-connected', 'failed'),
+    ('silence-timed-out', 'ended'),
+    ('customer-ended-call', 'ended'),
+    ('assistant-ended-call', 'ended'),
+    (None, 'ended'),
+])
+def test_report_status_follows_ended_reason(ended_reason, status):
+    assert call_data_from_report(report(ended_reason))['status'] == status
+
+
+class ListClient:
+    """
+    Stand-in for VapiClient answering GET /call with fixed payloads
+    """
+    
+    def __init__(self, calls):
+        self.calls = calls
+    
+    def get(self, path, params=None):
+        response = type('Response', (), {})()
+        response.status_code = 200
+        response.json = lambda: [dict(call) for call in self.calls]
+        return response
+
+
+@pytest.mark.parametrize("ended_reason", [
+    'customer-busy', 'twilio-failed-to-connect-call', 'pipeline-error-deepgram-transcriber-failed',
+    'customer-ended-call',
+])
+def test_poller_and_webhook_agree(ended_reason):
+    waiters = CallWaiters()
+    future = waiters.watch('call-1')
+    poller = StatusPoller(lambda: ListClient([{'id': 'call-1', 'status': 'ended', 'endedReason': ended_reason}]),
+                          waiters=waiters)
+    poller._watched = {'call-1': {'status': 'in-progress', 'since': 0, 'watched_at': 0, 'polls': 0}}
+    assert poller.tick() == ['call-1']
+    assert future.result(timeout=1)['status'] == call_data_from_report(report(ended_reason))['status']
+
+
+@pytest.mark.parametrize("ended_reason, blamed", [
+    ('twilio-failed-to-connect-call', True),
+    ('call.in-progress.error-sip-telephony-provider-failed-to-connect-call', True),
+    ('pipeline-error-openai-llm-failed', False),
+    ('assistant-error', False),
+    ('customer-busy', False),
+])
+def test_only_number_failures_rest_a_number(ended_reason, blamed):
+    assert is_number_failure(call_data_from_report(report(ended_reason))) is blamed
+
+
+def test_specific_statuses_are_kept():
+    assert outcome_status('busy', 'customer-ended-call') == 'busy'
+    assert outcome_status('in-progress', 'customer-busy') == 'in-progress'
+
+
+def test_waiter_gets_classified_report():
+    waiters = CallWaiters()
+    future = waiters.watch('call-1')
+    handle_event({'message': report('customer-did-not-answer', durationSeconds=0)}, waiters)
+    call = future.result(timeout=1)
+    assert call['status'] == 'no-answer'
+    assert call['endedReason'] == 'customer-did-not-answer'
+
+
+def watched_poller(status, age, now=1000.0):
+    poller = StatusPoller(lambda: None)
+    poller._watched = {'call-1': {'status': status, 'since': now - age, 'watched_at': now - age, 'polls': 0}}
+    return poller
+
+
+@pytest.mark.parametrize("status", ['queued', 'ringing', 'in-progress'])
+def test_poller_starts_at_the_initial_interval(status):
+    assert watched_poller(status, 0).next_interval(now=1000.0) == 3
+
+
+def test_poller_backs_off_while_a_call_talks():
+    assert watched_poller('in-progress', 12).next_interval(now=1000.0) == 6
+    assert watched_poller('in-progress', 60).next_interval(now=1000.0) == 10
+
+
+def test_poller_speeds_up_near_the_ring_timeout():
+    assert watched_poller('ringing', 27).next_interval(now=1000.0) == 1
+
+
+def test_only_watched_calls_keep_a_status():
+    waiters = CallWaiters(max_early_events=2)
+    for index in range(5):
+        handle_event({'message': {'type': 'status-update', 'status': 'ringing', 'call': {'id': f"other-{index}"}}},
+                     waiters)
+        handle_event({'message': report('customer-ended-call', call={'id': f"other-{index}"})}, waiters)
+    assert waiters._statuses == {} and len(waiters._early) == 2
+    
+    waiters.watch('call-1')
+    handle_event({'message': {'type': 'status-update', 'status': 'in-progress', 'call': {'id': 'call-1'}}}, waiters)
+    assert waiters.last_status('call-1') == 'in-progress'
+    waiters.discard('call-1')
+    assert waiters.last_status('call-1') is None
+
+
+@pytest.fixture
+def webhook():
+    waiters = CallWaiters()
+    server = WebhookServer('127.0.0.1', 0, waiters=waiters, secret='s3cret', max_body=1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, waiters
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, headers, body=b''):
+    """
+    Raw POST so malformed headers reach the handler unchanged; returns the status code
+    """
+    lines = ["POST / HTTP/1.1", "Host: localhost", *headers, "", ""]
+    with socket.create_connection(server.server_address[:2], timeout=5) as sock:
+        sock.sendall("\r\n".join(lines).encode() + body)
+        return int(sock.recv(1024).split()[1])
+
+
+def test_webhook_needs_the_secret(webhook):
+    server, waiters = webhook
+    future = waiters.watch('call-1')
+    body = json.dumps({'message': report('customer-ended-call')}).encode()
+    
+    assert post(server, [f"Content-Length: {len(body)}"], body) == 401
+    assert post(server, ["X-Vapi-Secret: wrong", f"Content-Length: {len(body)}"], body) == 401
+    assert not future.done()
+    
+    assert post(server, ["X-Vapi-Secret: s3cret", f"Content-Length: {len(body)}"], body) == 200
+    assert future.result(timeout=1)['status'] == 'ended'
+
+
+@pytest.mark.parametrize("headers, code", [
+    ([], 400),
+    (["Content-Length: abc"], 400),
+    (["Content-Length: -5"], 400),
+    (["Content-Length: 4096"], 413),
+])
+def test_webhook_rejects_bad_content_length(webhook, headers, code):
+    server, _ = webhook
+    assert post(server, ["X-Vapi-Secret: s3cret", *headers]) == code
+
+
+def test_public_receiver_needs_a_secret():
+    with pytest.raises(RuntimeError):
+        start_webhook_server(port=0, public_url='https://example.com/vapi/events', secret=None)
@@ -0,0 +1,58 @@
+"""
+Background call writer: rows the store refuses are kept aside and saved later
+"""
+
+import sqlite3
+
+from call_store import CallStore, CallWriter
+
+
+def row(call_id):
+    return {'call_id': call_id, 'phone': '+919876543210', 'language': 'English', 'status': 'ended',
+            'duration': '1m 0s', 'cost': 4.57, 'summary': 'ok', 'transcript': 'AI: hi',
+            'raw_data': {'id': call_id, 'status': 'ended'}}
+
+
+def test_failed_rows_are_replayed_by_the_next_writer(tmp_path, monkeypatch):
+    store = CallStore(str(tmp_path / "call_history.db"))
+    
+    def locked(rows):
+        raise sqlite3.OperationalError("database is locked")
+    
+    monkeypatch.setattr(store, 'save_calls', locked)
+    writer = CallWriter(store, max_attempts=1)
+    writer.submit(row('call-1'))
+    writer.submit(row('call-2'))
+    writer.close()
+    assert store.count() == 0
+    assert (tmp_path / "call_history.db.failed.jsonl").exists()
+    
+    monkeypatch.undo()
+    writer = CallWriter(store)
+    writer.flush()
+    writer.close()
+    assert store.count() == 2
+    assert store.get_raw_data('call-2') == {'id': 'call-2', 'status': 'ended'}
+    assert not (tmp_path / "call_history.db.failed.jsonl").exists()
+
+
+def test_set_aside_rows_follow_the_next_good_write(tmp_path, monkeypatch):
+    store = CallStore(str(tmp_path / "call_history.db"))
+    writer = CallWriter(store, max_attempts=1)
+    
+    original = store.save_calls
+    failures = iter([True])
+    
+    def flaky(rows):
+        if next(failures, False):
+            raise sqlite3.OperationalError("database is locked")
+        original(rows)
+    
+    monkeypatch.setattr(store, 'save_calls', flaky)
+    writer.submit(row('call-1'))
+    writer.flush()
+    assert store.count() == 0
+    
+    writer.submit(row('call-2'))
+    writer.close()
+    assert store.count() == 2
@@ -0,0 +1,129 @@
+"""
+Campaign job queue: lease ownership, expiry and fencing between runners
+"""
+
+import time
+import threading
+
+import pytest
+
+from campaign_queue import DIALING, IN_CALL, PENDING, CampaignQueue, LeaseLost
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = CampaignQueue(str(tmp_path / 'jobs.db'))
+    queue.create_campaign([f"+9198765432{i:02d}" for i in range(10)], 'English', 'c')
+    return queue
+
+
+def expire(queue, position):
+    with queue.connection() as conn:
+        conn.execute("UPDATE jobs SET lease_expires = ? WHERE campaign_id = 'c' AND position = ?",
+                     (time.time() - 1, position))
+
+
+def test_create_campaign_is_idempotent(queue):
+    assert queue.create_campaign(['+919876543200'], 'English', 'c') == 'c'
+    assert len(queue.jobs('c')) == 10
+    with pytest.raises(ValueError):
+        queue.create_campaign(['+919876543200'], 'Hindi', 'c')
+
+
+def test_runners_get_disjoint_jobs(queue):
+    first = [job['position'] for job in queue.claim('c', 'a', 4)]
+    second = [job['position'] for job in queue.claim('c', 'b', 10)]
+    assert first == [0, 1, 2, 3]
+    assert second == [4, 5, 6, 7, 8, 9]
+    assert queue.claim('c', 'c', 10) == []
+
+
+def test_concurrent_claims_never_share_a_job(queue):
+    claimed = []
+    
+    def runner(name):
+        mine = []
+        while True:
+            jobs = queue.claim('c', name, 1, skip=mine)  # Running jobs are skipped, as in campaign.py
+            if not jobs:
+                return
+            mine.append(jobs[0]['position'])
+            claimed.append(jobs[0]['position'])
+    
+    threads = [threading.Thread(target=runner, args=(f"r{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(10))
+
+
+def test_expired_lease_is_taken_over(queue):
+    [job] = queue.claim('c', 'dead', 1)
+    queue.mark_dialing('c', 0, 'dead')
+    assert queue.claim('c', 'alive', 1)[0]['position'] == 1
+    
+    expire(queue, 0)
+    [taken] = queue.claim('c', 'alive', 1)
+    assert taken['position'] == 0 and taken['state'] == DIALING
+    assert queue.get_job('c', 0)['lease_owner'] == 'alive'
+
+
+def test_renew_keeps_the_lease(queue):
+    queue.claim('c', 'a', 2, lease_seconds=0.2)
+    assert queue.renew('c', 'a', [0, 1], lease_seconds=60) == 2
+    time.sleep(0.3)
+    assert [job['position'] for job in queue.claim('c', 'b', 2)] == [2, 3]
+    assert queue.renew('c', 'b', [0]) == 0
+
+
+def test_dial_needs_a_live_lease(queue):
+    queue.claim('c', 'a', 1)
+    with pytest.raises(LeaseLost):
+        queue.mark_dialing('c', 0, 'b')
+    expire(queue, 0)
+    with pytest.raises(LeaseLost):
+        queue.mark_dialing('c', 0, 'a')
+    assert queue.get_job('c', 0)['attempts'] == 0
+
+
+@pytest.mark.parametrize("write", [
+    lambda queue: queue.mark_in_call('c', 0, 'call-1', owner='a'),
+    lambda queue: queue.mark_done('c', 0, {'call_id': 'call-1', 'status': 'ended'}, owner='a'),
+    lambda queue: queue.mark_retry('c', 0, time.time() + 60, {'status': 'busy'}, owner='a'),
+    lambda queue: queue.mark_failed('c', 0, 'boom', owner='a'),
+    lambda queue: queue.defer('c', 0, time.time() + 60, owner='a'),
+])
+def test_old_owner_cannot_overwrite_after_takeover(queue, write):
+    queue.claim('c', 'a', 1)
+    queue.mark_dialing('c', 0, 'a')
+    expire(queue, 0)
+    queue.claim('c', 'b', 1)
+    queue.mark_in_call('c', 0, 'call-2', owner='b')
+    
+    with pytest.raises(LeaseLost):
+        write(queue)
+    job = queue.get_job('c', 0)
+    assert (job['state'], job['call_id'], job['lease_owner']) == (IN_CALL, 'call-2', 'b')
+
+
+def test_retry_waits_until_due(queue):
+    [job] = queue.claim('c', 'a', 1)
+    queue.mark_dialing('c', 0, 'a')
+    queue.mark_retry('c', 0, time.time() + 60, {'status': 'busy'}, owner='a')
+    assert queue.get_job('c', 0)['state'] == PENDING
+    assert 0 not in [job['position'] for job in queue.claim('c', 'b', 10)]
+
+
+def test_done_job_is_reopened_only_after_its_lease(queue):
+    queue.claim('c', 'a', 1)
+    queue.mark_dialing('c', 0, 'a')
+    queue.mark_done('c', 0, {'call_id': 'call-1', 'status': 'ended'}, owner='a')
+    assert not queue.reopen('c', 0, 'b')  # 'a' may still be saving the call
+    
+    expire(queue, 0)
+    assert queue.reopen('c', 0, 'b')
+    assert not queue.reopen('c', 0, 'c')
+    job = queue.get_job('c', 0)
+    assert (job['state'], job['lease_owner']) == (IN_CALL, 'b')
+    assert queue.claim('c', 'b', 1, skip=[])[0]['position'] == 0  # Its own lease counts as ready
@@ -0,0 +1,60 @@
+"""
+Per-number call limits, within one process and across processes sharing the slot file
+"""
+
+import time
+
+import pytest
+
+from number_pool import PhoneNumberPool
+
+
+def test_least_busy_number_within_limit():
+    pool = PhoneNumberPool(['a', 'b'], max_concurrency=2)
+    assert [pool.try_acquire() for _ in range(5)] == ['a', 'b', 'a', 'b', None]
+    pool.release('b')
+    assert pool.try_acquire() == 'b'
+
+
+def test_limit_is_shared_between_pools_on_one_file(tmp_path):
+    path = str(tmp_path / 'slots.db')
+    first = PhoneNumberPool(['a', 'b'], max_concurrency=2, path=path)
+    second = PhoneNumberPool(['a', 'b'], max_concurrency=2, path=path)
+    taken = [first.try_acquire(), second.try_acquire(), first.try_acquire(), second.try_acquire()]
+    assert sorted(taken) == ['a', 'a', 'b', 'b']
+    assert first.try_acquire() is None and second.try_acquire() is None
+    
+    second.release(taken[1])
+    assert first.try_acquire() == taken[1]
+
+
+def test_slots_of_a_dead_process_expire(tmp_path):
+    path = str(tmp_path / 'slots.db')
+    crashed = PhoneNumberPool(['a'], max_concurrency=1, path=path, slot_ttl=0.2)
+    survivor = PhoneNumberPool(['a'], max_concurrency=1, path=path)
+    assert crashed.try_acquire() == 'a'
+    assert survivor.try_acquire() is None
+    time.sleep(0.3)
+    assert survivor.try_acquire() == 'a'
+
+
+def test_failing_number_is_rested_but_never_the_last_one():
+    pool = PhoneNumberPool(['a', 'b'], max_concurrency=5, failure_threshold=2, cooldown=60)
+    for _ in range(2):
+        pool.release(pool.try_acquire(), failed=True)
+    assert pool.stats()['a']['enabled'] is False
+    for _ in range(3):
+        assert pool.try_acquire() == 'b'
+        pool.release('b', failed=True)
+    assert pool.stats()['b']['enabled'] is True
+
+
+def test_missing_number_ids_are_a_configuration_error(tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        PhoneNumberPool([None, ''], path=str(tmp_path / 'slots.db'))
+    
+    import vapi_caller
+    monkeypatch.setattr(vapi_caller, 'VAPI_PHONE_NUMBER_IDS', [])
+    monkeypatch.setattr(vapi_caller, '_number_pool', None)
+    with pytest.raises(ValueError, match="VAPI_PHONE_NUMBER_ID"):
+        vapi_caller.get_number_pool()
@@ -0,0 +1,77 @@
+"""
+validate_phone_numbers must agree with validate_phone_number on every input
+"""
+
+import re
+import random
+
+import pytest
+
+from vapi_caller import validate_phone_number, validate_phone_numbers
+
+
+def expected(phones):
+    """
+    Scalar results for a contact list, with repeats of a valid number rejected
+    """
+    seen = set()
+    reasons, valid = [], {}
+    for index, phone in enumerate(phones):
+        ok, reason = validate_phone_number(phone)
+        if ok:
+            number = '+91' + re.sub(r'[^\d+]', '', phone)[3:]
+            if number in seen:
+                reason = "Duplicate phone number"
+            else:
+                seen.add(number)
+                valid[index] = number
+        reasons.append(reason)
+    return valid, reasons
+
+
+def assert_same(phones):
+    valid, reasons = validate_phone_numbers(phones)
+    want_valid, want_reasons = expected(phones)
+    assert list(reasons) == want_reasons
+    assert valid.to_dict() == want_valid
+
+
+@pytest.mark.parametrize("phone", [
+    '+91 98765 4321+',          # '+' past the country code
+    '+91+987654321',
+    '+91.9464٣1+.٣659(٣5',      # Arabic-Indic digits
+    '+91 ९८७६५४३२१०',           # Devanagari digits
+    '+91 98765 43210',
+    '+91-(987)-654-3210',
+    '919876543210',
+    '+91 5876543210',
+    '',
+    None,
+    'x' * 60 + '+919876543210',
+])
+def test_edge_cases_match_scalar(phone):
+    assert_same([phone])
+
+
+def test_plus_inside_number_is_rejected():
+    valid, reasons = validate_phone_numbers(['+91 98765 4321+'])
+    assert valid.empty
+    assert reasons.iat[0] == "Phone number must be +91 followed by 10 digits"
+
+
+def test_duplicates_after_normalising():
+    valid, reasons = validate_phone_numbers(['+91 98765 43210', '+919876543210', '+91-9876-543-210'])
+    assert list(valid) == ['+919876543210']
+    assert list(reasons) == ["", "Duplicate phone number", "Duplicate phone number"]
+
+
+def test_fuzz_matches_scalar():
+    rng = random.Random(14)
+    noise = list("0123456789+ -().") + ['٣', '۵', '९', 'a', 'é']
+    phones = []
+    for _ in range(20000):
+        chars = list('+91' + rng.choice('56789') + ''.join(rng.choice('0123456789') for _ in range(9)))
+        for _ in range(rng.randint(0, 4)):
+            chars.insert(rng.randint(0, len(chars)), rng.choice(noise))
+        phones.append(''.join(chars))
+    assert_same(phones)
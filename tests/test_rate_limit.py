@@ -0,0 +1,42 @@
+"""
+Token buckets: async acquires never block the event loop on the shared SQLite file
+"""
+
+import asyncio
+import sqlite3
+import time
+
+from rate_limit import RateLimiter
+
+
+def test_shared_bucket_waits_off_the_loop(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    limiter = RateLimiter(budgets={'default': (100, 5)}, path=path)
+    
+    async def run():
+        holder = sqlite3.connect(path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")  # Another process busy with the buckets
+        acquire = asyncio.ensure_future(limiter.acquire_async('default'))
+        
+        started = time.perf_counter()
+        await asyncio.sleep(0.2)
+        lag = time.perf_counter() - started - 0.2
+        assert not acquire.done()
+        
+        holder.execute("COMMIT")
+        await asyncio.wait_for(acquire, 5)
+        return lag
+    
+    assert asyncio.run(run()) < 0.1
+
+
+def test_memory_bucket_limits_async_callers():
+    limiter = RateLimiter(budgets={'default': (20, 2)})
+    
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(limiter.acquire_async('default') for _ in range(4)))
+        return time.perf_counter() - started
+    
+    # Two from the burst, then one every 50 ms
+    assert 0.08 <= asyncio.run(run()) < 1
@@ -0,0 +1,45 @@
+"""
+Retry decisions for finished campaign calls
+"""
+
+from datetime import datetime
+
+import pytest
+
+from scheduler import CallWindow, RetryPolicy
+
+
+@pytest.mark.parametrize("status, ended_reason", [
+    ('ended', 'customer-busy'),
+    ('ended', 'customer-did-not-answer'),
+    ('busy', None),
+    ('no-answer', None),
+])
+def test_busy_and_unanswered_calls_are_retried(status, ended_reason):
+    policy = RetryPolicy(max_attempts=3, base_delay=60, max_delay=600)
+    assert policy.retry_at(status, 1, now=1000, ended_reason=ended_reason) == 1060
+
+
+@pytest.mark.parametrize("status, ended_reason", [
+    ('ended', 'customer-ended-call'),
+    ('ended', 'twilio-failed-to-connect-call'),
+    ('ended', None),
+    ('timeout', None),
+    ('error', 'Connection refused'),
+])
+def test_other_outcomes_are_final(status, ended_reason):
+    assert RetryPolicy().retry_at(status, 1, ended_reason=ended_reason) is None
+
+
+def test_backoff_doubles_up_to_max_and_stops_after_max_attempts():
+    policy = RetryPolicy(max_attempts=4, base_delay=60, max_delay=100)
+    assert policy.retry_at('busy', 1, now=1000) == 1060
+    assert policy.retry_at('busy', 2, now=1000) == 1100
+    assert policy.retry_at('busy', 4, now=1000) is None
+
+
+def test_retries_wait_for_the_calling_window():
+    policy = RetryPolicy(max_attempts=3, base_delay=600, window=CallWindow.parse("09:00-21:00"))
+    now = datetime(2026, 10, 18, 20, 55).timestamp()
+    at = policy.retry_at('ended', 1, now=now, ended_reason='customer-busy')
+    assert datetime.fromtimestamp(at) == datetime(2026, 10, 19, 9, 0)
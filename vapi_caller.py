@@ -6,15 +6,35 @@ FIXED: Language codes for Deepgram compatibility
 
 import os
 import re
-import requests
-from datetime import datetime
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-import pandas as pd
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 
+# Before the local imports, which read their settings when first imported
 load_dotenv()
 
+from call_events import (
+    TERMINAL_STATUSES, VAPI_WEBHOOK_SECRET, VAPI_WEBHOOK_URL, StatusPoller, call_waiters,
+    classify_call, outcome_status, webhooks_enabled
+)
+from call_store import get_store, get_writer
+from number_pool import NUMBER_POOL_PATH, PhoneNumberPool, is_number_failure, parse_number_ids
+from rate_limit import get_rate_limiter
+from resilience import TransientError, retry_request, retry_request_async, transient_errors
+from telemetry import CALLS_IN_FLIGHT, CALLS_TOTAL, STAGE_SECONDS, STATUS_POLLS, get_logger
+from vapi_client import VapiClient, AsyncVapiClient, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+
+log = get_logger("vapi_caller")
+
 # ==========================================
 # LANGUAGE-SPECIFIC CONFIGURATIONS
 # ==========================================
@@ -56,7 +76,7 @@ LANGUAGE_CONFIG = {
 
 ఇప్పుడు సంభాషణ ప్రారంభించు. గుర్తుంచుకో - తెలుగులో ఆలోచించు మరియు తెలుగులో మాట్లాడు, ఇంగ్లీష్ నుండి translate చేయకు।"""
 },
-    
+
     "English": {
         "voice_provider": "11labs",
         "voice_id": "OUBnvvuqEKdDWtapoJFn",  # DS
@@ -153,7 +173,32 @@ Start the conversation now."""
 # ==========================================
 VAPI_API_KEY = os.getenv('VAPI_API_KEY')
 VAPI_PHONE_NUMBER_ID = os.getenv('VAPI_PHONE_NUMBER_ID')
-VAPI_BASE_URL = "https://api.vapi.ai"
+VAPI_PHONE_NUMBER_IDS = parse_number_ids(os.getenv('VAPI_PHONE_NUMBER_IDS') or VAPI_PHONE_NUMBER_ID)  # Outbound pool
+VAPI_BASE_URL = os.getenv('VAPI_BASE_URL', "https://api.vapi.ai")  # Point at fake_vapi.py for dry runs
+VAPI_CONNECT_TIMEOUT = float(os.getenv('VAPI_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT))
+VAPI_READ_TIMEOUT = float(os.getenv('VAPI_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared VapiClient used by every API call in this module
+    Created on first use so one connection pool serves all threads
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = VapiClient(
+                    VAPI_API_KEY,
+                    base_url=VAPI_BASE_URL,
+                    connect_timeout=VAPI_CONNECT_TIMEOUT,
+                    read_timeout=VAPI_READ_TIMEOUT,
+                    rate_limiter=get_rate_limiter()
+                )
+    return _client
 
 # ==========================================
 # PHONE NUMBER VALIDATION
@@ -173,30 +218,116 @@ def validate_phone_number(phone):
     if not cleaned.startswith('+91'):
         return False, "Phone number must start with +91"
     
-    if len(cleaned) != 13:  # +91 + 10 digits
+    # \d also keeps digits of other scripts, which are no phone number either
+    digits = cleaned[3:]
+    if len(cleaned) != 13 or not (digits.isascii() and digits.isdigit()):  # +91 + 10 digits
         return False, "Phone number must be +91 followed by 10 digits"
     
     # Check if the 10 digits are valid (start with 6-9)
-    digits = cleaned[3:]
     if not digits[0] in '6789':
         return False, "Invalid Indian mobile number"
     
     return True, ""
 
+
+MAX_BULK_PHONE_LENGTH = 32  # Longer entries go through validate_phone_number one by one
+VALIDATION_MESSAGES = ["", "Phone number is required",
+                       "Phone number must start with +91",
+                       "Phone number must be +91 followed by 10 digits",
+                       "Invalid Indian mobile number",
+                       "Duplicate phone number"]
+
+
+def validate_phone_numbers(phones):
+    """
+    Vectorised validate_phone_number for whole contact lists (Series, list or array)
+    Applies exactly the same rules, then drops repeats of an already valid number
+    Returns (valid, reasons):
+      valid   - Series of normalised valid numbers (+91XXXXXXXXXX), first occurrence only
+      reasons - Series aligned with the input, "" for valid rows else the rejection reason
+    """
+    import numpy as np
+    import pandas as pd
+    
+    phones = pd.Series(phones, copy=False)
+    values = phones.to_numpy(dtype=object)
+    n = len(values)
+    
+    missing = pd.isna(values)
+    text = np.where(missing, "", values).astype(str)
+    
+    # Rare very long entries would blow up the character matrix below
+    long_rows = np.array([], dtype=np.int64)
+    if text.dtype.itemsize // 4 > MAX_BULK_PHONE_LENGTH:
+        long_rows = np.flatnonzero(np.char.str_len(text) > MAX_BULK_PHONE_LENGTH)
+        text[long_rows] = ""
+        text = text.astype(f"U{MAX_BULK_PHONE_LENGTH}")
+    
+    # One row per phone, one code point per character
+    width = max(text.dtype.itemsize // 4, 14)
+    codes = text.astype(f"U{width}").view(np.uint32).reshape(n, width)
+    
+    # Non-ASCII entries may hold digits of other scripts, which \d keeps: leave them
+    # to validate_phone_number too, so both validators always agree
+    non_ascii = (codes > 0x7F).any(axis=1)
+    codes[non_ascii] = 0
+    scalar_rows = np.union1d(long_rows, np.flatnonzero(non_ascii))
+    missing |= codes[:, 0] == 0
+    chars = codes.astype(np.uint8)
+    
+    # Remove spaces and special characters: rank each kept digit/'+' by its position in the cleaned string
+    digit = chars - np.uint8(ord('0'))
+    is_digit = digit <= 9
+    is_plus = chars == ord('+')
+    keep = is_digit | is_plus
+    rank = keep.cumsum(axis=1, dtype=np.uint8)
+    length = rank[:, -1].copy()
+    rank[~keep] = 0
+    
+    def cleaned_char(position):
+        return np.where(rank == position, chars, 0).max(axis=1)
+    
+    starts_ok = (cleaned_char(1) == ord('+')) & (cleaned_char(2) == ord('9')) & (cleaned_char(3) == ord('1'))
+    length_ok = (length == 13) & (is_plus.sum(axis=1) == 1)  # +91 + 10 digits, no '+' after the first
+    leading = cleaned_char(4)
+    leading_ok = (leading >= ord('6')) & (leading <= ord('9'))
+    
+    reason = np.select([missing, ~starts_ok, ~length_ok, ~leading_ok], [1, 2, 3, 4], default=0)
+    messages = np.array(VALIDATION_MESSAGES, dtype=object)
+    for row in scalar_rows:
+        reason[row] = VALIDATION_MESSAGES.index(validate_phone_number(values[row])[1])
+    is_valid = reason == 0
+    
+    # Valid rows are '+' followed by exactly 12 ASCII digits (91 + number), so the cleaned
+    # string's last 10 digits are the number and fit an int64 key
+    key = np.zeros(n, dtype=np.int64)
+    for column in range(width):
+        key = np.where(is_digit[:, column], key * 10 + digit[:, column], key)
+    key %= 10 ** 10
+    for row in scalar_rows[is_valid[scalar_rows]]:
+        key[row] = int(re.sub(r'[^\d+]', '', values[row])[3:])
+    
+    # Deduplicate: later copies of a valid number are rejected
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[is_valid] = pd.Series(key[is_valid]).duplicated().to_numpy()
+    reason[duplicate] = 5
+    is_valid &= ~duplicate
+    
+    powers = 10 ** np.arange(9, -1, -1, dtype=np.int64)
+    number = key[is_valid, None] // powers % 10 + ord('0')
+    prefix = np.broadcast_to(np.array([ord('+'), ord('9'), ord('1')]), (len(number), 3))
+    normalised = np.hstack([prefix, number]).astype(np.uint32).view("U13").ravel()
+    valid = pd.Series(normalised.astype(object), index=phones.index[is_valid])
+    return valid, pd.Series(messages[reason], index=phones.index)
+
 # ==========================================
 # CREATE VAPI ASSISTANT
 # ==========================================
-def create_assistant(voice_provider, voice_id, language_code, prompt, language_name, voice_params):
+def build_assistant_payload(voice_provider, voice_id, language_code, prompt, language_name, voice_params):
     """
-    Create Vapi assistant with language-specific configuration
+    Build the Vapi assistant payload for a language configuration
+    Shared by create_assistant, update_assistant and the assistant registry hash
     """
-    url = f"{VAPI_BASE_URL}/assistant"
-    
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     # Build voice config
     voice_config = {
         "provider": voice_provider,
@@ -244,253 +375,668 @@ def create_assistant(voice_provider, voice_id, language_code, prompt, language_n
         "endCallPhrases": ["goodbye", "bye", "thank you bye", "not interested"]
     }
     
-    print(f"\n🔧 Creating assistant for {language_name}...")
-    print(f"   Provider: {voice_provider}")
-    print(f"   Language code: {language_code}")
-    print(f"   Voice ID: {voice_id[:20]}...")
+    # Send status-update / end-of-call-report events to our webhook receiver
+    if VAPI_WEBHOOK_URL:
+        payload["server"] = {"url": VAPI_WEBHOOK_URL}
+        if VAPI_WEBHOOK_SECRET:
+            payload["server"]["secret"] = VAPI_WEBHOOK_SECRET
+    
+    return payload
+
+
+RECOVERY_CLOCK_SKEW = 5  # Seconds of slack when looking for resources an earlier attempt created
+
+
+def _created_since(at=None):
+    """
+    createdAtGe filter for resources created by the request about to be sent
+    (or by a request sent at epoch time `at`)
+    """
+    at = datetime.fromtimestamp(at, timezone.utc) if at is not None else datetime.now(timezone.utc)
+    return _iso_utc(at - timedelta(seconds=RECOVERY_CLOCK_SKEW))
+
+
+def _iso_utc(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+def _created_params(since, limit, until=None):
+    params = {'createdAtGe': since, 'limit': limit}
+    if until:
+        params['createdAtLe'] = until
+    return params
+
+
+def _find_created(path, since, match, limit=100, until=None):
+    """
+    Idempotency check before retrying a POST: the first item under path created
+    since `since` that satisfies match, or None if the earlier attempt created nothing
+    Raises TransientError if the API cannot tell us, so the POST is not resent blind
+    """
+    response = get_client().get(path, params=_created_params(since, limit, until))
+    return _created_match(path, response, match)
+
+
+def _created_match(path, response, match):
+    """
+    Parse the list response of an idempotency check (shared by both pipelines)
+    """
+    if response.status_code != 200:
+        raise TransientError(f"Could not check {path} for an earlier attempt: HTTP {response.status_code}")
+    found = next((item for item in response.json() if match(item)), None)
+    if found:
+        log.info("♻️ Earlier attempt already created %s, not sending again", found.get('id'))
+    return found
+
+
+def _is_same_call(call, payload):
+    return (call.get('assistantId') == payload['assistantId']
+            and (call.get('customer') or {}).get('number') == payload['customer']['number'])
+
+
+def _assistant_request(voice_provider, voice_id, language_code, prompt, language_name, voice_params,
+                       assistant_id=None):
+    """
+    Payload for POST /assistant, or PATCH /assistant/{assistant_id} when given
+    Shared by the sync and async pipelines, which only differ in how they send it
+    """
+    payload = build_assistant_payload(
+        voice_provider, voice_id, language_code, prompt, language_name, voice_params
+    )
+    voice_config = payload['voice']
+    
+    if assistant_id:
+        log.info("\n🔧 Updating assistant %s for %s...", assistant_id, language_name, assistant_id=assistant_id)
+        return payload
+    
+    log.info("\n🔧 Creating assistant for %s...", language_name, language=language_name)
+    log.debug("   Provider: %s\n   Language code: %s\n   Voice ID: %s...",
+              voice_provider, language_code, voice_id[:20])
     if voice_provider == "11labs":
-        print(f"   Stability: {voice_config.get('stability')}")
-        print(f"   Similarity: {voice_config.get('similarityBoost')}")
-        print(f"   Style: {voice_config.get('style', 'N/A')}")
-        print(f"   Speaker Boost: {voice_config.get('useSpeakerBoost', False)}")
+        log.debug("   Stability: %s\n   Similarity: %s\n   Style: %s\n   Speaker Boost: %s",
+                  voice_config.get('stability'), voice_config.get('similarityBoost'),
+                  voice_config.get('style', 'N/A'), voice_config.get('useSpeakerBoost', False))
+    return payload
+
+
+def _same_assistant(payload):
+    return lambda item: item.get('name') == payload['name']
+
+
+def _assistant_response(response, action, assistant_id=None):
+    """
+    Parse a create ('create') or update ('update') assistant response
+    Returns None if the assistant to update no longer exists on Vapi
+    """
+    if isinstance(response, dict):
+        return response  # Found by the idempotency check instead of being sent again
     
-    response = requests.post(url, headers=headers, json=payload)
+    if action == 'update' and response.status_code == 404:
+        log.warning("⚠️ Assistant %s not found on Vapi", assistant_id, assistant_id=assistant_id)
+        return None
     
     if response.status_code not in [200, 201]:
         error_msg = response.text
-        print(f"❌ Failed to create assistant!")
-        print(f"   Status: {response.status_code}")
-        print(f"   Error: {error_msg}")
-        raise Exception(f"Failed to create assistant: {error_msg}")
+        log.error("❌ Failed to %s assistant!\n   Status: %s\n   Error: %s",
+                  action, response.status_code, error_msg, status_code=response.status_code)
+        raise Exception(f"Failed to {action} assistant: {error_msg}")
     
     result = response.json()
-    print(f"✅ Assistant created: {result.get('id')}")
+    log.info("✅ Assistant %sd: %s", action, result.get('id'), assistant_id=result.get('id'))
     
     return result
 
+
+def create_assistant(voice_provider, voice_id, language_code, prompt, language_name, voice_params):
+    """
+    Create Vapi assistant with language-specific configuration
+    """
+    payload = _assistant_request(voice_provider, voice_id, language_code, prompt, language_name, voice_params)
+    
+    since = _created_since()
+    response = retry_request(
+        lambda: get_client().post("/assistant", json=payload),
+        recover=lambda: _find_created("/assistant", since, _same_assistant(payload)),
+        label=f"Creating assistant for {language_name}"
+    )
+    return _assistant_response(response, 'create')
+
+
+def update_assistant(assistant_id, voice_provider, voice_id, language_code, prompt, language_name, voice_params):
+    """
+    PATCH an existing Vapi assistant with a new language configuration
+    Returns None if the assistant no longer exists on Vapi
+    """
+    payload = _assistant_request(voice_provider, voice_id, language_code, prompt, language_name, voice_params,
+                                 assistant_id=assistant_id)
+    
+    response = retry_request(
+        lambda: get_client().patch(f"/assistant/{assistant_id}", json=payload),
+        label=f"Updating assistant {assistant_id}"
+    )
+    return _assistant_response(response, 'update', assistant_id)
+
 # ==========================================
-# GET CALL TRANSCRIPT/SUMMARY
+# ASSISTANT REGISTRY
 # ==========================================
-def get_call_transcript(call_id):
+ASSISTANT_REGISTRY_FILE = "assistant_registry.json"
+_registry_lock = threading.RLock()  # Held across the whole lookup + create/PATCH + store of a sync caller
+
+
+def get_voice_params(config):
+    """
+    Extract voice parameters from a LANGUAGE_CONFIG entry
     """
-    Get call transcript and summary from Vapi API
-    Returns conversation transcript and AI-generated summary
+    return {
+        'stability': config.get('stability', 0.5),
+        'similarity_boost': config.get('similarity_boost', 0.75),
+        'style': config.get('style'),
+        'use_speaker_boost': config.get('use_speaker_boost', False),
+        'voice_language': config.get('voice_language')  # For accent control
+    }
+
+
+def _assistant_args(language):
+    """
+    Keyword arguments for create_assistant/update_assistant for a language
     """
-    url = f"{VAPI_BASE_URL}/call/{call_id}"
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
+    config = LANGUAGE_CONFIG[language]
+    return {
+        'voice_provider': config['voice_provider'],
+        'voice_id': config['voice_id'],
+        'language_code': config['language_code'],
+        'prompt': config['prompt'],
+        'language_name': language,
+        'voice_params': get_voice_params(config)
     }
-    
+
+
+def assistant_config_hash(language):
+    """
+    Content hash of the assistant payload for a language
+    Covers prompt, voice, transcriber and model params
+    """
+    payload = build_assistant_payload(**_assistant_args(language))
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _load_registry(filename):
+    if not os.path.exists(filename):
+        return {}
     try:
-        response = requests.get(url, headers=headers)
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("⚠️ Ignoring unreadable assistant registry %s: %s", filename, e)
+        return {}
+
+
+def _save_registry(registry, filename):
+    # Write to a temp file first so a crash never leaves a half-written registry
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_filename, filename)
+
+
+def _registry_lookup(language, config_hash, filename):
+    """
+    Return (registered entry, whether it matches config_hash)
+    """
+    entry = _load_registry(filename).get(language)
+    return entry, bool(entry and entry.get('config_hash') == config_hash)
+
+
+def _registry_store(language, assistant_id, config_hash, filename):
+    # Read-modify-write under the lock, so concurrent sync and async callers keep each other's entries
+    with _registry_lock:
+        registry = _load_registry(filename)
+        registry[language] = {
+            'assistant_id': assistant_id,
+            'config_hash': config_hash,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        _save_registry(registry, filename)
+
+
+def _reused_assistant(language, entry):
+    log.info("\n♻️ Reusing assistant for %s: %s", language, entry['assistant_id'])
+    return {'id': entry['assistant_id'], 'created': False, 'updated': False}
+
+
+def _synced_assistant(language, assistant, created, config_hash, filename):
+    _registry_store(language, assistant['id'], config_hash, filename)
+    return {'id': assistant['id'], 'created': created, 'updated': not created}
+
+
+def get_or_create_assistant(language, filename=ASSISTANT_REGISTRY_FILE):
+    """
+    Return the Vapi assistant for a language, reusing it across calls
+    Creates the assistant on first use and PATCHes it only when the
+    LANGUAGE_CONFIG entry changes. Returns {'id': ..., 'created': bool, 'updated': bool}
+    """
+    if language not in LANGUAGE_CONFIG:
+        raise ValueError(f"Unsupported language: {language}")
+    
+    config_hash = assistant_config_hash(language)
+    
+    with _registry_lock:
+        entry, matches = _registry_lookup(language, config_hash, filename)
         
-        if response.status_code == 200:
-            call_data = response.json()
-            
-            # Extract transcript
-            transcript = call_data.get('transcript', '')
-            
-            # If transcript is empty, try to get messages
-            if not transcript:
-                messages = call_data.get('messages', [])
-                if messages:
-                    # Build transcript from messages
-                    transcript_lines = []
-                    for msg in messages:
-                        role = msg.get('role', 'unknown')
-                        content = msg.get('content', '')
-                        if content:
-                            speaker = "AI" if role == "assistant" else "Student"
-                            transcript_lines.append(f"{speaker}: {content}")
-                    transcript = "\n".join(transcript_lines)
-            
-            # Extract summary (if available from Vapi)
-            summary = call_data.get('summary', transcript[:200] if transcript else "No transcript available")
-            
-            # Get analysis data
-            analysis = call_data.get('analysis', {})
-            
-            return {
-                'transcript': transcript,
-                'summary': summary,
-                'analysis': analysis,
-                'raw_data': call_data
-            }
-        else:
-            print(f"⚠️ Failed to get transcript: {response.status_code}")
-            return {
-                'transcript': "Failed to retrieve transcript",
-                'summary': "Error fetching call data",
-                'analysis': {},
-                'raw_data': {}
-            }
-            
+        if matches:
+            return _reused_assistant(language, entry)
+        
+        assistant = None
+        created = False
+        if entry:
+            assistant = update_assistant(entry['assistant_id'], **_assistant_args(language))
+        if assistant is None:
+            assistant = create_assistant(**_assistant_args(language))
+            created = True
+        
+        return _synced_assistant(language, assistant, created, config_hash, filename)
+
+# ==========================================
+# CALL RECORD CACHE
+# ==========================================
+class CallRecordCache:
+    """
+    LRU cache of Vapi call payloads keyed by call_id
+    Terminal records never change, so they never expire;
+    in-flight records expire after a short TTL
+    A finished call stays here until the LRU evicts it, so reads before the
+    background writer flushes it to the call store never go back to the API
+    """
+    
+    def __init__(self, max_entries=1000, ttl=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._records = OrderedDict()  # call_id -> (stored_at, call_data)
+    
+    def get(self, call_id):
+        with self._lock:
+            item = self._records.get(call_id)
+            if item is None:
+                return None
+            stored_at, call_data = item
+            if call_data.get('status') not in TERMINAL_STATUSES and time.monotonic() - stored_at > self.ttl:
+                del self._records[call_id]
+                return None
+            self._records.move_to_end(call_id)
+            return call_data
+    
+    def put(self, call_data):
+        call_id = call_data.get('id') if call_data else None
+        if not call_id:
+            return
+        with self._lock:
+            self._records[call_id] = (time.monotonic(), call_data)
+            self._records.move_to_end(call_id)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+    
+    def discard(self, call_id):
+        with self._lock:
+            self._records.pop(call_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+call_cache = CallRecordCache()
+
+
+def _local_call_record(call_id):
+    """
+    Call payload from call_cache, else the copy saved with a finished call
+    """
+    call_data = call_cache.get(call_id)
+    if call_data is None:
+        call_data = get_store().get_raw_data(call_id)
+    return call_data
+
+
+def get_call_record(call_id):
+    """
+    Return the Vapi call payload, served from call_cache or the call store when possible
+    Returns None if the API request fails
+    """
+    call_data = _local_call_record(call_id)
+    if call_data is not None:
+        return call_data
+    
+    return _fetched_call_record(call_id, get_client().get(f"/call/{call_id}"))
+
+
+def _fetched_call_record(call_id, response):
+    """
+    Parse GET /call/{id} and cache the payload (shared by both pipelines)
+    """
+    if response.status_code != 200:
+        log.warning("⚠️ Failed to get call %s: %s", call_id, response.status_code, call_id=call_id)
+        return None
+    
+    call_data = response.json()
+    call_cache.put(call_data)
+    return call_data
+
+# ==========================================
+# GET CALL TRANSCRIPT/SUMMARY
+# ==========================================
+def extract_transcript_data(call_data):
+    """
+    Extract transcript, summary and analysis from a Vapi call payload
+    """
+    # Extract transcript
+    transcript = call_data.get('transcript', '')
+    
+    # If transcript is empty, try to get messages
+    if not transcript:
+        messages = call_data.get('messages', [])
+        if messages:
+            # Build transcript from messages
+            transcript_lines = []
+            for msg in messages:
+                role = msg.get('role', 'unknown')
+                content = msg.get('content', '')
+                if content:
+                    speaker = "AI" if role == "assistant" else "Student"
+                    transcript_lines.append(f"{speaker}: {content}")
+            transcript = "\n".join(transcript_lines)
+    
+    # Extract summary (if available from Vapi)
+    summary = call_data.get('summary', transcript[:200] if transcript else "No transcript available")
+    
+    # Get analysis data
+    analysis = call_data.get('analysis', {})
+    
+    return {
+        'transcript': transcript,
+        'summary': summary,
+        'analysis': analysis,
+        'recording_url': call_data.get('recordingUrl', ''),
+        'raw_data': call_data
+    }
+
+
+def _transcript_error(transcript, summary):
+    return {
+        'transcript': transcript,
+        'summary': summary,
+        'analysis': {},
+        'recording_url': '',
+        'raw_data': {}
+    }
+
+
+def _transcript_from_record(call_data):
+    if call_data is not None:
+        return extract_transcript_data(call_data)
+    else:
+        return _transcript_error("Failed to retrieve transcript", "Error fetching call data")
+
+
+def _transcript_failed(call_id, error):
+    log.error("❌ Error getting transcript: %s", error, call_id=call_id)
+    return _transcript_error(f"Error: {str(error)}", "Error retrieving call data")
+
+
+def get_call_transcript(call_id):
+    """
+    Get call transcript and summary for a call
+    Reads the cached final payload; only hits the Vapi API on a cache miss
+    """
+    try:
+        return _transcript_from_record(get_call_record(call_id))
     except Exception as e:
-        print(f"❌ Error getting transcript: {e}")
-        return {
-            'transcript': f"Error: {str(e)}",
-            'summary': "Error retrieving call data",
-            'analysis': {},
-            'raw_data': {}
-        }
+        return _transcript_failed(call_id, e)
 
 # ==========================================
 # SAVE TO EXCEL
 # ==========================================
-def save_call_to_excel(phone, language, summary, transcript, duration, cost, status, call_id, filename="call_summaries.xlsx"):
+def save_call_to_excel(phone, language, summary, transcript, duration, cost, status, call_id, filename="call_summaries.xlsx",
+                       raw_data=None):
     """
-    Append call data to Excel file
-    Creates new file if doesn't exist
+    Queue call data for the call history store and return immediately
+    A background writer batches rows into SQLite (O(1) upsert keyed by call_id);
+    transcript and raw_data (the Vapi call JSON) are stored compressed, out of line.
+    The Excel file is an export generated from the store on demand,
+    see call_store.export_calls_to_excel; filename is kept for compatibility
     """
     try:
-        # Create data dictionary
-        call_data = {
-            'Date & Time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'Phone Number': phone,
-            'Language': language,
-            'Status': status,
-            'Duration': duration,
-            'Cost (₹)': cost,
-            'Summary': summary,
-            'Full Transcript': transcript,
-            'Call ID': call_id
-        }
-        
-        # Check if file exists
-        if os.path.exists(filename):
-            # Append to existing file
-            df_existing = pd.read_excel(filename)
-            df_new = pd.DataFrame([call_data])
-            df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-        else:
-            # Create new file
-            df_combined = pd.DataFrame([call_data])
-        
-        # Save to Excel
-        df_combined.to_excel(filename, index=False, engine='openpyxl')
-        
-        # Format the Excel file
-        wb = load_workbook(filename)
-        ws = wb.active
-        
-        # Set column widths
-        ws.column_dimensions['A'].width = 20  # Date & Time
-        ws.column_dimensions['B'].width = 15  # Phone
-        ws.column_dimensions['C'].width = 12  # Language
-        ws.column_dimensions['D'].width = 12  # Status
-        ws.column_dimensions['E'].width = 12  # Duration
-        ws.column_dimensions['F'].width = 12  # Cost
-        ws.column_dimensions['G'].width = 50  # Summary
-        ws.column_dimensions['H'].width = 80  # Transcript
-        ws.column_dimensions['I'].width = 30  # Call ID
-        
-        # Style header row
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        get_writer().submit({
+            'call_id': call_id,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'phone': phone,
+            'language': language,
+            'status': status,
+            'duration': duration,
+            'cost': cost,
+            'summary': summary,
+            'transcript': transcript,
+            'raw_data': raw_data
+        })
         
-        # Wrap text for summary and transcript columns
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-            row[6].alignment = Alignment(wrap_text=True, vertical='top')  # Summary
-            row[7].alignment = Alignment(wrap_text=True, vertical='top')  # Transcript
-        
-        wb.save(filename)
-        
-        print(f"\n✅ Call data saved to {filename}")
+        log.info("\n✅ Call data queued for saving", call_id=call_id)
         return True
-        
+    
     except Exception as e:
-        print(f"❌ Error saving to Excel: {e}")
+        log.error("❌ Error saving call data: %s", e, call_id=call_id)
         return False
 
 # ==========================================
 # MAKE VAPI CALL
 # ==========================================
-def make_vapi_call(assistant_id, phone):
+_number_pool = None
+
+
+def get_number_pool():
     """
-    Make outbound call via Vapi
+    Shared PhoneNumberPool over VAPI_PHONE_NUMBER_IDS (or the single VAPI_PHONE_NUMBER_ID)
+    Its call slots live in VAPI_NUMBER_POOL_PATH, shared with every other runner
     """
-    url = f"{VAPI_BASE_URL}/call/phone"
-    
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+    global _number_pool
+    if _number_pool is None:
+        if not VAPI_PHONE_NUMBER_IDS:
+            raise ValueError("No outbound phone number configured: set VAPI_PHONE_NUMBER_ID or VAPI_PHONE_NUMBER_IDS")
+        with _client_lock:
+            if _number_pool is None:
+                _number_pool = PhoneNumberPool(VAPI_PHONE_NUMBER_IDS, path=NUMBER_POOL_PATH)
+    return _number_pool
+
+
+def build_call_payload(assistant_id, phone, phone_number_id=None):
+    """
+    Build the POST /call/phone payload
+    """
+    return {
         "assistantId": assistant_id,
-        "phoneNumberId": VAPI_PHONE_NUMBER_ID,
+        "phoneNumberId": phone_number_id or VAPI_PHONE_NUMBER_ID,
         "customer": {
             "number": phone
         }
     }
-    
-    print(f"\n📞 Initiating call to {phone}...")
-    
-    response = requests.post(url, headers=headers, json=payload)
+
+
+def _check_call_response(response):
+    if isinstance(response, dict):
+        return response  # Found by the idempotency check instead of being sent again
     
     if response.status_code not in [200, 201]:
         error_msg = response.text
-        print(f"❌ Call failed!")
-        print(f"   Status: {response.status_code}")
-        print(f"   Error: {error_msg}")
+        log.error("❌ Call failed!\n   Status: %s\n   Error: %s",
+                  response.status_code, error_msg, status_code=response.status_code)
         raise Exception(f"Failed to make call: {error_msg}")
     
     result = response.json()
-    print(f"✅ Call initiated: {result.get('id')}")
+    log.info("✅ Call initiated: %s", result.get('id'), call_id=result.get('id'))
     
     return result
 
+
+def _call_request(assistant_id, phone, phone_number_id=None):
+    """
+    (payload, headers, recovery match) for POST /call/phone, shared by both pipelines
+    """
+    payload = build_call_payload(assistant_id, phone, phone_number_id)
+    headers = {"Idempotency-Key": uuid.uuid4().hex}  # Same key on every retry of this dial
+    
+    log.info("\n📞 Initiating call to %s from %s...", phone, payload['phoneNumberId'],
+             phone=phone, phone_number_id=payload['phoneNumberId'])
+    return payload, headers, lambda call: _is_same_call(call, payload)
+
+
+def make_vapi_call(assistant_id, phone, phone_number_id=None):
+    """
+    Make outbound call via Vapi, from phone_number_id (default VAPI_PHONE_NUMBER_ID)
+    """
+    payload, headers, match = _call_request(assistant_id, phone, phone_number_id)
+    
+    since = _created_since()
+    response = retry_request(
+        lambda: get_client().post("/call/phone", json=payload, headers=headers),
+        recover=lambda: _find_created("/call", since, match),
+        label=f"Call to {phone}"
+    )
+    return _check_call_response(response)
+
+
+DIAL_RECOVERY_WINDOW = 120  # Seconds after a dial started in which its call can have been created
+DIAL_RECOVERY_LIMIT = 1000  # Calls listed when looking for it
+
+
+def _placed_call_filter(assistant_id, phone, dialed_at):
+    payload = build_call_payload(assistant_id, phone)
+    until = _iso_utc(datetime.fromtimestamp(dialed_at + DIAL_RECOVERY_WINDOW, timezone.utc))
+    return _created_since(dialed_at), until, lambda call: _is_same_call(call, payload)
+
+
+def find_placed_call(assistant_id, phone, dialed_at):
+    """
+    Call created by a dial to phone that started at epoch time dialed_at, or None
+    Lets a restarted campaign re-attach to a call whose id was never recorded
+    Raises TransientError if the API cannot tell us, so the number is not dialled twice
+    """
+    since, until, match = _placed_call_filter(assistant_id, phone, dialed_at)
+    return _find_created("/call", since, match, limit=DIAL_RECOVERY_LIMIT, until=until)
+
 # ==========================================
 # GET CALL STATUS (ACTUAL)
 # ==========================================
+POLL_INTERVAL = 3  # Seconds between status checks (per-call polling)
+WEBHOOK_FALLBACK_POLL_INTERVAL = 30  # Safety-net per-call polling while events are delivered
+USE_STATUS_POLLER = os.getenv('VAPI_MULTIPLEX_POLLING', '1') != '0'
+
+_status_poller = None
+
+
+def get_status_poller():
+    """
+    Shared StatusPoller: one list-calls request per tick for every live call
+    """
+    global _status_poller
+    if _status_poller is None:
+        with _client_lock:
+            if _status_poller is None:
+                _status_poller = StatusPoller(get_client)
+    return _status_poller
+
+
+def _watch_call(call_id):
+    """
+    Future completed by the webhook receiver or the multiplexed poller
+    None means fall back to per-call polling
+    """
+    if webhooks_enabled():
+        return call_waiters.watch(call_id)
+    if USE_STATUS_POLLER:
+        return get_status_poller().watch(call_id)
+    return None
+
+
+def _unwatch_call(call_id):
+    if _status_poller is not None:
+        _status_poller.unwatch(call_id)
+    call_waiters.discard(call_id)
+
+
 def get_call_status(call_id, max_wait=180):
     """
-    Poll Vapi API to get actual call status
-    Waits up to max_wait seconds for call to complete
+    Get actual call status, waiting up to max_wait seconds for call to complete
+    Uses the end-of-call-report webhook when the receiver is running and
+    polls the Vapi API as a fallback
     """
-    url = f"{VAPI_BASE_URL}/call/{call_id}"
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    import time
-    start_time = datetime.now()
+    from concurrent.futures import TimeoutError as FutureTimeout
     wait_time = 0
+    polls = 0
+    event = _watch_call(call_id)
     
-    print(f"\n⏳ Waiting for call to complete (max {max_wait}s)...")
+    log.info("\n⏳ Waiting for call to complete (max %ss)...", max_wait, call_id=call_id)
     
-    while wait_time < max_wait:
-        try:
-            response = requests.get(url, headers=headers)
+    try:
+        while wait_time < max_wait:
+            if event is not None:
+                step = min(WEBHOOK_FALLBACK_POLL_INTERVAL, max_wait - wait_time)
+                try:
+                    return _reported_call(call_id, event.result(timeout=step))
+                except FutureTimeout:
+                    wait_time += step
             
-            if response.status_code == 200:
-                call_data = response.json()
-                status = call_data.get('status', 'unknown')
-                
-                print(f"   Status: {status} ({wait_time}s elapsed)")
-                
-                # Check if call ended
-                if status in ['ended', 'completed', 'failed', 'busy', 'no-answer']:
-                    print(f"\n✅ Call ended with status: {status}")
-                    return call_data
-                
-            # Wait 3 seconds before next check
-            time.sleep(3)
-            wait_time += 3
+            call_data = _poll_call_status(call_id, wait_time)
+            polls += 1
+            if call_data:
+                return call_data
             
-        except Exception as e:
-            print(f"⚠️ Error checking status: {e}")
-            time.sleep(3)
-            wait_time += 3
+            if event is None:
+                # Wait before next check
+                time.sleep(POLL_INTERVAL)
+                wait_time += POLL_INTERVAL
+    finally:
+        _unwatch_call(call_id)
+        STATUS_POLLS.observe(polls, mode='per-call' if event is None else 'fallback')
+    
+    log.warning("\n⚠️ Timeout: Call still in progress after %ss", max_wait, call_id=call_id)
+    return None
+
+
+def _poll_call_status(call_id, wait_time):
+    """
+    One GET /call/{id}; returns the call payload if it reached a terminal status
+    """
+    try:
+        return _polled_call(call_id, get_client().get(f"/call/{call_id}"), wait_time)
+    except Exception as e:
+        log.warning("⚠️ Error checking status: %s", e, call_id=call_id)
+    
+    return None
+
+
+def _reported_call(call_id, call_data):
+    """
+    Final payload delivered by the webhook receiver or the multiplexed poller
+    """
+    call_cache.put(call_data)
+    log.info("\n✅ Call ended with status: %s", call_data.get('status'), call_id=call_id)
+    return call_data
+
+
+def _polled_call(call_id, response, wait_time):
+    """
+    Parse one GET /call/{id} poll; the classified payload if the call ended, else None
+    """
+    if response.status_code == 200:
+        call_data = response.json()
+        status = call_data.get('status', 'unknown')
+        
+        log.debug("   Status: %s (%ss elapsed)", status, wait_time, call_id=call_id)
+        
+        # Check if call ended
+        if status in TERMINAL_STATUSES:
+            return _reported_call(call_id, classify_call(call_data))
     
-    print(f"\n⚠️ Timeout: Call still in progress after {max_wait}s")
     return None
 
 # ==========================================
@@ -514,130 +1060,472 @@ def calculate_cost(duration_seconds):
     return round(total_cost, 2)
 
 # ==========================================
-# MAIN FUNCTION: MAKE CALL WITH LANGUAGE
+# CALL RESULT HELPERS
 # ==========================================
-def make_call_with_language(language, phone):
+def get_call_outcome(final_call_data):
     """
-    Main function to make call with selected language
-    Returns call result with all details
+    Return (duration_seconds, status) from the final call payload
+    Falls back to an estimate when the call timed out
+    """
+    if not final_call_data:
+        # Fallback if timeout
+        return 120, 'timeout'  # Estimate
+    
+    # Get actual duration from API (in seconds)
+    duration_seconds = final_call_data.get('duration', 0)
+    # Vapi reports busy / unanswered / failed calls as 'ended' with the reason in endedReason
+    actual_status = outcome_status(final_call_data.get('status', 'unknown'), final_call_data.get('endedReason'))
+    
+    # If duration not in response, calculate from timestamps
+    if duration_seconds == 0:
+        started_at = final_call_data.get('startedAt')
+        ended_at = final_call_data.get('endedAt')
+        if started_at and ended_at:
+            # Parse ISO timestamps and calculate duration
+            from dateutil import parser
+            start = parser.parse(started_at)
+            end = parser.parse(ended_at)
+            duration_seconds = int((end - start).total_seconds())
+    
+    return duration_seconds, actual_status
+
+
+BANNER = '=' * 60
+
+
+def _log_call_completed(call_id, status, duration_seconds, cost):
+    log.info("\n%s\n✅ CALL COMPLETED\n%s\nCall ID: %s\nStatus: %s\nDuration: %ss\nCost: ₹%s\n%s\n",
+             BANNER, BANNER, call_id, status, duration_seconds, cost, BANNER,
+             call_id=call_id, status=status, duration_seconds=duration_seconds, cost=cost)
+
+
+def format_duration(duration_seconds):
+    return f"{duration_seconds // 60}m {duration_seconds % 60}s"
+
+
+def build_call_result(language, phone, call_id, assistant_id, final_call_data,
+                      duration_seconds, status, cost, start_time, end_time, transcript_data):
     """
+    Build the result dict returned by make_call_with_language
+    """
+    config = LANGUAGE_CONFIG[language]
     
-    print(f"\n{'='*60}")
-    print(f"📞 MAKING CALL")
-    print(f"{'='*60}")
-    print(f"Language: {language}")
-    print(f"Phone: {phone}")
+    # Return formatted result with ACTUAL data
+    return {
+        'status': status,  # ACTUAL status from API
+        'duration': format_duration(duration_seconds),
+        'duration_seconds': duration_seconds,  # ACTUAL duration
+        'cost': cost,  # ACTUAL cost based on real duration
+        'language': language,
+        'call_id': call_id,
+        'assistant_id': assistant_id,
+        'recording_url': final_call_data.get('recordingUrl', '') if final_call_data else '',
+        'voice_name': config['voice_name'],
+        'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'end_time': end_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'phone': phone,
+        'purpose': 'Data Science Feedback Collection',
+        'end_reason': final_call_data.get('endedReason', 'unknown') if final_call_data else 'timeout',
+        'summary': transcript_data['summary'],
+        # The full transcript is loaded on demand from the call store
+        'has_transcript': bool(transcript_data['transcript'])
+    }
+
+
+def _log_making_call(language, phone):
+    log.info("\n%s\n📞 MAKING CALL\n%s\nLanguage: %s\nPhone: %s",
+             BANNER, BANNER, language, phone, language=language, phone=phone)
+
+# ==========================================
+# CALL STAGES (shared by the sync and async pipelines)
+# ==========================================
+def _begin_call(language, phone, on_update):
+    """
+    Validate the language and return the progress callback to use
+    """
+    _log_making_call(language, phone)
     
     # Get language configuration
     if language not in LANGUAGE_CONFIG:
         raise ValueError(f"Unsupported language: {language}")
     
-    config = LANGUAGE_CONFIG[language]
+    return on_update or (lambda update: None)
+
+
+@contextmanager
+def _before_dial(number_id):
+    """
+    Wraps the 'dialing' update: the caller may back out (e.g. its campaign lease
+    was lost) before anything is dialled, which gives the number back untouched
+    """
+    try:
+        yield
+    except Exception:
+        get_number_pool().release(number_id)
+        raise
+
+
+@contextmanager
+def _dialing(number_id):
+    """
+    Wraps the dial from number_id: gives the number back if the dial fails,
+    counting only failures that point at the number
+    """
+    try:
+        with STAGE_SECONDS.time(stage='dial'):
+            yield
+    except Exception as e:
+        # Outages of the Vapi API itself are the circuit breaker's business, not the number's
+        get_number_pool().release(number_id, failed=not isinstance(e, transient_errors()))
+        raise
+
+
+@contextmanager
+def _in_call(call_id, number_id):
+    """
+    Wraps the 'in-call' update and the wait for a placed call; the body stores the
+    final payload in wait['call_data']
+    The line (number_id, None when re-attached) and the gauge are given back even if
+    the callback or the wait raises
+    """
+    log.info("\n%s\n⏳ CALL IN PROGRESS - Waiting for completion...\n%s", BANNER, BANNER, call_id=call_id)
     
-    # Create assistant
-    voice_params = {
-        'stability': config.get('stability', 0.5),
-        'similarity_boost': config.get('similarity_boost', 0.75),
-        'style': config.get('style'),
-        'use_speaker_boost': config.get('use_speaker_boost', False),
-        'voice_language': config.get('voice_language')  # For accent control
-    }
+    CALLS_IN_FLIGHT.inc()
+    wait = {'call_data': None}
+    try:
+        yield wait
+    finally:
+        CALLS_IN_FLIGHT.dec()
+        if number_id is not None:
+            get_number_pool().release(number_id, failed=is_number_failure(wait['call_data']))
+
+
+def _call_outcome(language, call_id, final_call_data):
+    """
+    Return (duration_seconds, status, cost) of a finished call
+    """
+    duration_seconds, actual_status = get_call_outcome(final_call_data)
     
-    assistant = create_assistant(
-        voice_provider=config['voice_provider'],
-        voice_id=config['voice_id'],
-        language_code=config['language_code'],
-        prompt=config['prompt'],
-        language_name=language,
-        voice_params=voice_params
-    )
+    # Calculate actual cost
+    cost = calculate_cost(duration_seconds)
+    CALLS_TOTAL.inc(language=language, status=actual_status)
+    _log_call_completed(call_id, actual_status, duration_seconds, cost)
+    return duration_seconds, actual_status, cost
+
+
+def _save_call_result(language, phone, call_id, assistant_id, final_call_data, outcome,
+                      start_time, end_time, transcript_data):
+    """
+    Queue the call for the call history store and return the call result
+    Only blocks if the write-behind queue is full
+    """
+    duration_seconds, actual_status, cost = outcome
     
-    # Make the call
-    call_result = make_vapi_call(
-        assistant_id=assistant['id'],
-        phone=phone
+    log.info("💾 Saving call data...", call_id=call_id)
+    with STAGE_SECONDS.time(stage='save'):
+        save_call_to_excel(
+            phone=phone,
+            language=language,
+            summary=transcript_data['summary'],
+            transcript=transcript_data['transcript'],
+            duration=format_duration(duration_seconds),
+            cost=cost,
+            status=actual_status,
+            call_id=call_id,
+            raw_data=transcript_data['raw_data']
+        )
+    
+    return build_call_result(
+        language, phone, call_id, assistant_id, final_call_data,
+        duration_seconds, actual_status, cost, start_time, end_time, transcript_data
     )
+
+# ==========================================
+# MAIN FUNCTION: MAKE CALL WITH LANGUAGE
+# ==========================================
+def make_call_with_language(language, phone, on_update=None, call_id=None):
+    """
+    Main function to make call with selected language
+    Returns call result with all details
+    on_update(dict) is called with {'stage': ..., 'call_id': ...} as the call progresses
+    With call_id, re-attaches to a call already placed (e.g. before a restart) instead of dialling
+    """
+    on_update = _begin_call(language, phone, on_update)
+    
+    # Reuse the registered assistant (created/updated only when config changes)
+    with STAGE_SECONDS.time(stage='assistant'):
+        assistant = get_or_create_assistant(language)
+    
+    # Make the call from the least busy number in the pool
+    number_id = None
+    if call_id:
+        log.info("♻️ Re-attaching to call %s", call_id, call_id=call_id)
+    else:
+        number_id = get_number_pool().acquire()
+        with _before_dial(number_id):
+            on_update({'stage': 'dialing'})
+        with _dialing(number_id):
+            call_id = make_vapi_call(assistant['id'], phone, number_id).get('id')
     
-    call_id = call_result.get('id')
     start_time = datetime.now()
     
     # Wait for call to complete and get actual status
-    print(f"\n{'='*60}")
-    print(f"⏳ CALL IN PROGRESS - Waiting for completion...")
-    print(f"{'='*60}")
+    with _in_call(call_id, number_id) as wait:
+        on_update({'stage': 'in-call', 'call_id': call_id})
+        with STAGE_SECONDS.time(stage='wait_status'):
+            wait['call_data'] = get_call_status(call_id, max_wait=180)  # Wait up to 3 minutes
+    end_time = datetime.now()
+    outcome = _call_outcome(language, call_id, wait['call_data'])
     
-    final_call_data = get_call_status(call_id, max_wait=180)  # Wait up to 3 minutes
+    # Get call transcript and summary
+    on_update({'stage': 'saving', 'call_id': call_id})
+    log.info("📝 Fetching call transcript...", call_id=call_id)
+    with STAGE_SECONDS.time(stage='transcript'):
+        transcript_data = get_call_transcript(call_id)
     
-    if final_call_data:
-        # Get actual duration from API (in seconds)
-        duration_seconds = final_call_data.get('duration', 0)
-        actual_status = final_call_data.get('status', 'unknown')
-        end_time = datetime.now()
-        
-        # If duration not in response, calculate from timestamps
-        if duration_seconds == 0:
-            started_at = final_call_data.get('startedAt')
-            ended_at = final_call_data.get('endedAt')
-            if started_at and ended_at:
-                # Parse ISO timestamps and calculate duration
-                from dateutil import parser
-                start = parser.parse(started_at)
-                end = parser.parse(ended_at)
-                duration_seconds = int((end - start).total_seconds())
-    else:
-        # Fallback if timeout
-        duration_seconds = 120  # Estimate
-        actual_status = 'timeout'
-        end_time = datetime.now()
+    return _save_call_result(language, phone, call_id, assistant['id'], wait['call_data'], outcome,
+                             start_time, end_time, transcript_data)
+
+# ==========================================
+# ASYNC PIPELINE
+# ==========================================
+# One event loop can drive hundreds of concurrent calls with these coroutines.
+# The sync functions above keep using the pooled VapiClient, because an
+# httpx.AsyncClient connection pool is bound to the event loop that created it.
+_async_clients = weakref.WeakKeyDictionary()
+_pending_assistants = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Shared AsyncVapiClient for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncVapiClient(
+            VAPI_API_KEY,
+            base_url=VAPI_BASE_URL,
+            connect_timeout=VAPI_CONNECT_TIMEOUT,
+            read_timeout=VAPI_READ_TIMEOUT,
+            rate_limiter=get_rate_limiter()
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _find_created_async(path, since, match, limit=100, until=None):
+    """
+    Async variant of _find_created
+    """
+    response = await get_async_client().get(path, params=_created_params(since, limit, until))
+    return _created_match(path, response, match)
+
+
+async def create_assistant_async(voice_provider, voice_id, language_code, prompt, language_name, voice_params):
+    """
+    Async variant of create_assistant
+    """
+    payload = _assistant_request(voice_provider, voice_id, language_code, prompt, language_name, voice_params)
     
-    # Calculate actual cost
-    cost = calculate_cost(duration_seconds)
+    since = _created_since()
+    response = await retry_request_async(
+        lambda: get_async_client().post("/assistant", json=payload),
+        recover=lambda: _find_created_async("/assistant", since, _same_assistant(payload)),
+        label=f"Creating assistant for {language_name}"
+    )
+    return _assistant_response(response, 'create')
+
+
+async def update_assistant_async(assistant_id, voice_provider, voice_id, language_code, prompt, language_name, voice_params):
+    """
+    Async variant of update_assistant
+    Returns None if the assistant no longer exists on Vapi
+    """
+    payload = _assistant_request(voice_provider, voice_id, language_code, prompt, language_name, voice_params,
+                                 assistant_id=assistant_id)
     
-    print(f"\n{'='*60}")
-    print(f"✅ CALL COMPLETED")
-    print(f"{'='*60}")
-    print(f"Call ID: {call_id}")
-    print(f"Status: {actual_status}")
-    print(f"Duration: {duration_seconds}s")
-    print(f"Cost: ₹{cost}")
-    print(f"{'='*60}\n")
+    response = await retry_request_async(
+        lambda: get_async_client().patch(f"/assistant/{assistant_id}", json=payload),
+        label=f"Updating assistant {assistant_id}"
+    )
+    return _assistant_response(response, 'update', assistant_id)
+
+
+async def _sync_assistant_async(language, entry, config_hash, filename):
+    assistant = None
+    created = False
+    if entry:
+        assistant = await update_assistant_async(entry['assistant_id'], **_assistant_args(language))
+    if assistant is None:
+        assistant = await create_assistant_async(**_assistant_args(language))
+        created = True
     
-    # Get call transcript and summary
-    print("📝 Fetching call transcript...")
-    transcript_data = get_call_transcript(call_id)
-    
-    # Save to Excel
-    print("💾 Saving to Excel...")
-    save_call_to_excel(
-        phone=phone,
-        language=language,
-        summary=transcript_data['summary'],
-        transcript=transcript_data['transcript'],
-        duration=f"{duration_seconds // 60}m {duration_seconds % 60}s",
-        cost=cost,
-        status=actual_status,
-        call_id=call_id
+    # A sync caller may hold the registry lock across its own create/PATCH, so wait for it off the loop
+    return await asyncio.to_thread(_synced_assistant, language, assistant, created, config_hash, filename)
+
+
+async def get_or_create_assistant_async(language, filename=ASSISTANT_REGISTRY_FILE):
+    """
+    Async variant of get_or_create_assistant
+    Concurrent callers in one event loop share a single create/PATCH request
+    """
+    if language not in LANGUAGE_CONFIG:
+        raise ValueError(f"Unsupported language: {language}")
+    
+    config_hash = assistant_config_hash(language)
+    entry, matches = _registry_lookup(language, config_hash, filename)
+    if matches:
+        return _reused_assistant(language, entry)
+    
+    pending = _pending_assistants.setdefault(asyncio.get_running_loop(), {})
+    key = (language, config_hash, filename)
+    task = pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_sync_assistant_async(language, entry, config_hash, filename))
+        pending[key] = task
+        task.add_done_callback(lambda _: pending.pop(key, None))
+    
+    return await asyncio.shield(task)
+
+
+async def make_vapi_call_async(assistant_id, phone, phone_number_id=None):
+    """
+    Async variant of make_vapi_call
+    """
+    payload, headers, match = _call_request(assistant_id, phone, phone_number_id)
+    
+    since = _created_since()
+    response = await retry_request_async(
+        lambda: get_async_client().post("/call/phone", json=payload, headers=headers),
+        recover=lambda: _find_created_async("/call", since, match),
+        label=f"Call to {phone}"
     )
+    return _check_call_response(response)
+
+
+async def find_placed_call_async(assistant_id, phone, dialed_at):
+    """
+    Async variant of find_placed_call
+    """
+    since, until, match = _placed_call_filter(assistant_id, phone, dialed_at)
+    return await _find_created_async("/call", since, match, limit=DIAL_RECOVERY_LIMIT, until=until)
+
+
+async def get_call_status_async(call_id, max_wait=180):
+    """
+    Async variant of get_call_status
+    Waits without holding a thread while the call is in progress
+    """
+    event = _watch_call(call_id)
     
-    # Return formatted result with ACTUAL data
-    return {
-        'status': actual_status,  # ACTUAL status from API
-        'duration': f"{duration_seconds // 60}m {duration_seconds % 60}s",
-        'duration_seconds': duration_seconds,  # ACTUAL duration
-        'cost': cost,  # ACTUAL cost based on real duration
-        'language': language,
-        'call_id': call_id,
-        'assistant_id': assistant['id'],
-        'recording_url': final_call_data.get('recordingUrl', '') if final_call_data else '',
-        'voice_name': config['voice_name'],
-        'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
-        'end_time': end_time.strftime('%Y-%m-%d %H:%M:%S'),
-        'phone': phone,
-        'purpose': 'Data Science Feedback Collection',
-        'end_reason': final_call_data.get('endedReason', 'unknown') if final_call_data else 'timeout',
-        'summary': transcript_data['summary'],
-        'transcript': transcript_data['transcript']
-    }
+    try:
+        return await _wait_call_status_async(call_id, max_wait, event)
+    finally:
+        _unwatch_call(call_id)
+
+
+async def _wait_call_status_async(call_id, max_wait, event):
+    wait_time = 0
+    polls = 0
+    mode = 'per-call' if event is None else 'fallback'
+    if event is not None:
+        event = asyncio.wrap_future(event)
+    
+    log.info("\n⏳ Waiting for call to complete (max %ss)...", max_wait, call_id=call_id)
+    
+    try:
+        while wait_time < max_wait:
+            if event is not None:
+                step = min(WEBHOOK_FALLBACK_POLL_INTERVAL, max_wait - wait_time)
+                try:
+                    return _reported_call(call_id, await asyncio.wait_for(asyncio.shield(event), step))
+                except asyncio.TimeoutError:
+                    wait_time += step
+            
+            polls += 1
+            try:
+                call_data = _polled_call(call_id, await get_async_client().get(f"/call/{call_id}"), wait_time)
+                if call_data:
+                    return call_data
+            except Exception as e:
+                log.warning("⚠️ Error checking status: %s", e, call_id=call_id)
+            
+            if event is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                wait_time += POLL_INTERVAL
+    finally:
+        STATUS_POLLS.observe(polls, mode=mode)
+    
+    log.warning("\n⚠️ Timeout: Call still in progress after %ss", max_wait, call_id=call_id)
+    return None
+
+
+async def get_call_record_async(call_id):
+    """
+    Async variant of get_call_record
+    """
+    call_data = _local_call_record(call_id)
+    if call_data is not None:
+        return call_data
+    
+    return _fetched_call_record(call_id, await get_async_client().get(f"/call/{call_id}"))
+
+
+async def get_call_transcript_async(call_id):
+    """
+    Async variant of get_call_transcript
+    """
+    try:
+        return _transcript_from_record(await get_call_record_async(call_id))
+    except Exception as e:
+        return _transcript_failed(call_id, e)
+
+
+async def _notify_async(on_update, update):
+    # A coroutine on_update (e.g. one writing to a database in a worker thread) is awaited
+    result = on_update(update)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def make_call_with_language_async(language, phone, on_update=None, call_id=None):
+    """
+    Async variant of make_call_with_language
+    Returns the same result dict
+    on_update may also be a coroutine function, so it can wait without blocking the loop
+    """
+    on_update = _begin_call(language, phone, on_update)
+    
+    with STAGE_SECONDS.time(stage='assistant'):
+        assistant = await get_or_create_assistant_async(language)
+    
+    number_id = None
+    if call_id:
+        log.info("♻️ Re-attaching to call %s", call_id, call_id=call_id)
+    else:
+        number_id = await get_number_pool().acquire_async()
+        with _before_dial(number_id):
+            await _notify_async(on_update, {'stage': 'dialing'})
+        with _dialing(number_id):
+            call_id = (await make_vapi_call_async(assistant['id'], phone, number_id)).get('id')
+    
+    start_time = datetime.now()
+    
+    with _in_call(call_id, number_id) as wait:
+        await _notify_async(on_update, {'stage': 'in-call', 'call_id': call_id})
+        with STAGE_SECONDS.time(stage='wait_status'):
+            wait['call_data'] = await get_call_status_async(call_id, max_wait=180)
+    end_time = datetime.now()
+    outcome = _call_outcome(language, call_id, wait['call_data'])
+    
+    await _notify_async(on_update, {'stage': 'saving', 'call_id': call_id})
+    log.info("📝 Fetching call transcript...", call_id=call_id)
+    with STAGE_SECONDS.time(stage='transcript'):
+        transcript_data = await get_call_transcript_async(call_id)
+    
+    return _save_call_result(language, phone, call_id, assistant['id'], wait['call_data'], outcome,
+                             start_time, end_time, transcript_data)
 
 # ==========================================
 # TEST FUNCTION
@@ -0,0 +1,198 @@
+"""
+SnapSkill AI Caller - Vapi HTTP Client
+Shared, pooled HTTP sessions (sync and asyncio) for every Vapi API request
+"""
+
+import time
+import asyncio
+
+from rate_limit import DEFAULT_RATE_LIMIT_RETRIES, bucket_for, parse_retry_after
+from telemetry import API_RATE_LIMITED, API_REQUEST_SECONDS, endpoint_label, get_logger, metrics_enabled
+
+log = get_logger("vapi_client")
+
+# ==========================================
+# CLIENT DEFAULTS
+# ==========================================
+DEFAULT_CONNECT_TIMEOUT = 5   # Seconds to establish TCP+TLS
+DEFAULT_READ_TIMEOUT = 30     # Seconds to wait for a response
+DEFAULT_POOL_SIZE = 20        # Keep-alive connections kept per host
+
+
+def _retry_delay(response, attempt):
+    """
+    Seconds to back off after a 429: Retry-After if given, else exponential
+    """
+    delay = parse_retry_after(response.headers.get('Retry-After'))
+    return delay if delay is not None else min(2 ** attempt, 30)
+
+
+def _record_request(method, path, status, started):
+    """
+    Latency of one HTTP exchange (status 'error' when no response came back)
+    """
+    if metrics_enabled():
+        API_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method,
+                                    endpoint=endpoint_label(path), status=status)
+
+# ==========================================
+# VAPI CLIENT
+# ==========================================
+class VapiClient:
+    """
+    Thin wrapper around a requests.Session for the Vapi API
+    Reuses keep-alive connections and applies connect/read timeouts to every request
+    With a rate_limiter, every request waits for a token and 429s are retried
+    """
+    
+    def __init__(self, api_key, base_url="https://api.vapi.ai",
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 rate_limiter=None,
+                 max_retries=DEFAULT_RATE_LIMIT_RETRIES):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        
+        # Imported here so processes that only use AsyncVapiClient never load requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def request(self, method, path, **kwargs):
+        """
+        Send a request to base_url + path
+        Raises requests.Timeout if the server does not answer in time
+        Returns the last 429 response if the rate limit outlasts max_retries
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        bucket = bucket_for(method, path)
+        
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(bucket)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            except Exception:
+                _record_request(method, path, 'error', started)
+                raise
+            _record_request(method, path, response.status_code, started)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            
+            delay = _retry_delay(response, attempt)
+            API_RATE_LIMITED.inc(method=method, endpoint=endpoint_label(path))
+            log.warning("⏳ Vapi rate limit on %s %s, retrying in %.1fs", method, path, delay, retry_after=delay)
+            if self.rate_limiter:
+                self.rate_limiter.block(bucket, delay)
+            else:
+                time.sleep(delay)
+    
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+    
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+    
+    def close(self):
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+# ==========================================
+# ASYNC VAPI CLIENT
+# ==========================================
+class AsyncVapiClient:
+    """
+    asyncio counterpart of VapiClient built on httpx.AsyncClient
+    Must be used from the event loop it was created in
+    """
+    
+    def __init__(self, api_key, base_url="https://api.vapi.ai",
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 rate_limiter=None,
+                 max_retries=DEFAULT_RATE_LIMIT_RETRIES):
+        self.base_url = base_url.rstrip('/')
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        
+        # Imported here so processes that only dial synchronously never load httpx
+        import httpx
+        
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_keepalive_connections=pool_size)
+        )
+    
+    async def request(self, method, path, **kwargs):
+        """
+        Send a request to base_url + path
+        Raises httpx.TimeoutException if the server does not answer in time
+        Returns the last 429 response if the rate limit outlasts max_retries
+        """
+        bucket = bucket_for(method, path)
+        
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire_async(bucket)
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except Exception:
+                _record_request(method, path, 'error', started)
+                raise
+            _record_request(method, path, response.status_code, started)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            
+            delay = _retry_delay(response, attempt)
+            API_RATE_LIMITED.inc(method=method, endpoint=endpoint_label(path))
+            log.warning("⏳ Vapi rate limit on %s %s, retrying in %.1fs", method, path, delay, retry_after=delay)
+            if self.rate_limiter:
+                await self.rate_limiter.block_async(bucket, delay)
+            else:
+                await asyncio.sleep(delay)
+    
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+    
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+    
+    async def patch(self, path, **kwargs):
+        return await self.request("PATCH", path, **kwargs)
+    
+    async def close(self):
+        await self.client.aclose()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()